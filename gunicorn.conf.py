@@ -0,0 +1,70 @@
+"""
+Gunicorn settings for the production profile.
+
+Every value can be tuned through the environment:
+    WEB_CONCURRENCY       - worker processes (default: 2 * CPUs + 1)
+    GUNICORN_THREADS      - threads per worker for the gthread worker
+    GUNICORN_WORKER_CLASS - "gthread" for WSGI, or
+                            "uvicorn.workers.UvicornWorker" for ASGI
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+
+workers = int(
+    os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1)
+)
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+
+if worker_class.startswith("uvicorn"):
+    wsgi_app = "theatre_service.asgi:application"
+else:
+    wsgi_app = "theatre_service.wsgi:application"
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+# Recycle workers now and then to cap memory growth
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+accesslog = "-"
+
+
+def on_starting(server):
+    """Drop the metrics of a previous run of the server"""
+    metrics_dir = os.environ.get("METRICS_DIR")
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        for name in os.listdir(metrics_dir):
+            if name.startswith("metrics-"):
+                os.remove(os.path.join(metrics_dir, name))
+
+
+def worker_exit(server, worker):
+    from django.conf import settings
+
+    from theatre_service.metrics import REGISTRY
+
+    REGISTRY.flush()
+
+    dump_dir = settings.SLOW_QUERY_LOG["DUMP_DIR"]
+    if dump_dir and settings.SLOW_QUERY_LOG["THRESHOLD_MS"] is not None:
+        from theatre_service.db.slow_queries import slow_query_log
+
+        if slow_query_log:
+            os.makedirs(dump_dir, exist_ok=True)
+            slow_query_log.dump(
+                os.path.join(dump_dir, f"slow-queries-{worker.pid}.jsonl")
+            )
+
+
+def child_exit(server, worker):
+    """Keep the counters of an exited worker in the archive file"""
+    metrics_dir = os.environ.get("METRICS_DIR")
+    if metrics_dir:
+        from theatre_service.metrics import archive_process
+
+        archive_process(metrics_dir, worker.pid)
@@ -1,4 +1,8 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.forms.models import BaseInlineFormSet
+from django.utils.functional import cached_property
 
 from theatre.models import (
     TheatreHall,
@@ -11,19 +15,122 @@ from theatre.models import (
 )
 
 
-class TicketInline(admin.TabularInline):
+class EstimatedCountPaginator(Paginator):
+    """
+    Count unfiltered PostgreSQL tables from the planner statistics instead
+    of a sequential scan; filtered lists and small tables are counted.
+    """
+
+    exact_below = 100000
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        connection = connections[self.object_list.db]
+        if connection.vendor == "postgresql" and not query.where:
+            table = self.object_list.model._meta.db_table
+            with connection.cursor() as cursor:
+                # A partitioned table has its rows in its partitions
+                cursor.execute(
+                    "SELECT sum(greatest(reltuples, 0))::bigint "
+                    "FROM pg_class WHERE oid = to_regclass(%s) OR oid IN "
+                    "(SELECT inhrelid FROM pg_inherits "
+                    "WHERE inhparent = to_regclass(%s))",
+                    [table, table],
+                )
+                (estimate,) = cursor.fetchone()
+            if estimate and estimate >= self.exact_below:
+                return estimate
+        return super().count
+
+
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """Edit one page of the related objects, picked by ?<prefix>-page="""
+
+    per_page = 20
+    page_number = 1
+
+    def get_queryset(self):
+        if not hasattr(self, "page"):
+            paginator = Paginator(super().get_queryset(), self.per_page)
+            self.page = paginator.get_page(self.page_number)
+        return self.page.object_list
+
+
+class PaginatedTabularInline(admin.TabularInline):
+    formset = PaginatedInlineFormSet
+    template = "admin/theatre/edit_inline/paginated_tabular.html"
+    per_page = 20
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.per_page = self.per_page
+        formset.page_number = request.GET.get(
+            f"{formset.get_default_prefix()}-page", 1
+        )
+        return formset
+
+
+class TicketInline(PaginatedTabularInline):
     model = Ticket
     extra = 1
+    raw_id_fields = ("performance", "reservation")
 
 
 @admin.register(Reservation)
 class OrderAdmin(admin.ModelAdmin):
     inlines = (TicketInline,)
+    list_display = ("id", "user", "created_at")
+    list_select_related = ("user",)
+    # created_at is indexed
+    list_filter = (("created_at", admin.DateFieldListFilter),)
+    raw_id_fields = ("user",)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+
+@admin.register(TheatreHall)
+class TheatreHallAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "rows", "seats_in_row")
+    search_fields = ("name",)
+
+
+@admin.register(Actor)
+class ActorAdmin(admin.ModelAdmin):
+    list_display = ("id", "first_name", "last_name")
+    search_fields = ("first_name", "last_name")
+
+
+@admin.register(Genre)
+class GenreAdmin(admin.ModelAdmin):
+    search_fields = ("name",)
+
+
+@admin.register(Play)
+class PlayAdmin(admin.ModelAdmin):
+    list_display = ("id", "title", "default_duration")
+    search_fields = ("title",)
+    autocomplete_fields = ("genres", "actors")
+
+
+@admin.register(Performance)
+class PerformanceAdmin(admin.ModelAdmin):
+    inlines = (TicketInline,)
+    list_display = ("id", "play", "theatre_hall", "show_time", "end_time")
+    list_select_related = ("play", "theatre_hall")
+    # theatre_hall first: (theatre_hall, show_time) is indexed
+    list_filter = ("theatre_hall", ("show_time", admin.DateFieldListFilter))
+    autocomplete_fields = ("play", "theatre_hall")
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
 
 
-admin.site.register(TheatreHall)
-admin.site.register(Actor)
-admin.site.register(Ticket)
-admin.site.register(Genre)
-admin.site.register(Performance)
-admin.site.register(Play)
+@admin.register(Ticket)
+class TicketAdmin(admin.ModelAdmin):
+    list_display = ("id", "performance", "row", "seat", "reservation")
+    list_select_related = ("performance__play", "reservation")
+    # Indexed, and the partition key of partitioned tickets
+    list_filter = (("show_date", admin.DateFieldListFilter),)
+    raw_id_fields = ("performance", "reservation")
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
@@ -0,0 +1,169 @@
+"""
+Occupancy and sales figures of the performances, grouped by play, hall,
+genre or day.
+
+A report takes two aggregate queries: one over the performances for their
+number and seat capacity, one over the tickets for the seats sold and the
+seats sold within the velocity window, both grouped by the same key. The
+tickets are bounded by their show date, the partition key of the table on
+PostgreSQL. Reports are cached per time bucket of ANALYTICS_CACHE_SECONDS:
+every request within a bucket shares the key, and the next bucket computes
+a fresh report, so refreshing dashboards scan the tickets once per bucket.
+One request computes it, behind a `cache.add` lock, while the others are
+served the report of the previous bucket.
+"""
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from theatre.models import Performance, Ticket
+from theatre_service.metrics import CACHE_REQUESTS
+
+
+# The key and label of a group over the performances, and the key over
+# the tickets
+GROUPS = {
+    "play": (F("play_id"), F("play__title"), F("performance__play_id")),
+    "hall": (
+        F("theatre_hall_id"),
+        F("theatre_hall__name"),
+        F("performance__theatre_hall_id"),
+    ),
+    "genre": (
+        F("play__genres__id"),
+        F("play__genres__name"),
+        F("performance__play__genres__id"),
+    ),
+    "day": (TruncDate("show_time"), TruncDate("show_time"), F("show_date")),
+}
+CACHE_KEY = "analytics:{group_by}:{date_from}:{date_to}:{velocity_days}:{}"
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def report(group_by, date_from=None, date_to=None, velocity_days=7, now=None):
+    """
+    The performances shown between `date_from` and `date_to` (local dates,
+    both included) grouped by `group_by`, with their tickets sold and the
+    tickets sold per day over the `velocity_days` before `now`
+    """
+    now = now or timezone.now()
+    performance_key, label, ticket_key = GROUPS[group_by]
+    performances = Performance.objects.all()
+    tickets = Ticket.objects.all()
+    if date_from:
+        performances = performances.filter(
+            show_time__gte=day_start(date_from)
+        )
+        tickets = tickets.filter(show_date__gte=date_from)
+    if date_to:
+        performances = performances.filter(
+            show_time__lt=day_start(date_to + timedelta(days=1))
+        )
+        tickets = tickets.filter(show_date__lte=date_to)
+
+    groups = {
+        row["key"]: row
+        for row in performances.values(key=performance_key, label=label)
+        .filter(key__isnull=False)
+        .annotate(
+            performances=Count("id"),
+            capacity=Sum(
+                F("theatre_hall__rows") * F("theatre_hall__seats_in_row")
+            ),
+        )
+        .order_by("key")
+    }
+    sold = {
+        row["key"]: row
+        for row in tickets.values(key=ticket_key)
+        .filter(key__isnull=False)
+        .annotate(
+            tickets_sold=Count("id"),
+            recent=Count(
+                "id",
+                filter=Q(
+                    reservation__created_at__gte=(
+                        now - timedelta(days=velocity_days)
+                    )
+                ),
+            ),
+        )
+        .order_by()
+    }
+
+    results = []
+    for key, group in groups.items():
+        tickets_sold = sold.get(key, {}).get("tickets_sold", 0)
+        recent = sold.get(key, {}).get("recent", 0)
+        results.append(
+            {
+                "key": key,
+                "label": str(group["label"]),
+                "performances": group["performances"],
+                "capacity": group["capacity"],
+                "tickets_sold": tickets_sold,
+                "occupancy": (
+                    round(tickets_sold / group["capacity"], 4)
+                    if group["capacity"]
+                    else 0
+                ),
+                "sales_velocity": round(recent / velocity_days, 2),
+            }
+        )
+    return results
+
+
+def cache_key(bucket, group_by, date_from, date_to, velocity_days):
+    return CACHE_KEY.format(
+        bucket,
+        group_by=group_by,
+        date_from=date_from,
+        date_to=date_to,
+        velocity_days=velocity_days,
+    )
+
+
+def cached_report(group_by, date_from=None, date_to=None, velocity_days=7):
+    """
+    The report of the current time bucket, computed by the first request
+    of the bucket; requests that come while it runs get the report of the
+    previous bucket, if any. Returns the report and the time it was
+    computed for. ANALYTICS_CACHE_SECONDS <= 0 turns the cache off.
+    """
+    arguments = (group_by, date_from, date_to, velocity_days)
+    seconds = settings.ANALYTICS_CACHE_SECONDS
+    if seconds <= 0:
+        now = timezone.now()
+        return report(*arguments, now), now
+
+    bucket = int(time.time() // seconds)
+    key = cache_key(bucket, *arguments)
+    cached = cache.get(key)
+    if cached is not None:
+        CACHE_REQUESTS.inc(cache="analytics", result="hit")
+        return cached
+    lock = f"{key}:lock"
+    if not cache.add(lock, True, timeout=seconds):
+        previous = cache.get(cache_key(bucket - 1, *arguments))
+        if previous is not None:
+            CACHE_REQUESTS.inc(cache="analytics", result="stale")
+            return previous
+
+    CACHE_REQUESTS.inc(cache="analytics", result="miss")
+    # The window ends at the start of the bucket, not at the first request
+    generated_at = datetime.fromtimestamp(bucket * seconds, dt_timezone.utc)
+    try:
+        cached = (report(*arguments, generated_at), generated_at)
+        # Kept through the next bucket, served while it is computed
+        cache.set(key, cached, timeout=2 * seconds)
+    finally:
+        cache.delete(lock)
+    return cached
@@ -0,0 +1,240 @@
+"""
+Archival of past performances with their tickets and reservations.
+
+`archive_batch()` moves the oldest performances shown before a cutoff into
+ArchivedPerformance and ArchivedTicket, one bounded batch per transaction,
+so the live tables only hold what is still to be shown or recently was.
+Reservations are inlined into the archived tickets and deleted once none
+of their tickets are left. `restore_batch()` moves archived performances
+back with their original ids, unless the hall has since been scheduled
+with performances they would overlap (`restore_conflicts()`).
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from theatre.models import (
+    ArchivedPerformance,
+    ArchivedTicket,
+    Performance,
+    Reservation,
+    Ticket,
+)
+
+
+TICKET_COLUMNS = (
+    "id",
+    "performance_id",
+    "reservation_id",
+    "reservation__created_at",
+    "reservation__user_id",
+    "row",
+    "seat",
+)
+
+
+def archivable(cutoff):
+    """The performances shown before `cutoff`, oldest first"""
+    return Performance.objects.filter(show_time__lt=cutoff).order_by(
+        "show_time", "id"
+    )
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Archive up to `batch_size` performances shown before `cutoff` and
+    return the number of (performances, tickets) archived.
+    """
+    with transaction.atomic():
+        performances = list(
+            archivable(cutoff)
+            .select_related("play", "theatre_hall")[:batch_size]
+        )
+        if not performances:
+            return 0, 0
+        performance_ids = [performance.id for performance in performances]
+        tickets = list(
+            Ticket.objects.filter(performance_id__in=performance_ids)
+            .order_by("id")
+            .values_list(*TICKET_COLUMNS)
+        )
+        sold = Counter(ticket[1] for ticket in tickets)
+
+        ArchivedPerformance.objects.bulk_create(
+            ArchivedPerformance(
+                id=performance.id,
+                show_time=performance.show_time,
+                duration=performance.duration,
+                play_id=performance.play_id,
+                play_title=performance.play.title,
+                theatre_hall_id=performance.theatre_hall_id,
+                theatre_hall_name=performance.theatre_hall.name,
+                theatre_hall_capacity=(
+                    performance.theatre_hall.theatre_capacity
+                ),
+                tickets_sold=sold[performance.id],
+            )
+            for performance in performances
+        )
+        ArchivedTicket.objects.bulk_create(
+            (
+                ArchivedTicket(
+                    id=id,
+                    performance_id=performance_id,
+                    reservation_id=reservation_id,
+                    reservation_created_at=created_at,
+                    user_id=user_id,
+                    row=row,
+                    seat=seat,
+                )
+                for (
+                    id,
+                    performance_id,
+                    reservation_id,
+                    created_at,
+                    user_id,
+                    row,
+                    seat,
+                ) in tickets
+            ),
+            batch_size=batch_size,
+        )
+
+        Ticket.objects.filter(performance_id__in=performance_ids).delete()
+        Performance.objects.filter(id__in=performance_ids).delete()
+        # A reservation may also hold tickets of performances still to come
+        Reservation.objects.filter(
+            id__in={ticket[2] for ticket in tickets}, tickets__isnull=True
+        ).delete()
+    return len(performances), len(tickets)
+
+
+class RestoreConflict(Exception):
+    """Archived performances overlap live performances of their hall"""
+
+    def __init__(self, performance_ids):
+        super().__init__(performance_ids)
+        self.performance_ids = performance_ids
+
+
+def live_copy(archived):
+    """The live Performance of an archived one, its end time set"""
+    performance = Performance(
+        id=archived.id,
+        show_time=archived.show_time,
+        duration=archived.duration,
+        play_id=archived.play_id,
+        theatre_hall_id=archived.theatre_hall_id,
+    )
+    performance.set_end_time()
+    return performance
+
+
+def overlapping(performances):
+    """The ids of the performances that overlap live ones, or each other"""
+    by_hall = defaultdict(list)
+    for performance in performances:
+        by_hall[performance.theatre_hall_id].append(performance)
+    return sorted(
+        performance.id
+        for hall_id, hall_performances in by_hall.items()
+        for performance in Performance.objects.overlapping(
+            hall_id, hall_performances
+        )
+    )
+
+
+def restore_conflicts(performance_ids):
+    """
+    The ids of the archived performances that would overlap a live
+    performance of their hall (or one another) once restored
+    """
+    return overlapping(
+        live_copy(performance)
+        for performance in ArchivedPerformance.objects.filter(
+            id__in=performance_ids,
+            play__isnull=False,
+            theatre_hall__isnull=False,
+        )
+    )
+
+
+def restore_batch(performance_ids):
+    """
+    Move the archived performances with the given ids back to the live
+    tables and return the ids that could not be restored: their play,
+    hall or one of their ticket holders is gone, or a live performance
+    already has the id. Raise RestoreConflict, restoring nothing, when
+    some would overlap a live performance of their hall.
+    """
+    with transaction.atomic():
+        archived = list(
+            ArchivedPerformance.objects.select_for_update().filter(
+                id__in=performance_ids
+            )
+        )
+        blocked = set(
+            Performance.objects.filter(id__in=performance_ids).values_list(
+                "id", flat=True
+            )
+        ) | set(
+            ArchivedTicket.objects.filter(
+                performance_id__in=performance_ids, user__isnull=True
+            ).values_list("performance_id", flat=True)
+        )
+        performances = {
+            performance.id: live_copy(performance)
+            for performance in archived
+            if performance.id not in blocked
+            and performance.play_id is not None
+            and performance.theatre_hall_id is not None
+        }
+        if not performances:
+            return set(performance_ids)
+        conflicts = overlapping(performances.values())
+        if conflicts:
+            raise RestoreConflict(conflicts)
+        Performance.objects.bulk_create(performances.values())
+
+        tickets = list(
+            ArchivedTicket.objects.filter(
+                performance_id__in=performances
+            ).order_by("id")
+        )
+        # One ticket per reservation carries its holder and creation time
+        holders = {ticket.reservation_id: ticket for ticket in tickets}
+        existing = set(
+            Reservation.objects.filter(id__in=holders).values_list(
+                "id", flat=True
+            )
+        )
+        reservations = Reservation.objects.bulk_create(
+            Reservation(id=reservation_id, user_id=ticket.user_id)
+            for reservation_id, ticket in holders.items()
+            if reservation_id not in existing
+        )
+        # created_at is set on insert, put back the original times
+        for reservation in reservations:
+            reservation.created_at = holders[
+                reservation.id
+            ].reservation_created_at
+        Reservation.objects.bulk_update(
+            reservations, ["created_at"], batch_size=500
+        )
+
+        Ticket.objects.bulk_create(
+            (
+                Ticket(
+                    id=ticket.id,
+                    performance_id=ticket.performance_id,
+                    reservation_id=ticket.reservation_id,
+                    row=ticket.row,
+                    seat=ticket.seat,
+                    show_date=performances[ticket.performance_id].show_date,
+                )
+                for ticket in tickets
+            ),
+            batch_size=500,
+        )
+        ArchivedPerformance.objects.filter(id__in=performances).delete()
+    return set(performance_ids) - set(performances)
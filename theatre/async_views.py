@@ -0,0 +1,71 @@
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.views import View
+from rest_framework.response import Response
+
+from theatre_service.tracing import JSONRenderer
+
+
+class AsyncReadOnlyView(View):
+    """
+    Serve the `list` or `retrieve` action of a viewset as an async view.
+
+    The viewset still provides authentication, permissions, throttling,
+    filtering, pagination and serializers; only the database access is
+    awaited, so under ASGI the event loop keeps serving other clients
+    while queries run. Querysets must prefetch everything the serializer
+    touches, as lazy relation access is not allowed in async code.
+    """
+
+    viewset_class = None
+    action = None
+
+    async def get(self, request, *args, **kwargs):
+        viewset = self.viewset_class(
+            action_map={"get": self.action},
+            args=args,
+            kwargs=kwargs,
+            format_kwarg=None,
+        )
+        viewset.renderer_classes = (JSONRenderer,)
+        drf_request = viewset.initialize_request(request, *args, **kwargs)
+        viewset.request = drf_request
+        viewset.headers = viewset.default_response_headers
+
+        try:
+            await sync_to_async(viewset.initial)(drf_request, *args, **kwargs)
+            handler = getattr(self, self.action)
+            response = await handler(viewset)
+        except Exception as exc:
+            response = viewset.handle_exception(exc)
+
+        response = viewset.finalize_response(
+            drf_request, response, *args, **kwargs
+        )
+        return response.render()
+
+    async def list(self, viewset):
+        queryset = viewset.filter_queryset(viewset.get_queryset())
+
+        if viewset.paginator is None:
+            objects = [obj async for obj in queryset]
+            return Response(viewset.get_serializer(objects, many=True).data)
+
+        page = await sync_to_async(viewset.paginator.paginate_queryset)(
+            queryset, viewset.request, view=viewset
+        )
+        serializer = viewset.get_serializer(page, many=True)
+        return viewset.get_paginated_response(serializer.data)
+
+    async def retrieve(self, viewset):
+        queryset = viewset.filter_queryset(viewset.get_queryset())
+        lookup_url_kwarg = viewset.lookup_url_kwarg or viewset.lookup_field
+        lookup = {viewset.lookup_field: viewset.kwargs[lookup_url_kwarg]}
+
+        try:
+            obj = await queryset.aget(**lookup)
+        except (queryset.model.DoesNotExist, TypeError, ValueError):
+            raise Http404
+
+        viewset.check_object_permissions(viewset.request, obj)
+        return Response(viewset.get_serializer(obj).data)
@@ -0,0 +1,213 @@
+"""
+Streaming export and import of the theatre catalog: genres, actors, halls,
+plays with their genre and actor links, and performances.
+
+Rows keep their primary keys, so a catalog moves between environments
+with every reference intact. They are read with `iterator()` and written
+with `bulk_create()` in batches, and the files are read and written one
+row at a time, so memory does not grow with the catalog. Two formats:
+
+- ndjson: one file (gzip-compressed if the name ends with .gz), a
+  `{"table": ..., "row": {...}}` object per line
+- csv: a directory with one `<table>.csv` file per table
+"""
+import csv
+import gzip
+import json
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import groupby, islice
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.duration import duration_string
+
+from theatre.models import (
+    Actor,
+    Genre,
+    Performance,
+    Play,
+    TheatreHall,
+    Ticket,
+)
+
+
+# In the order they are exported and imported, parents first
+TABLES = {
+    "genres": (Genre, ("id", "name")),
+    "actors": (Actor, ("id", "first_name", "last_name", "image")),
+    "theatre_halls": (TheatreHall, ("id", "name", "rows", "seats_in_row")),
+    "plays": (
+        Play, ("id", "title", "description", "image", "default_duration")
+    ),
+    "play_genres": (Play.genres.through, ("play_id", "genre_id")),
+    "play_actors": (Play.actors.through, ("play_id", "actor_id")),
+    "performances": (
+        Performance,
+        ("id", "show_time", "duration", "play_id", "theatre_hall_id"),
+    ),
+}
+# Links of the imported plays are replaced, not merged
+PLAY_LINKS = ("play_genres", "play_actors")
+FORMATS = ("ndjson", "csv")
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return duration_string(value)
+    return value
+
+
+def export_rows(table, batch_size):
+    """Yield the rows of a table as dicts, in primary key order"""
+    model, columns = TABLES[table]
+    for values in (
+        model.objects.order_by("pk")
+        .values_list(*columns)
+        .iterator(chunk_size=batch_size)
+    ):
+        yield dict(zip(columns, map(encode, values)))
+
+
+@contextmanager
+def open_ndjson(path, mode):
+    if path == "-":
+        yield sys.stdout if mode == "w" else sys.stdin
+    elif path.endswith(".gz"):
+        with gzip.open(path, mode + "t", encoding="utf-8") as file:
+            yield file
+    else:
+        with open(path, mode, encoding="utf-8") as file:
+            yield file
+
+
+def write_ndjson(path, batch_size):
+    counts = {}
+    with open_ndjson(path, "w") as file:
+        for table in TABLES:
+            counts[table] = 0
+            for row in export_rows(table, batch_size):
+                file.write(
+                    json.dumps({"table": table, "row": row}, default=str)
+                    + "\n"
+                )
+                counts[table] += 1
+    return counts
+
+
+def write_csv(directory, batch_size):
+    os.makedirs(directory, exist_ok=True)
+    counts = {}
+    for table, (model, columns) in TABLES.items():
+        counts[table] = 0
+        with open(
+            os.path.join(directory, f"{table}.csv"),
+            "w",
+            newline="",
+            encoding="utf-8",
+        ) as file:
+            writer = csv.DictWriter(file, columns)
+            writer.writeheader()
+            for row in export_rows(table, batch_size):
+                writer.writerow(row)
+                counts[table] += 1
+    return counts
+
+
+def read_ndjson(path):
+    """Yield (table, row) pairs in the order of the file"""
+    with open_ndjson(path, "r") as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                yield record["table"], record["row"]
+
+
+def read_csv(directory):
+    for table in TABLES:
+        path = os.path.join(directory, f"{table}.csv")
+        if not os.path.exists(path):
+            continue
+        with open(path, newline="", encoding="utf-8") as file:
+            for row in csv.DictReader(file):
+                # CSV has no NULL, only empty strings
+                yield table, {
+                    column: None if value == "" else value
+                    for column, value in row.items()
+                }
+
+
+def build(table, row):
+    model, columns = TABLES[table]
+    unknown = set(row) - set(columns)
+    if unknown:
+        raise ValueError(
+            f"Unknown columns for {table}: {', '.join(sorted(unknown))}"
+        )
+    return model(
+        **{
+            column: model._meta.get_field(column).to_python(value)
+            for column, value in row.items()
+        }
+    )
+
+
+def import_batch(table, objects):
+    model, columns = TABLES[table]
+    if table in PLAY_LINKS:
+        model.objects.bulk_create(objects, ignore_conflicts=True)
+        return
+
+    update_fields = [column for column in columns if column != "id"]
+    if model is Performance:
+        # Derived from show_time and duration by bulk_create
+        update_fields.append("end_time")
+    model.objects.bulk_create(
+        objects,
+        update_conflicts=True,
+        unique_fields=["id"],
+        update_fields=update_fields,
+    )
+    if model is Performance:
+        # Moved performances take their tickets to the new show date
+        Ticket.objects.filter(
+            performance_id__in=[performance.pk for performance in objects]
+        ).sync_show_dates()
+    if model is Play:
+        play_ids = [play.pk for play in objects]
+        for link in PLAY_LINKS:
+            TABLES[link][0].objects.filter(play_id__in=play_ids).delete()
+
+
+def import_rows(records, batch_size):
+    """
+    Upsert (table, row) pairs in one transaction and return the number of
+    rows per table. Rows of a table are written in batches of `batch_size`
+    as long as they come one after another.
+    """
+    counts = {}
+    with transaction.atomic():
+        for table, rows in groupby(records, key=lambda record: record[0]):
+            if table not in TABLES:
+                raise ValueError(f"Unknown table {table!r}")
+            for batch in batched(rows, batch_size):
+                import_batch(table, [build(table, row) for _, row in batch])
+                counts[table] = counts.get(table, 0) + len(batch)
+
+        # Rows came with their ids, move the sequences past them
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), [model for model, columns in TABLES.values()]
+            ):
+                cursor.execute(sql)
+    return counts
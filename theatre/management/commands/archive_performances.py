@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from theatre.archive import archivable, archive_batch
+
+
+class Command(BaseCommand):
+    """Move past performances and their tickets to the archive tables"""
+
+    help = (
+        "Archive the performances shown more than --older-than-days ago "
+        "(ARCHIVE_AFTER_DAYS by default) with their tickets, deleting the "
+        "reservations left without tickets. Every batch is its own "
+        "transaction, so the job can be stopped and resumed at any point."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days", type=int, default=settings.ARCHIVE_AFTER_DAYS
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--max-batches",
+            type=int,
+            help="Stop after this many batches, to bound a single run",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the performances to archive",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["older_than_days"])
+        if options["dry_run"]:
+            self.stdout.write(
+                f"{archivable(cutoff).count()} performances shown before "
+                f"{cutoff:%Y-%m-%d %H:%M} to archive"
+            )
+            return
+
+        batches = performances = tickets = 0
+        while options["max_batches"] is None or (
+            batches < options["max_batches"]
+        ):
+            archived, archived_tickets = archive_batch(
+                cutoff, options["batch_size"]
+            )
+            if not archived:
+                break
+            batches += 1
+            performances += archived
+            tickets += archived_tickets
+            self.stdout.write(
+                f"Batch {batches}: {archived} performances, "
+                f"{archived_tickets} tickets"
+            )
+        self.stdout.write(
+            f"Archived {performances} performances and {tickets} tickets "
+            f"shown before {cutoff:%Y-%m-%d %H:%M}"
+        )
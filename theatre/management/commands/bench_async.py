@@ -0,0 +1,51 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from theatre_service.benchmark import authenticated_session, run_load
+
+
+ENDPOINTS = {
+    "plays": ("/api/theatre/plays/", "/api/theatre/async/plays/"),
+    "performances": (
+        "/api/theatre/performances/",
+        "/api/theatre/async/performances/",
+    ),
+}
+
+
+class Command(BaseCommand):
+    """Compare sync and async catalog endpoints on a running server"""
+
+    help = (
+        "Load the sync and async catalog endpoints of a running server "
+        "side by side and report throughput and latency as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--email", required=True)
+        parser.add_argument("--password", required=True)
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=32)
+
+    def handle(self, *args, **options):
+        base_url = options["base_url"].rstrip("/")
+        session = authenticated_session(
+            base_url,
+            options["email"],
+            options["password"],
+            options["concurrency"],
+        )
+
+        results = {}
+        for name, (sync_path, async_path) in ENDPOINTS.items():
+            for mode, path in (("sync", sync_path), ("async", async_path)):
+                url = base_url + path
+                results[f"{name}.{mode}"] = run_load(
+                    lambda index: session.get(url).status_code == 200,
+                    options["requests"],
+                    options["concurrency"],
+                )
+
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,223 @@
+import json
+import platform
+import random
+import subprocess
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from theatre.models import (
+    Actor,
+    Genre,
+    Performance,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+from theatre_service.benchmark import run_load
+from theatre_service.db.instrumentation import track_queries
+
+
+BENCH_ADMIN_EMAIL = "bench-admin@bench.local"
+DATASET_MODELS = (
+    Genre, Actor, Play, TheatreHall, Performance, Reservation, Ticket,
+)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    """Time the main API endpoints against the current database"""
+
+    help = (
+        "Request the main list and detail endpoints in-process against "
+        "the current database (e.g. after generate_dataset) and write "
+        "latency percentiles and query counts to a JSON file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument("--concurrency", type=int, default=1)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--output",
+            default=str(settings.BASE_DIR / "benchmarks" / "endpoints.json"),
+        )
+        parser.add_argument(
+            "--compare",
+            help="Earlier results to compare the p50 latencies with",
+        )
+
+    def sample_ids(self, model, count=100):
+        ids = list(model.objects.values_list("id", flat=True)[:count * 10])
+        if not ids:
+            raise CommandError(
+                f"No {model.__name__} rows, run generate_dataset first"
+            )
+        return self.random.sample(ids, min(count, len(ids)))
+
+    def endpoints(self):
+        """Map a name to (user, function of the request index -> url)"""
+        plays = self.sample_ids(Play)
+        performances = self.sample_ids(Performance)
+        halls = self.sample_ids(TheatreHall)
+        actors = self.sample_ids(Actor)
+        tickets = self.sample_ids(Ticket)
+        customer = get_user_model().objects.get(
+            pk=Reservation.objects.values_list("user_id", flat=True)[0]
+        )
+        reservations = list(
+            Reservation.objects.filter(user=customer).values_list(
+                "id", flat=True
+            )
+        )
+        date = Performance.objects.values_list(
+            "show_time", flat=True
+        ).first().date()
+
+        def detail(basename, ids):
+            return lambda index: reverse(
+                f"theatre:{basename}-detail", args=[ids[index % len(ids)]]
+            )
+
+        def url(name, query=""):
+            return lambda index: reverse(name) + query
+
+        return {
+            "plays.list": (customer, url("theatre:play-list")),
+            "plays.filter": (
+                customer,
+                url("theatre:play-list", f"?actors={actors[0]}&title=a"),
+            ),
+            "plays.retrieve": (customer, detail("play", plays)),
+            "performances.list": (
+                customer, url("theatre:performance-list"),
+            ),
+            "performances.filter": (
+                customer,
+                url(
+                    "theatre:performance-list",
+                    f"?date={date}&play={plays[0]}",
+                ),
+            ),
+            "performances.retrieve": (
+                customer, detail("performance", performances),
+            ),
+            "theatre_halls.list": (customer, url("theatre:theatrehall-list")),
+            "theatre_halls.retrieve": (
+                customer, detail("theatrehall", halls),
+            ),
+            "actors.list": (customer, url("theatre:actor-list")),
+            "actors.retrieve": (customer, detail("actor", actors)),
+            "genres.list": (customer, url("theatre:genre-list")),
+            "reservations.list": (
+                customer, url("theatre:reservation-list"),
+            ),
+            "reservations.retrieve": (
+                customer, detail("reservation", reservations),
+            ),
+            "tickets.retrieve": (self.admin, detail("ticket", tickets)),
+            "user.me": (customer, url("user:manage")),
+        }
+
+    def bench(self, user, get_url, options):
+        client = APIClient()
+        client.force_authenticate(user)
+
+        with track_queries() as queries:
+            for index in range(max(1, options["warmup"])):
+                res = client.get(get_url(index))
+                if res.status_code != 200:
+                    raise CommandError(
+                        f"GET {get_url(index)}: {res.status_code}"
+                    )
+
+        result = run_load(
+            lambda index: client.get(get_url(index)).status_code == 200,
+            options["requests"],
+            options["concurrency"],
+        )
+        result["queries"] = round(
+            queries.count / max(1, options["warmup"]), 1
+        )
+        return result
+
+    def compare(self, results, path):
+        previous = json.loads(Path(path).read_text())
+        self.stdout.write(
+            f"p50 vs {previous.get('commit')} ({path}):"
+        )
+        for name, result in results["endpoints"].items():
+            before = previous["endpoints"].get(name)
+            if not before or not before["p50_ms"]:
+                continue
+            change = (result["p50_ms"] / before["p50_ms"] - 1) * 100
+            self.stdout.write(
+                f"  {name:<24} {before['p50_ms']:>9.2f} ms -> "
+                f"{result['p50_ms']:>9.2f} ms ({change:+.1f}%)"
+            )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.admin, _ = get_user_model().objects.get_or_create(
+            email=BENCH_ADMIN_EMAIL,
+            defaults={"is_staff": True, "is_superuser": True},
+        )
+
+        if settings.DEBUG or "debug_toolbar" in settings.INSTALLED_APPS:
+            self.stdout.write(self.style.WARNING(
+                "DEBUG or the debug toolbar is on, the results will not "
+                "match production; run with DJANGO_ENV=production"
+            ))
+
+        results = {
+            "commit": git_commit(),
+            "environment": settings.DJANGO_ENV,
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "dataset": {
+                model.__name__: model.objects.count()
+                for model in DATASET_MODELS
+            },
+            "requests": options["requests"],
+            "concurrency": options["concurrency"],
+            "endpoints": {},
+        }
+
+        # Throttling would reject most of the run from a single client
+        with mock.patch.object(APIView, "throttle_classes", ()):
+            for name, (user, get_url) in self.endpoints().items():
+                results["endpoints"][name] = self.bench(
+                    user, get_url, options
+                )
+                self.stdout.write(
+                    f"{name}: {json.dumps(results['endpoints'][name])}"
+                )
+
+        output = Path(options["output"])
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, indent=2) + "\n")
+        self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
+
+        if options["compare"]:
+            self.compare(results, options["compare"])
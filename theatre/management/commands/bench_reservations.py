@@ -0,0 +1,253 @@
+import json
+import random
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, IntegrityError, connection, connections
+from django.db.models import Count
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from theatre.models import Performance, Play, Reservation, TheatreHall, Ticket
+from theatre.serializers import RESERVATION_CONFLICTS
+from theatre_service.benchmark import summarize
+
+
+BENCH_EMAIL = "bench-reservations-{}@bench.local"
+STRATEGIES = ("none", "ordered", "row", "advisory", "serializable")
+
+
+def error_codes(data):
+    """Flatten the codes of a DRF error response"""
+    if isinstance(data, dict):
+        data = list(data.values())
+    if isinstance(data, list):
+        return [code for item in data for code in error_codes(item)]
+    return [getattr(data, "code", None)]
+
+
+def classify(response=None, error=None):
+    """Name the outcome of one reservation attempt"""
+    if error is not None:
+        pgcode = getattr(error.__cause__, "pgcode", None)
+        if pgcode in RESERVATION_CONFLICTS:
+            return RESERVATION_CONFLICTS[pgcode]
+        if isinstance(error, IntegrityError):
+            return "integrity_error"
+        return "error"
+    if response.status_code == 201:
+        return "success"
+    if response.status_code == 400:
+        if "unique" in error_codes(response.data):
+            return "seat_conflict"
+        return "validation_error"
+    if response.status_code == 409:
+        # A deadlock or a serialization failure, reported by the API
+        (code,) = error_codes(response.data)
+        return code
+    return f"http_{response.status_code}"
+
+
+class Command(BaseCommand):
+    """Measure reservations of the same seats under contention"""
+
+    help = (
+        "Start many concurrent clients that reserve overlapping seats of "
+        "one performance through the reservation API, once per "
+        "RESERVATION_LOCKING strategy, and report throughput, latency, "
+        "conflict rate and deadlock / serialization failure counts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=100)
+        parser.add_argument(
+            "--attempts",
+            type=int,
+            default=5,
+            help="Reservations attempted by every client",
+        )
+        parser.add_argument(
+            "--seats-per-reservation", type=int, default=3
+        )
+        parser.add_argument(
+            "--hot-seats",
+            type=int,
+            default=60,
+            help="Clients pick their seats among this many, so a smaller "
+            "pool means more overlap",
+        )
+        parser.add_argument(
+            "--lock",
+            action="append",
+            choices=STRATEGIES,
+            help="Strategy to run (repeatable, default: all)",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--output",
+            default=str(
+                settings.BASE_DIR / "benchmarks" / "reservations.json"
+            ),
+        )
+
+    def setup(self, options):
+        self.rows = max(1, -(-options["hot_seats"] // 20))
+        self.halls = []
+        self.play = Play.objects.create(
+            title="Bench play", description="bench-reservations"
+        )
+        self.seats = [
+            (row, seat)
+            for row in range(1, self.rows + 1)
+            for seat in range(1, 21)
+        ][:options["hot_seats"]]
+
+        user_model = get_user_model()
+        password = make_password(None)
+        self.users = user_model.objects.bulk_create(
+            user_model(email=BENCH_EMAIL.format(i), password=password)
+            for i in range(options["clients"])
+        )
+
+    def teardown(self):
+        Reservation.objects.filter(user__in=self.users).delete()
+        get_user_model().objects.filter(
+            pk__in=[user.pk for user in self.users]
+        ).delete()
+        self.play.delete()
+        for hall in self.halls:
+            hall.delete()
+
+    def client_run(self, user, performance, barrier, seed, options, results):
+        rng = random.Random(seed)
+        client = APIClient()
+        client.force_authenticate(user)
+        url = reverse("theatre:reservation-list")
+        outcomes, latencies = Counter(), []
+
+        try:
+            barrier.wait()
+            for _ in range(options["attempts"]):
+                seats = rng.sample(
+                    self.seats,
+                    min(options["seats_per_reservation"], len(self.seats)),
+                )
+                payload = {
+                    "tickets": [
+                        {"row": row, "seat": seat, "performance": performance}
+                        for row, seat in seats
+                    ]
+                }
+                started = time.perf_counter()
+                try:
+                    outcome = classify(
+                        response=client.post(url, payload, format="json")
+                    )
+                except DatabaseError as error:
+                    outcome = classify(error=error)
+                latencies.append(time.perf_counter() - started)
+                outcomes[outcome] += 1
+        finally:
+            connections.close_all()
+        results.append((outcomes, latencies))
+
+    def run_strategy(self, strategy, options):
+        # A hall per strategy, as the performances of a hall cannot overlap
+        hall = TheatreHall.objects.create(
+            name=f"Bench hall ({strategy})", rows=self.rows, seats_in_row=20
+        )
+        self.halls.append(hall)
+        performance = Performance.objects.create(
+            play=self.play, theatre_hall=hall, show_time=timezone.now()
+        )
+        barrier = threading.Barrier(options["clients"] + 1)
+        results = []
+        threads = [
+            threading.Thread(
+                target=self.client_run,
+                args=(
+                    user, performance.pk, barrier,
+                    options["seed"] + index, options, results,
+                ),
+            )
+            for index, user in enumerate(self.users)
+        ]
+
+        # Without retries, every deadlock and serialization failure counts
+        with override_settings(
+            RESERVATION_LOCKING=strategy, RESERVATION_RETRIES=0
+        ):
+            for thread in threads:
+                thread.start()
+            barrier.wait()
+            started = time.perf_counter()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+        outcomes = sum((result[0] for result in results), Counter())
+        latencies = [value for _, batch in results for value in batch]
+        attempts = sum(outcomes.values())
+        summary = summarize(
+            latencies,
+            elapsed,
+            attempts - outcomes["success"] - outcomes["seat_conflict"],
+        )
+        summary.update(
+            outcomes=dict(outcomes),
+            conflict_rate=round(outcomes["seat_conflict"] / attempts, 4),
+            deadlocks=outcomes["deadlock"],
+            serialization_failures=outcomes["serialization_failure"],
+            tickets_sold=performance.tickets.count(),
+            double_booked=(
+                Ticket.objects.filter(performance=performance)
+                .values("row", "seat")
+                .annotate(count=Count("id"))
+                .filter(count__gt=1)
+                .count()
+            ),
+        )
+        return summary
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError(
+                "Contention only shows on PostgreSQL, set POSTGRES_HOST"
+            )
+
+        self.setup(options)
+        results = {
+            "clients": options["clients"],
+            "attempts_per_client": options["attempts"],
+            "seats_per_reservation": options["seats_per_reservation"],
+            "hot_seats": options["hot_seats"],
+            "strategies": {},
+        }
+        try:
+            # Throttling would reject most of the run
+            with mock.patch.object(APIView, "throttle_classes", ()):
+                for strategy in options["lock"] or STRATEGIES:
+                    results["strategies"][strategy] = self.run_strategy(
+                        strategy, options
+                    )
+                    self.stdout.write(
+                        f"{strategy}: "
+                        f"{json.dumps(results['strategies'][strategy])}"
+                    )
+        finally:
+            self.teardown()
+
+        output = Path(options["output"])
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, indent=2) + "\n")
+        self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
@@ -0,0 +1,55 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from theatre_service.benchmark import authenticated_session, run_load
+
+
+DEFAULT_PATHS = [
+    "/api/theatre/plays/",
+    "/api/theatre/performances/",
+    "/api/theatre/genres/",
+    "/api/user/me/",
+]
+
+
+class Command(BaseCommand):
+    """Smoke-test request throughput of a running server"""
+
+    help = (
+        "Send concurrent GET requests to a running server and report "
+        "throughput and latency per path as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--email", required=True)
+        parser.add_argument("--password", required=True)
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help="Path to load, may be repeated (default: catalog paths)",
+        )
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=16)
+
+    def handle(self, *args, **options):
+        base_url = options["base_url"].rstrip("/")
+        session = authenticated_session(
+            base_url,
+            options["email"],
+            options["password"],
+            options["concurrency"],
+        )
+
+        results = {}
+        for path in options["paths"] or DEFAULT_PATHS:
+            url = base_url + path
+            results[path] = run_load(
+                lambda index: session.get(url).status_code == 200,
+                options["requests"],
+                options["concurrency"],
+            )
+
+        self.stdout.write(json.dumps(results, indent=2))
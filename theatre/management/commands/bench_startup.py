@@ -0,0 +1,91 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+FIRST_REQUEST_SCRIPT = """
+import sys, time
+import django
+django.setup()
+from django.test import Client
+Client().get(sys.argv[1])
+print(time.time())
+"""
+
+MODES = {"full": "0", "api_only": "1"}
+
+
+class Command(BaseCommand):
+    """Measure process startup in the full and API-only modes"""
+
+    help = (
+        "Time `manage.py check` and the first request of a fresh process "
+        "with and without DJANGO_API_ONLY and write the results as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument(
+            "--path",
+            default="/healthz",
+            help="Path of the first request, /healthz does no I/O",
+        )
+        parser.add_argument(
+            "--output",
+            default=str(settings.BASE_DIR / "benchmarks" / "startup.json"),
+        )
+
+    def run(self, args, env):
+        started = time.time()
+        result = subprocess.run(
+            [sys.executable, *args],
+            env=env,
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return started, result.stdout
+
+    def time_check(self, env):
+        started, _ = self.run(["manage.py", "check"], env)
+        return time.time() - started
+
+    def time_first_request(self, env, path):
+        started, stdout = self.run(["-c", FIRST_REQUEST_SCRIPT, path], env)
+        return float(stdout.strip().splitlines()[-1]) - started
+
+    def handle(self, *args, **options):
+        results = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": options["runs"],
+            "path": options["path"],
+            "modes": {},
+        }
+
+        for mode, api_only in MODES.items():
+            env = {**os.environ, "DJANGO_API_ONLY": api_only}
+            env.setdefault("DJANGO_SETTINGS_MODULE", settings.SETTINGS_MODULE)
+            check = [self.time_check(env) for _ in range(options["runs"])]
+            first_request = [
+                self.time_first_request(env, options["path"])
+                for _ in range(options["runs"])
+            ]
+            results["modes"][mode] = {
+                "check_s": round(statistics.median(check), 3),
+                "first_request_s": round(statistics.median(first_request), 3),
+            }
+
+        output = Path(options["output"])
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, indent=2) + "\n")
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from theatre_service.schema import build_schema_files
+
+
+class Command(BaseCommand):
+    """Django command to prebuild the OpenAPI schema files"""
+
+    help = "Render the OpenAPI schema for the current API version to disk."
+
+    def handle(self, *args, **options):
+        for path in build_schema_files():
+            self.stdout.write(self.style.SUCCESS(f"Schema written to {path}"))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from theatre.catalog import FORMATS, write_csv, write_ndjson
+
+
+class Command(BaseCommand):
+    """Stream the catalog to an NDJSON file or a directory of CSV files"""
+
+    help = (
+        "Export genres, actors, theatre halls, plays (with their genre and "
+        "actor links) and performances, keeping their ids, for "
+        "import_catalog."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "output",
+            help="NDJSON file (.gz to compress, - for stdout) or CSV "
+            "directory",
+        )
+        parser.add_argument("--format", choices=FORMATS, default="ndjson")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        writer = write_csv if options["format"] == "csv" else write_ndjson
+        counts = writer(options["output"], options["batch_size"])
+
+        # Keep stdout clean when the export goes there
+        stream = self.stderr if options["output"] == "-" else self.stdout
+        for table, count in counts.items():
+            stream.write(f"{table}: {count}")
+        stream.write(
+            f"Exported in {time.perf_counter() - started:.1f}s"
+        )
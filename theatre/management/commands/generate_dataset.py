@@ -0,0 +1,349 @@
+import random
+from datetime import datetime, time, timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from theatre.models import (
+    Actor,
+    Genre,
+    Performance,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+
+
+DATASET_EMAIL = "user-{}@dataset.local"
+DATASET_PASSWORD = "dataset-password"
+RESERVATION_SIZES = (1, 1, 2, 2, 2, 3, 4, 6)
+# Performances start at these hours after noon, and last at most 2h45
+SLOT_HOURS = (0, 3, 6, 9)
+DURATIONS = tuple(timedelta(minutes=minutes) for minutes in (90, 120, 165))
+
+# Deleted children first; TRUNCATE on PostgreSQL
+MODELS = (
+    Ticket,
+    Reservation,
+    Performance,
+    Play.genres.through,
+    Play.actors.through,
+    Play,
+    Actor,
+    Genre,
+    TheatreHall,
+)
+
+FIRST_NAMES = (
+    "Olena", "Taras", "Iryna", "Andrii", "Marta", "Bohdan", "Sofia",
+    "Dmytro", "Kateryna", "Yurii", "Oksana", "Mykola", "Daryna", "Ivan",
+)
+LAST_NAMES = (
+    "Shevchenko", "Kovalenko", "Bondarenko", "Tkachenko", "Kravchenko",
+    "Oliinyk", "Shevchuk", "Polishchuk", "Lysenko", "Marchenko", "Melnyk",
+)
+WORDS = (
+    "night", "garden", "letters", "winter", "forest", "song", "river",
+    "house", "stone", "mirror", "dream", "city", "shadow", "harvest",
+)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def zipf_weights(count, skew):
+    """Cumulative weights of ranks 1..count under a Zipf law"""
+    return list(accumulate(1 / rank ** skew for rank in range(1, count + 1)))
+
+
+class Command(BaseCommand):
+    """Fill the database with a large synthetic catalog and bookings"""
+
+    help = (
+        "Generate plays, actors, genres, halls, performances, reservations "
+        "and tickets with bulk_create. Play popularity follows a Zipf law "
+        "and hall occupancy a beta distribution whose mean yields about "
+        "--tickets tickets in total."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--genres", type=int, default=40)
+        parser.add_argument("--actors", type=int, default=5000)
+        parser.add_argument("--plays", type=int, default=2000)
+        parser.add_argument("--halls", type=int, default=1000)
+        parser.add_argument("--performances", type=int, default=200000)
+        parser.add_argument("--tickets", type=int, default=2000000)
+        parser.add_argument("--users", type=int, default=5000)
+        parser.add_argument(
+            "--scale",
+            type=float,
+            default=1.0,
+            help="Multiply every count, e.g. 0.01 for a quick dataset",
+        )
+        parser.add_argument(
+            "--popularity-skew",
+            type=float,
+            default=1.1,
+            help="Zipf exponent of how performances spread over plays",
+        )
+        parser.add_argument(
+            "--occupancy-concentration",
+            type=float,
+            default=4.0,
+            help="Beta concentration of the per-performance occupancy "
+            "(lower is more uneven)",
+        )
+        parser.add_argument("--genres-per-play", type=int, default=3)
+        parser.add_argument("--actors-per-play", type=int, default=8)
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=365,
+            help="Performances are spread over this many days from today",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete the theatre data and the generated users first",
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        counts = {
+            name: max(1, round(options[name] * options["scale"]))
+            for name in (
+                "genres", "actors", "plays", "halls",
+                "performances", "tickets", "users",
+            )
+        }
+
+        if options["clear"]:
+            self.clear()
+        elif Play.objects.exists():
+            raise CommandError(
+                "The database already has plays, use --clear to replace them"
+            )
+
+        users = self.create_users(counts["users"])
+        genres = self.create_genres(counts["genres"])
+        actors = self.create_actors(counts["actors"])
+        plays = self.create_plays(counts["plays"], genres, actors, options)
+        halls = self.create_halls(counts["halls"])
+        performances = self.create_performances(
+            counts["performances"], plays, halls, options
+        )
+        self.create_tickets(
+            counts["tickets"], performances, users, options
+        )
+
+    def log(self, model, count):
+        self.stdout.write(f"{model.__name__}: {count}")
+
+    def clear(self):
+        if connection.vendor == "postgresql":
+            tables = ", ".join(
+                connection.ops.quote_name(model._meta.db_table)
+                for model in MODELS
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(f"TRUNCATE {tables} RESTART IDENTITY CASCADE")
+        else:
+            with transaction.atomic():
+                for model in MODELS:
+                    model.objects.all().delete()
+        get_user_model().objects.filter(
+            email__endswith="@dataset.local"
+        ).delete()
+
+    def bulk_create(self, model, objects):
+        created = []
+        for batch in batched(objects, self.batch_size):
+            created += model.objects.bulk_create(batch)
+        self.log(model, len(created))
+        return created
+
+    def create_users(self, count):
+        user_model = get_user_model()
+        password = make_password(DATASET_PASSWORD)
+        return [
+            user.pk
+            for user in self.bulk_create(
+                user_model,
+                (
+                    user_model(
+                        email=DATASET_EMAIL.format(i), password=password
+                    )
+                    for i in range(count)
+                ),
+            )
+        ]
+
+    def create_genres(self, count):
+        return self.bulk_create(
+            Genre,
+            (
+                Genre(name=f"{self.random.choice(WORDS).title()} {i}")
+                for i in range(count)
+            ),
+        )
+
+    def create_actors(self, count):
+        return self.bulk_create(
+            Actor,
+            (
+                Actor(
+                    first_name=self.random.choice(FIRST_NAMES),
+                    last_name=f"{self.random.choice(LAST_NAMES)}-{i}",
+                )
+                for i in range(count)
+            ),
+        )
+
+    def create_plays(self, count, genres, actors, options):
+        plays = self.bulk_create(
+            Play,
+            (
+                Play(
+                    title=" ".join(self.random.sample(WORDS, 3)).title()
+                    + f" {i}",
+                    description=" ".join(self.random.choices(WORDS, k=40)),
+                    default_duration=self.random.choice(DURATIONS),
+                )
+                for i in range(count)
+            ),
+        )
+
+        for field, related in (("genre", genres), ("actor", actors)):
+            through = getattr(Play, f"{field}s").through
+            per_play = min(options[f"{field}s_per_play"], len(related))
+            self.bulk_create(
+                through,
+                (
+                    through(play_id=play.pk, **{f"{field}_id": item.pk})
+                    for play in plays
+                    for item in self.random.sample(related, per_play)
+                ),
+            )
+        return plays
+
+    def create_halls(self, count):
+        return self.bulk_create(
+            TheatreHall,
+            (
+                TheatreHall(
+                    name=f"Hall {i}",
+                    rows=self.random.randint(5, 30),
+                    seats_in_row=self.random.randint(10, 40),
+                )
+                for i in range(count)
+            ),
+        )
+
+    def create_performances(self, count, plays, halls, options):
+        weights = zipf_weights(len(plays), options["popularity_skew"])
+        popularity = self.random.sample(plays, len(plays))
+        start = timezone.make_aware(
+            datetime.combine(timezone.localdate(), time(12))
+        )
+        # Halls do not double-book: every performance takes its own slot
+        # of a hall and a day, and slots are longer than any play
+        slots = len(halls) * options["days"] * len(SLOT_HOURS)
+        if count > slots:
+            raise CommandError(
+                f"{count} performances do not fit in {slots} slots of "
+                f"the halls, add --halls or --days"
+            )
+
+        def performance(slot):
+            hall, slot = divmod(slot, options["days"] * len(SLOT_HOURS))
+            day, hour = divmod(slot, len(SLOT_HOURS))
+            play = self.random.choices(popularity, cum_weights=weights)[0]
+            return Performance(
+                play=play,
+                theatre_hall=halls[hall],
+                show_time=start
+                + timedelta(days=day, hours=SLOT_HOURS[hour]),
+                duration=play.default_duration,
+            )
+
+        return self.bulk_create(
+            Performance,
+            (
+                performance(slot)
+                for slot in self.random.sample(range(slots), count)
+            ),
+        )
+
+    def create_tickets(self, count, performances, users, options):
+        capacity = sum(
+            performance.theatre_hall.theatre_capacity
+            for performance in performances
+        )
+        mean = min(0.95, count / capacity)
+        concentration = options["occupancy_concentration"]
+        alpha, beta = mean * concentration, (1 - mean) * concentration
+
+        reservations = tickets = 0
+        for batch in batched(performances, max(1, self.batch_size // 50)):
+            groups = []
+            for performance in batch:
+                hall = performance.theatre_hall
+                taken = round(
+                    self.random.betavariate(alpha, beta)
+                    * hall.theatre_capacity
+                )
+                seats = [
+                    (
+                        performance.pk,
+                        performance.show_date,
+                        *divmod(place, hall.seats_in_row),
+                    )
+                    for place in self.random.sample(
+                        range(hall.theatre_capacity), taken
+                    )
+                ]
+                # Reservations of 1 to 6 seats, mostly small ones
+                start = 0
+                while start < len(seats):
+                    size = self.random.choice(RESERVATION_SIZES)
+                    groups.append(seats[start:start + size])
+                    start += size
+
+            with transaction.atomic():
+                created = Reservation.objects.bulk_create(
+                    [
+                        Reservation(user_id=self.random.choice(users))
+                        for _ in groups
+                    ],
+                    batch_size=self.batch_size,
+                )
+                Ticket.objects.bulk_create(
+                    (
+                        Ticket(
+                            reservation_id=reservation.pk,
+                            performance_id=performance_id,
+                            show_date=show_date,
+                            row=row + 1,
+                            seat=seat + 1,
+                        )
+                        for reservation, group in zip(created, groups)
+                        for performance_id, show_date, row, seat in group
+                    ),
+                    batch_size=self.batch_size,
+                )
+            reservations += len(created)
+            tickets += sum(len(group) for group in groups)
+
+        self.log(Reservation, reservations)
+        self.log(Ticket, tickets)
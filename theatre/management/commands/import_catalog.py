@@ -0,0 +1,50 @@
+import os
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from theatre.catalog import FORMATS, import_rows, read_csv, read_ndjson
+
+
+class Command(BaseCommand):
+    """Load a catalog written by export_catalog"""
+
+    help = (
+        "Upsert the genres, actors, theatre halls, plays and performances "
+        "of an export_catalog file or directory by id with bulk_create, in "
+        "one transaction. The genre and actor links of the imported plays "
+        "are replaced."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "input", help="NDJSON file (- for stdin) or CSV directory"
+        )
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="Default: csv for a directory, ndjson otherwise",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        path = options["input"]
+        file_format = options["format"] or (
+            "csv" if os.path.isdir(path) else "ndjson"
+        )
+        if path != "-" and not os.path.exists(path):
+            raise CommandError(f"{path} does not exist")
+
+        started = time.perf_counter()
+        records = read_csv(path) if file_format == "csv" else read_ndjson(path)
+        try:
+            counts = import_rows(records, options["batch_size"])
+        except (KeyError, ValueError, ValidationError) as error:
+            raise CommandError(f"Invalid catalog: {error}")
+
+        for table, count in counts.items():
+            self.stdout.write(f"{table}: {count}")
+        self.stdout.write(
+            f"Imported in {time.perf_counter() - started:.1f}s"
+        )
@@ -0,0 +1,270 @@
+import re
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from theatre.models import Performance, Reservation, Ticket
+
+
+TABLE = Ticket._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+BOUNDS = re.compile(r"FROM \('([\d-]+)'\) TO \('([\d-]+)'\)")
+
+
+def add_months(day, months):
+    month = day.year * 12 + day.month - 1 + months
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def partition_name(start):
+    return f"{TABLE}_p{start:%Y_%m}"
+
+
+def quote(name):
+    return connection.ops.quote_name(name)
+
+
+class Command(BaseCommand):
+    """Range-partition the tickets by show date on PostgreSQL"""
+
+    help = (
+        "Keep the tickets table partitioned by month of the show date: "
+        "--convert turns the table into a partitioned one (once, under an "
+        "exclusive lock), then every run creates the partitions of the "
+        "next --months-ahead months and, with --retain-months, detaches "
+        "the partitions of older months into standalone tables."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--convert",
+            action="store_true",
+            help="Partition the existing table, copying its rows",
+        )
+        parser.add_argument("--months-ahead", type=int, default=3)
+        parser.add_argument(
+            "--retain-months",
+            type=int,
+            help="Detach the partitions that end before the start of the "
+            "month this many months ago",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Print the SQL instead of running it",
+        )
+
+    def execute_sql(self, sql, params=()):
+        if self.dry_run:
+            self.stdout.write(connection.ops.compose_sql(sql, params) + ";")
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def fetch(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def is_partitioned(self):
+        return self.fetch(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)",
+            [TABLE],
+        ) == [("p",)]
+
+    def partitions(self):
+        """Map the name of each partition to its (start, end) or None"""
+        partitions = {}
+        for name, bound in self.fetch(
+            "SELECT child.relname, pg_get_expr(child.relpartbound, "
+            "child.oid) FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(%s)",
+            [TABLE],
+        ):
+            match = BOUNDS.search(bound)
+            partitions[name] = match and tuple(
+                date.fromisoformat(value) for value in match.groups()
+            )
+        return partitions
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Partitioning needs PostgreSQL")
+        self.dry_run = options["dry_run"]
+        this_month = timezone.localdate().replace(day=1)
+        last_month = add_months(this_month, options["months_ahead"])
+
+        with transaction.atomic():
+            # ALTER and DROP TABLE fail while deferred foreign key checks of
+            # the transaction are pending
+            self.execute_sql("SET CONSTRAINTS ALL IMMEDIATE")
+            if not self.is_partitioned():
+                if not options["convert"]:
+                    raise CommandError(
+                        f"{TABLE} is not partitioned, run with --convert"
+                    )
+                self.convert(this_month, last_month)
+            else:
+                self.create_partitions(this_month, last_month)
+
+            if options["retain_months"] is not None:
+                self.detach_partitions(
+                    add_months(this_month, -options["retain_months"])
+                )
+
+        if not self.dry_run:
+            for name, bounds in sorted(self.partitions().items()):
+                self.stdout.write(
+                    f"{name}: "
+                    + (f"{bounds[0]} - {bounds[1]}" if bounds else "default")
+                )
+
+    def convert(self, this_month, last_month):
+        referencing = self.fetch(
+            "SELECT conname FROM pg_constraint WHERE confrelid = "
+            "to_regclass(%s)",
+            [TABLE],
+        )
+        if referencing:
+            raise CommandError(
+                f"Foreign keys reference {TABLE}: "
+                + ", ".join(name for name, in referencing)
+            )
+
+        new_table = f"{TABLE}_partitioned"
+        self.execute_sql(f"LOCK TABLE {quote(TABLE)} IN ACCESS EXCLUSIVE MODE")
+        ((first_date, last_date, max_id),) = self.fetch(
+            f"SELECT min(show_date), max(show_date), max(id) "
+            f"FROM {quote(TABLE)}"
+        )
+        self.execute_sql(
+            f"CREATE TABLE {quote(new_table)} (LIKE {quote(TABLE)} "
+            f"INCLUDING DEFAULTS) PARTITION BY RANGE (show_date)"
+        )
+        self.execute_sql(
+            f"CREATE TABLE {quote(DEFAULT_PARTITION)} "
+            f"PARTITION OF {quote(new_table)} DEFAULT"
+        )
+        start = min(first_date or this_month, this_month).replace(day=1)
+        last_month = max(last_date or last_month, last_month).replace(day=1)
+        while start <= last_month:
+            end = add_months(start, 1)
+            self.execute_sql(
+                f"CREATE TABLE {quote(partition_name(start))} "
+                f"PARTITION OF {quote(new_table)} "
+                f"FOR VALUES FROM (%s) TO (%s)",
+                [start, end],
+            )
+            start = end
+
+        self.execute_sql(
+            f"INSERT INTO {quote(new_table)} SELECT * FROM {quote(TABLE)}"
+        )
+        self.execute_sql(f"DROP TABLE {quote(TABLE)}")
+        self.execute_sql(
+            f"ALTER TABLE {quote(new_table)} RENAME TO {quote(TABLE)}"
+        )
+
+        # Identity columns cannot be shared by partitions, use a sequence
+        sequence = f"{TABLE}_id_seq"
+        self.execute_sql(
+            f"CREATE SEQUENCE {quote(sequence)} "
+            f"OWNED BY {quote(TABLE)}.{quote('id')}"
+        )
+        self.execute_sql(
+            "SELECT setval(%s, %s, false)", [sequence, (max_id or 0) + 1]
+        )
+        self.execute_sql(
+            f"ALTER TABLE {quote(TABLE)} ALTER COLUMN {quote('id')} "
+            f"SET DEFAULT nextval('{sequence}')"
+        )
+
+        # Unique constraints of a partitioned table include its key
+        columns = ", ".join(
+            quote(column)
+            for column in ("performance_id", "row", "seat", "show_date")
+        )
+        self.execute_sql(
+            f"ALTER TABLE {quote(TABLE)} ADD CONSTRAINT "
+            f"{quote(TABLE + '_pkey')} PRIMARY KEY (id, show_date)"
+        )
+        self.execute_sql(
+            f"ALTER TABLE {quote(TABLE)} ADD CONSTRAINT "
+            f"{quote(TABLE + '_performance_row_seat_uniq')} "
+            f"UNIQUE ({columns})"
+        )
+        self.execute_sql(
+            f"CREATE INDEX {quote(TABLE + '_reservation_id')} "
+            f"ON {quote(TABLE)} (reservation_id)"
+        )
+        self.execute_sql(
+            f"CREATE INDEX {quote('ticket_show_date_idx')} "
+            f"ON {quote(TABLE)} (show_date)"
+        )
+        for column, model in (
+            ("performance_id", Performance),
+            ("reservation_id", Reservation),
+        ):
+            self.execute_sql(
+                f"ALTER TABLE {quote(TABLE)} ADD CONSTRAINT "
+                f"{quote(f'{TABLE}_{column}_fk')} FOREIGN KEY "
+                f"({quote(column)}) REFERENCES "
+                f"{quote(model._meta.db_table)} (id) "
+                f"DEFERRABLE INITIALLY DEFERRED"
+            )
+
+    def create_partitions(self, this_month, last_month):
+        covered = {
+            bounds[0] for bounds in self.partitions().values() if bounds
+        }
+        start = this_month
+        while start <= last_month:
+            end = add_months(start, 1)
+            if start not in covered:
+                self.create_partition(start, end)
+            start = end
+
+    def create_partition(self, start, end):
+        """
+        Create the partition outside the table, move the rows of its range
+        out of the default partition and attach it, as PostgreSQL refuses
+        a new partition whose rows are still in the default one.
+        """
+        name = quote(partition_name(start))
+        self.execute_sql(
+            f"CREATE TABLE {name} (LIKE {quote(TABLE)} INCLUDING DEFAULTS)"
+        )
+        self.execute_sql(
+            f"WITH moved AS (DELETE FROM {quote(DEFAULT_PARTITION)} "
+            f"WHERE show_date >= %s AND show_date < %s RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved",
+            [start, end],
+        )
+        self.execute_sql(
+            f"ALTER TABLE {quote(TABLE)} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+
+    def detach_partitions(self, cutoff):
+        for name, bounds in sorted(self.partitions().items()):
+            if not bounds or bounds[1] > cutoff:
+                continue
+            self.execute_sql(
+                f"ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(name)}"
+            )
+            # A detached partition is a snapshot, it must not block
+            # deleting the performances and reservations it points to
+            for constraint, in self.fetch(
+                "SELECT conname FROM pg_constraint "
+                "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+                [name],
+            ):
+                self.execute_sql(
+                    f"ALTER TABLE {quote(name)} "
+                    f"DROP CONSTRAINT {quote(constraint)}"
+                )
+            self.stdout.write(f"Detached {name}")
@@ -0,0 +1,76 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from theatre.archive import (
+    RestoreConflict,
+    restore_batch,
+    restore_conflicts,
+)
+from theatre.catalog import batched
+from theatre.models import ArchivedPerformance
+
+
+class Command(BaseCommand):
+    """Move archived performances back to the live tables"""
+
+    help = (
+        "Restore archived performances, picked by id and/or by show date, "
+        "with their tickets and reservations under their original ids."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("ids", nargs="*", type=int)
+        parser.add_argument(
+            "--since",
+            type=date.fromisoformat,
+            help="First show date to restore, YYYY-MM-DD",
+        )
+        parser.add_argument(
+            "--until",
+            type=date.fromisoformat,
+            help="Last show date to restore, YYYY-MM-DD",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        if not (options["ids"] or options["since"] or options["until"]):
+            raise CommandError("Give performance ids, --since or --until")
+
+        archived = ArchivedPerformance.objects.order_by("id")
+        if options["ids"]:
+            archived = archived.filter(id__in=options["ids"])
+        if options["since"]:
+            archived = archived.filter(show_time__date__gte=options["since"])
+        if options["until"]:
+            archived = archived.filter(show_time__date__lte=options["until"])
+        ids = list(archived.values_list("id", flat=True))
+
+        conflicts = restore_conflicts(ids)
+        if conflicts:
+            raise self.conflict(conflicts)
+
+        restored = 0
+        skipped = set()
+        for batch in batched(ids, options["batch_size"]):
+            try:
+                batch_skipped = restore_batch(batch)
+            except RestoreConflict as conflict:
+                # The hall was scheduled since the check
+                self.stdout.write(f"Restored {restored} performances")
+                raise self.conflict(conflict.performance_ids)
+            restored += len(batch) - len(batch_skipped)
+            skipped |= batch_skipped
+        self.stdout.write(f"Restored {restored} performances")
+        if skipped:
+            self.stderr.write(
+                "Not restored, their play, hall, a ticket holder is gone "
+                "or the id is taken: "
+                + ", ".join(map(str, sorted(skipped)))
+            )
+
+    def conflict(self, performance_ids):
+        return CommandError(
+            "Their hall has live performances at the same time, "
+            "reschedule them first: " + ", ".join(map(str, performance_ids))
+        )
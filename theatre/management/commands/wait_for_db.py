@@ -1,22 +1,73 @@
+import random
 import time
 
 from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
     """Django command to pause execution until database is available"""
 
-    def handle(self, *args, **kwargs):
+    help = (
+        "Wait for the database with exponential backoff and full jitter, "
+        "so many pods starting at once do not retry in lockstep."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=60.0,
+            help="Give up after this many seconds (0 waits forever)",
+        )
+        parser.add_argument(
+            "--initial-delay",
+            type=float,
+            default=0.5,
+            help="Upper bound of the first retry delay in seconds",
+        )
+        parser.add_argument(
+            "--max-delay",
+            type=float,
+            default=10.0,
+            help="Upper bound of any retry delay in seconds",
+        )
+
+    def handle(self, *args, **options):
         self.stdout.write("Waiting for database...")
-        db_conn = None
-        while not db_conn:
+        db_connection = connections[options["database"]]
+        deadline = (
+            time.monotonic() + options["timeout"]
+            if options["timeout"] else None
+        )
+        attempt = 0
+
+        while True:
             try:
-                db_connection = connections["default"]
                 db_connection.ensure_connection()
-                db_conn = True
-            except OperationalError:
-                self.stdout.write("Database unavailable, waiting 1 second...")
-                time.sleep(1)
+                break
+            except OperationalError as error:
+                delay = random.uniform(
+                    0,
+                    min(
+                        options["max_delay"],
+                        options["initial_delay"] * 2 ** attempt,
+                    ),
+                )
+                attempt += 1
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise CommandError(
+                            f"Database unavailable after {attempt} "
+                            f"attempt(s): {error}"
+                        )
+                    delay = min(delay, remaining)
+                self.stdout.write(
+                    f"Database unavailable, waiting {delay:.2f} seconds..."
+                )
+                time.sleep(delay)
+
         self.stdout.write(self.style.SUCCESS("Database available"))
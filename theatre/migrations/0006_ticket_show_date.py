@@ -0,0 +1,33 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_show_date(apps, schema_editor):
+    Performance = apps.get_model("theatre", "Performance")
+    Ticket = apps.get_model("theatre", "Ticket")
+    Ticket.objects.update(
+        show_date=Subquery(
+            Performance.objects.filter(pk=OuterRef("performance_id"))
+            .values("show_time__date")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("theatre", "0005_actor_image_play_image"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ticket",
+            name="show_date",
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_show_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="ticket",
+            name="show_date",
+            field=models.DateField(editable=False),
+        ),
+    ]
@@ -0,0 +1,87 @@
+import datetime
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, OuterRef, Subquery
+
+
+DURATION_VALIDATORS = [
+    django.core.validators.MinValueValidator(datetime.timedelta(seconds=60)),
+    django.core.validators.MaxValueValidator(datetime.timedelta(hours=12)),
+]
+
+
+def fill_durations(apps, schema_editor):
+    Play = apps.get_model("theatre", "Play")
+    Performance = apps.get_model("theatre", "Performance")
+    Performance.objects.update(
+        duration=Subquery(
+            Play.objects.filter(pk=OuterRef("play_id")).values(
+                "default_duration"
+            )[:1]
+        )
+    )
+    Performance.objects.update(
+        end_time=ExpressionWrapper(
+            F("show_time") + F("duration"),
+            output_field=models.DateTimeField(),
+        )
+    )
+    if schema_editor.connection.vendor == "postgresql":
+        # Run the deferred foreign key checks of the updated rows now, the
+        # table cannot be altered while they are pending
+        schema_editor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("theatre", "0007_archivedperformance_archivedticket"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="play",
+            name="default_duration",
+            field=models.DurationField(
+                default=datetime.timedelta(seconds=7200),
+                validators=DURATION_VALIDATORS,
+            ),
+        ),
+        migrations.AddField(
+            model_name="performance",
+            name="duration",
+            field=models.DurationField(
+                blank=True, null=True, validators=DURATION_VALIDATORS
+            ),
+        ),
+        migrations.AddField(
+            model_name="performance",
+            name="end_time",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_durations, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="performance",
+            name="duration",
+            field=models.DurationField(
+                blank=True, validators=DURATION_VALIDATORS
+            ),
+        ),
+        migrations.AlterField(
+            model_name="performance",
+            name="end_time",
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AddField(
+            model_name="archivedperformance",
+            name="duration",
+            field=models.DurationField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name="performance",
+            index=models.Index(
+                fields=["theatre_hall", "show_time"],
+                name="performance_hall_time_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,91 @@
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
+from django.db import migrations, models
+from django.db.models import Func, OuterRef
+
+
+HALL_OVERLAP_CONSTRAINT = "theatre_performance_hall_no_overlap"
+# Overlapping performances listed when the constraint cannot be added
+MAX_LISTED = 50
+
+
+class TsTzRange(Func):
+    function = "TSTZRANGE"
+    output_field = DateTimeRangeField()
+
+
+def overlap_constraint():
+    return ExclusionConstraint(
+        name=HALL_OVERLAP_CONSTRAINT,
+        expressions=[
+            (TsTzRange("show_time", "end_time"), RangeOperators.OVERLAPS),
+            ("theatre_hall", RangeOperators.EQUAL),
+        ],
+    )
+
+
+def add_overlap_constraint(apps, schema_editor):
+    """
+    On PostgreSQL, make overlapping performances in a hall impossible with
+    a GiST exclusion constraint. Comparing the hall ids in a GiST index
+    needs the btree_gist extension; the migration fails without it, or
+    while a hall has overlapping performances, listing them.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Performance = apps.get_model("theatre", "Performance")
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'btree_gist'"
+        )
+        available = cursor.fetchone() is not None
+    if not available:
+        raise RuntimeError(
+            f"{HALL_OVERLAP_CONSTRAINT} needs the btree_gist extension of "
+            f"PostgreSQL, install the contrib modules on the server"
+        )
+    overlapping = Performance.objects.filter(
+        theatre_hall=OuterRef("theatre_hall"),
+        show_time__lt=OuterRef("end_time"),
+        end_time__gt=OuterRef("show_time"),
+    ).exclude(pk=OuterRef("pk"))
+    performances = (
+        Performance.objects.filter(models.Exists(overlapping))
+        .order_by("theatre_hall", "show_time", "pk")
+        .values_list("pk", "theatre_hall", "show_time", "end_time")
+    )
+    listed = [
+        f"  performance {pk} in hall {hall}: {show_time} - {end_time}"
+        for pk, hall, show_time, end_time in performances[:MAX_LISTED + 1]
+    ]
+    if listed:
+        if len(listed) > MAX_LISTED:
+            listed[-1] = "  ..."
+        raise RuntimeError(
+            f"Cannot add {HALL_OVERLAP_CONSTRAINT}, these performances "
+            f"overlap in their hall; reschedule them and migrate again:\n"
+            + "\n".join(listed)
+        )
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    schema_editor.add_constraint(Performance, overlap_constraint())
+
+
+def remove_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"ALTER TABLE theatre_performance DROP CONSTRAINT IF EXISTS "
+        f"{HALL_OVERLAP_CONSTRAINT}"
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("theatre", "0008_performance_duration"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            add_overlap_constraint, remove_overlap_constraint
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0 on 2026-10-19 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("theatre", "0009_performance_hall_no_overlap"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="reservation",
+            name="created_at",
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name="ticket",
+            index=models.Index(fields=["show_date"], name="ticket_show_date_idx"),
+        ),
+    ]
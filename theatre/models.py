@@ -1,11 +1,19 @@
 import os
 import uuid
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
 
 from django.db import models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import TruncDate
 from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.conf import settings
+from django.utils import timezone
 from django.utils.text import slugify
 
+from theatre_service.tracing import TracedModelMixin
+
 
 def play_image_file_path(instance, filename):
     filename_without_ext, extension = os.path.splitext(filename)
@@ -58,12 +66,27 @@ class Genre(models.Model):
         return self.name
 
 
+# Bounds the overlap checks of a hall to the performances that started at
+# most this long before the checked one
+MAX_DURATION = timedelta(hours=12)
+DURATION_VALIDATORS = [
+    MinValueValidator(timedelta(minutes=1)),
+    MaxValueValidator(MAX_DURATION),
+]
+# Exclusion constraint of PostgreSQL against overlapping performances in a
+# hall, see migration 0009
+HALL_OVERLAP_CONSTRAINT = "theatre_performance_hall_no_overlap"
+
+
 class Play(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField()
     genres = models.ManyToManyField(Genre, related_name="plays", blank=True)
     actors = models.ManyToManyField(Actor, related_name="plays", blank=True)
     image = models.ImageField(null=True, upload_to=play_image_file_path)
+    default_duration = models.DurationField(
+        default=timedelta(hours=2), validators=DURATION_VALIDATORS
+    )
 
     class Meta:
         verbose_name_plural = "plays"
@@ -73,6 +96,79 @@ class Play(models.Model):
         return self.title
 
 
+class PerformanceQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """Fill in the durations and the end times of the performances"""
+        objs = list(objs)
+        missing = {
+            performance.play_id
+            for performance in objs
+            if performance.duration is None
+        }
+        if missing:
+            durations = dict(
+                Play.objects.filter(pk__in=missing).values_list(
+                    "pk", "default_duration"
+                )
+            )
+            for performance in objs:
+                if performance.duration is None:
+                    performance.duration = durations[performance.play_id]
+        for performance in objs:
+            performance.set_end_time()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def overlapping(self, theatre_hall_id, performances):
+        """
+        Return the performances of the list that overlap another one of
+        the list or a saved performance of the hall. Their end times must
+        be set. One range scan of the (theatre_hall, show_time) index,
+        bounded by MAX_DURATION, fetches the saved performances.
+        """
+        performances = sorted(
+            performances, key=lambda performance: performance.show_time
+        )
+        saved = list(
+            self.filter(
+                theatre_hall_id=theatre_hall_id,
+                show_time__gt=performances[0].show_time - MAX_DURATION,
+                show_time__lt=max(
+                    performance.end_time for performance in performances
+                ),
+            )
+            .exclude(
+                pk__in=[
+                    performance.pk
+                    for performance in performances
+                    if performance.pk is not None
+                ]
+            )
+            .order_by("show_time")
+            .values_list("show_time", "end_time")
+        )
+        starts = [show_time for show_time, end_time in saved]
+
+        overlapping = []
+        previous_end = None
+        for performance in performances:
+            candidates = saved[
+                bisect_right(starts, performance.show_time - MAX_DURATION):
+                bisect_left(starts, performance.end_time)
+            ]
+            if (
+                previous_end is not None
+                and performance.show_time < previous_end
+            ) or any(
+                end_time > performance.show_time
+                for show_time, end_time in candidates
+            ):
+                overlapping.append(performance)
+            previous_end = max(
+                previous_end or performance.end_time, performance.end_time
+            )
+        return overlapping
+
+
 class Performance(models.Model):
     show_time = models.DateTimeField()
     play = models.ForeignKey(
@@ -81,17 +177,69 @@ class Performance(models.Model):
     theatre_hall = models.ForeignKey(
         TheatreHall, on_delete=models.CASCADE, related_name="performances"
     )
+    # The default duration of the play unless set
+    duration = models.DurationField(
+        blank=True, validators=DURATION_VALIDATORS
+    )
+    # show_time + duration, what the overlap checks of a hall compare
+    end_time = models.DateTimeField(editable=False)
+
+    objects = PerformanceQuerySet.as_manager()
 
     class Meta:
         verbose_name_plural = "performances"
         ordering = ["-show_time"]
+        indexes = [
+            models.Index(
+                fields=["theatre_hall", "show_time"],
+                name="performance_hall_time_idx",
+            )
+        ]
 
     def __str__(self):
         return f"{self.play.title} {str(self.show_time)}"
 
+    def aware_show_time(self):
+        show_time = self._meta.get_field("show_time").to_python(
+            self.show_time
+        )
+        if timezone.is_naive(show_time):
+            show_time = timezone.make_aware(show_time)
+        return show_time
+
+    @property
+    def show_date(self):
+        """The local date of the show, the partition key of its tickets"""
+        return timezone.localtime(self.aware_show_time()).date()
+
+    def set_end_time(self):
+        if self.duration is None:
+            self.duration = self.play.default_duration
+        self.show_time = self.aware_show_time()
+        self.end_time = self.show_time + self.duration
+
+    def clean(self):
+        if self.play_id is None or self.theatre_hall_id is None:
+            return
+        self.set_end_time()
+        if Performance.objects.overlapping(self.theatre_hall_id, [self]):
+            raise ValidationError(
+                {"show_time": "The hall is taken at this time"}
+            )
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        self.set_end_time()
+        super().save(*args, **kwargs)
+        if not adding:
+            self.tickets.exclude(show_date=self.show_date).update(
+                show_date=self.show_date
+            )
+
 
 class Reservation(models.Model):
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Indexed for the date filter of the admin
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
@@ -104,7 +252,41 @@ class Reservation(models.Model):
         return str(self.created_at)
 
 
-class Ticket(models.Model):
+class TicketQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """Fill in the show date of the tickets that have none"""
+        objs = list(objs)
+        missing = {
+            ticket.performance_id
+            for ticket in objs
+            if ticket.show_date is None
+        }
+        if missing:
+            show_dates = {
+                performance.pk: performance.show_date
+                for performance in Performance.objects.filter(
+                    pk__in=missing
+                ).only("show_time")
+            }
+            for ticket in objs:
+                if ticket.show_date is None:
+                    ticket.show_date = show_dates[ticket.performance_id]
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def sync_show_dates(self):
+        """
+        Set the show date of the tickets to the one of their performance,
+        in one UPDATE, after show times were written without
+        `Performance.save` (e.g. by `bulk_create` or `update`)
+        """
+        show_date = Subquery(
+            Performance.objects.filter(pk=OuterRef("performance_id"))
+            .values(date=TruncDate("show_time"))[:1]
+        )
+        return self.exclude(show_date=show_date).update(show_date=show_date)
+
+
+class Ticket(TracedModelMixin, models.Model):
     performance = models.ForeignKey(
         Performance, on_delete=models.CASCADE, related_name="tickets"
     )
@@ -113,6 +295,11 @@ class Ticket(models.Model):
     )
     row = models.IntegerField()
     seat = models.IntegerField()
+    # Copy of the performance date: the key the table is partitioned by on
+    # PostgreSQL (see the partition_tickets command)
+    show_date = models.DateField(editable=False)
+
+    objects = TicketQuerySet.as_manager()
 
     @staticmethod
     def validate_seats(
@@ -158,6 +345,7 @@ class Ticket(models.Model):
         using=None,
         update_fields=None,
     ):
+        self.show_date = self.performance.show_date
         self.full_clean()
         super(Ticket, self).save(
             force_insert,
@@ -168,6 +356,72 @@ class Ticket(models.Model):
 
     class Meta:
         unique_together = ("performance", "row", "seat")
+        indexes = [
+            # The date filter of the admin, on tables not partitioned too
+            models.Index(fields=["show_date"], name="ticket_show_date_idx")
+        ]
+
+    def __str__(self):
+        return f"{str(self.performance)} (row: {self.row}, seat: {self.seat})"
+
+
+class ArchivedPerformance(models.Model):
+    """
+    A past performance moved out of the live tables by the
+    archive_performances command. It keeps the id it had as a Performance
+    and copies of the names it was shown under, so the history reads the
+    same after the play or the hall are gone.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    show_time = models.DateTimeField(db_index=True)
+    # None for performances archived before they had a duration
+    duration = models.DurationField(null=True)
+    play = models.ForeignKey(
+        Play,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="archived_performances",
+    )
+    play_title = models.CharField(max_length=255)
+    theatre_hall = models.ForeignKey(
+        TheatreHall,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="archived_performances",
+    )
+    theatre_hall_name = models.CharField(max_length=255)
+    theatre_hall_capacity = models.IntegerField()
+    tickets_sold = models.IntegerField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-show_time", "id"]
+
+    def __str__(self):
+        return f"{self.play_title} {str(self.show_time)} (archived)"
+
+
+class ArchivedTicket(models.Model):
+    """A ticket of an archived performance, with its reservation inlined"""
+
+    id = models.BigIntegerField(primary_key=True)
+    performance = models.ForeignKey(
+        ArchivedPerformance, on_delete=models.CASCADE, related_name="tickets"
+    )
+    reservation_id = models.BigIntegerField(db_index=True)
+    reservation_created_at = models.DateTimeField()
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="archived_tickets",
+    )
+    row = models.IntegerField()
+    seat = models.IntegerField()
+
+    class Meta:
+        ordering = ["id"]
 
     def __str__(self):
         return f"{str(self.performance)} (row: {self.row}, seat: {self.seat})"
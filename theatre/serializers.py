@@ -1,8 +1,30 @@
-from rest_framework import serializers
-from django.db import transaction
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import (
+    NON_FIELD_ERRORS,
+    ValidationError as DjangoValidationError,
+)
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+from rest_framework.fields import get_error_detail
+from django.db import (
+    IntegrityError,
+    OperationalError,
+    connection,
+    transaction,
+)
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 
 
 from theatre.models import (
+    DURATION_VALIDATORS,
+    HALL_OVERLAP_CONSTRAINT,
+    ArchivedPerformance,
+    ArchivedTicket,
     TheatreHall,
     Actor,
     Genre,
@@ -11,21 +33,40 @@ from theatre.models import (
     Reservation,
     Ticket,
 )
+from theatre_service import tracing
+
 
+# First key of the advisory locks taken on performances
+ADVISORY_LOCK_NAMESPACE = 1
+# SQLSTATEs of the transactions PostgreSQL rolls back to break a deadlock
+# or a serialization conflict; running them again may succeed
+RESERVATION_CONFLICTS = {
+    "40P01": "deadlock",
+    "40001": "serialization_failure",
+}
+
+
+class ReservationConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _(
+        "The seats are being reserved concurrently, try again shortly."
+    )
+    default_code = "reservation_conflict"
 
-class TheatreHallSerializer(serializers.ModelSerializer):
+
+class TheatreHallSerializer(tracing.ModelSerializer):
     class Meta:
         model = TheatreHall
         fields = ("id", "name", "rows", "seats_in_row", "theatre_capacity")
 
 
-class ActorSerializer(serializers.ModelSerializer):
+class ActorSerializer(tracing.ModelSerializer):
     class Meta:
         model = Actor
         fields = ("id", "first_name", "last_name", "full_name")
 
 
-class GenreSerializer(serializers.ModelSerializer):
+class GenreSerializer(tracing.ModelSerializer):
     class Meta:
         model = Genre
         fields = (
@@ -34,7 +75,7 @@ class GenreSerializer(serializers.ModelSerializer):
         )
 
 
-class GenreDetailSerializer(serializers.ModelSerializer):
+class GenreDetailSerializer(tracing.ModelSerializer):
     plays_in_genre = serializers.SlugRelatedField(
         source="plays", many=True, read_only=True, slug_field="title"
     )
@@ -47,10 +88,75 @@ class GenreDetailSerializer(serializers.ModelSerializer):
         )
 
 
-class PerformanceSerializer(serializers.ModelSerializer):
+def hall_taken_error(performances):
+    return serializers.ValidationError(
+        {
+            "theatre_hall": [
+                f"The hall is taken at {performance.show_time.isoformat()}"
+                for performance in performances
+            ]
+        },
+        code="overlap",
+    )
+
+
+def check_hall_free(theatre_hall, performances, lock=False):
+    """
+    Raise a ValidationError if the performances (end times set) overlap
+    each other or a saved performance of the hall. With `lock`, the hall
+    row is locked first, so the checks of concurrent transactions
+    scheduling in the hall run one after another until they commit.
+    """
+    if lock:
+        list(
+            TheatreHall.objects.select_for_update()
+            .filter(pk=theatre_hall.pk)
+            .values_list("pk")
+        )
+    overlapping = Performance.objects.overlapping(
+        theatre_hall.pk, performances
+    )
+    if overlapping:
+        raise hall_taken_error(overlapping)
+
+
+@contextmanager
+def hall_overlap_guard(performances):
+    """
+    Run the block in a transaction and report a violation of the
+    exclusion constraint of the halls as an overlap of `performances`
+    """
+    try:
+        with transaction.atomic():
+            yield
+    except IntegrityError as error:
+        if HALL_OVERLAP_CONSTRAINT not in str(error):
+            raise
+        raise hall_taken_error(performances)
+
+
+class PerformanceSerializer(tracing.ModelSerializer):
     class Meta:
         model = Performance
-        fields = ("id", "show_time", "play", "theatre_hall")
+        fields = (
+            "id", "show_time", "duration", "end_time", "play", "theatre_hall"
+        )
+
+    def create(self, validated_data):
+        return self.schedule(Performance(**validated_data))
+
+    def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        return self.schedule(instance)
+
+    @staticmethod
+    def schedule(performance):
+        performance.set_end_time()
+        with hall_overlap_guard([performance]):
+            check_hall_free(performance.theatre_hall, [performance], lock=True)
+            performance.save()
+        return performance
 
 
 class PerformanceTicketSerializer(PerformanceSerializer):
@@ -72,7 +178,7 @@ class PerformanceHallSerializer(PerformanceSerializer):
         fields = ("id", "show_time", "play_title")
 
 
-class TicketSerializer(serializers.ModelSerializer):
+class TicketSerializer(tracing.ModelSerializer):
     class Meta:
         model = Ticket
         fields = ("id", "row", "seat", "performance")
@@ -103,10 +209,13 @@ class TicketSeatSerializer(TicketSerializer):
         fields = ("row", "seat")
 
 
-class PlaySerializer(serializers.ModelSerializer):
+class PlaySerializer(tracing.ModelSerializer):
     class Meta:
         model = Play
-        fields = ("id", "title", "description", "genres", "actors")
+        fields = (
+            "id", "title", "description", "default_duration", "genres",
+            "actors",
+        )
 
 
 class PlayListSerializer(PlaySerializer):
@@ -128,7 +237,15 @@ class PlayDetailSerializer(PlaySerializer):
 
     class Meta:
         model = Play
-        fields = ("id", "title", "description", "genres", "actors", "image")
+        fields = (
+            "id",
+            "title",
+            "description",
+            "default_duration",
+            "genres",
+            "actors",
+            "image",
+        )
 
 
 class ActorDetailSerializer(ActorSerializer):
@@ -156,7 +273,7 @@ class TheatreHallDetailSerializer(TheatreHallSerializer):
         )
 
 
-class ReservationSerializer(serializers.ModelSerializer):
+class ReservationSerializer(tracing.ModelSerializer):
     tickets = TicketSerializer(many=True, read_only=False, allow_empty=False)
 
     class Meta:
@@ -164,13 +281,107 @@ class ReservationSerializer(serializers.ModelSerializer):
         fields = ("id", "tickets", "created_at")
 
     def create(self, validated_data):
-        with transaction.atomic():
-            tickets_data = validated_data.pop("tickets")
-            reservation = Reservation.objects.create(**validated_data)
+        tickets_data = validated_data.pop("tickets")
+        locking = settings.RESERVATION_LOCKING
+
+        if locking != "none":
+            # Concurrent reservations insert (and lock) the same seats in
+            # the same order, so they wait for each other, not deadlock
+            tickets_data = sorted(
+                tickets_data,
+                key=lambda ticket: (
+                    ticket["performance"].pk, ticket["row"], ticket["seat"]
+                ),
+            )
+
+        # A transaction rolled back by the database is retried, unless it
+        # runs inside another one that it would leave broken
+        attempts = 1
+        if not connection.in_atomic_block:
+            attempts += settings.RESERVATION_RETRIES
+        for attempt in range(attempts):
+            try:
+                return self.reserve(locking, tickets_data, validated_data)
+            except OperationalError as error:
+                code = RESERVATION_CONFLICTS.get(
+                    getattr(error.__cause__, "pgcode", None)
+                )
+                if code is None:
+                    raise
+        raise ReservationConflict(code=code)
+
+    @staticmethod
+    def reserve(locking, tickets_data, validated_data):
+        try:
+            with transaction.atomic():
+                lock_for_reservation(
+                    locking,
+                    sorted(
+                        {ticket["performance"].pk for ticket in tickets_data}
+                    ),
+                )
+                reservation = Reservation.objects.create(**validated_data)
+
+                for ticket_data in tickets_data:
+                    Ticket.objects.create(
+                        reservation=reservation, **ticket_data
+                    )
+                return reservation
+        except DjangoValidationError as error:
+            # Seats taken after the serializer validated the payload ...
+            if not any(
+                item.code == "unique_together"
+                for item in error.error_dict.get(NON_FIELD_ERRORS, ())
+            ):
+                raise serializers.ValidationError(get_error_detail(error))
+            raise seat_taken_error()
+        except IntegrityError:
+            # ... or by a transaction that committed while this one waited
+            raise seat_taken_error()
+
+
+def seat_taken_error():
+    return serializers.ValidationError(
+        {"tickets": ["One of the seats is already taken."]}, code="unique"
+    )
 
-            for ticket_data in tickets_data:
-                Ticket.objects.create(reservation=reservation, **ticket_data)
-            return reservation
+
+def lock_for_reservation(locking, performance_ids):
+    """
+    Apply the RESERVATION_LOCKING strategy at the start of the
+    reservation transaction:
+
+    - "none" / "ordered": rely on the unique constraint of the tickets
+    - "row": lock the performance rows (SELECT ... FOR UPDATE)
+    - "advisory": take a transaction-level advisory lock per performance
+      (PostgreSQL only, falls back to "row")
+    - "serializable": run the transaction at the SERIALIZABLE isolation
+      level (PostgreSQL only, outermost transactions only); callers
+      retry serialization failures instead of waiting
+    """
+    if locking == "row" or (
+        locking == "advisory" and connection.vendor != "postgresql"
+    ):
+        list(
+            Performance.objects.select_for_update()
+            .filter(pk__in=performance_ids)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+    elif locking == "advisory":
+        with connection.cursor() as cursor:
+            for performance_id in performance_ids:
+                cursor.execute(
+                    "SELECT pg_advisory_xact_lock(%s, %s)",
+                    [ADVISORY_LOCK_NAMESPACE, performance_id],
+                )
+    elif (
+        locking == "serializable"
+        and connection.vendor == "postgresql"
+        and len(connection.atomic_blocks) == 1
+    ):
+        with connection.cursor() as cursor:
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL SERIALIZABLE")
 
 
 class PerformanceDetailSerializer(PerformanceSerializer):
@@ -182,7 +393,14 @@ class PerformanceDetailSerializer(PerformanceSerializer):
 
     class Meta:
         model = Performance
-        fields = ("id", "show_time", "play", "theatre_hall", "taken_places")
+        fields = (
+            "id",
+            "show_time",
+            "end_time",
+            "play",
+            "theatre_hall",
+            "taken_places",
+        )
 
 
 class PerformanceListSerializer(PerformanceSerializer):
@@ -200,6 +418,7 @@ class PerformanceListSerializer(PerformanceSerializer):
         fields = (
             "id",
             "show_time",
+            "end_time",
             "play_title",
             "theatre_hall_name",
             "theatre_hall_capacity",
@@ -207,6 +426,100 @@ class PerformanceListSerializer(PerformanceSerializer):
         )
 
 
+def recurrence(weekdays, times, start_date, end_date):
+    """Yield the aware show times of a recurrence rule, in order"""
+    times = sorted(set(times))
+    day = start_date
+    while day <= end_date:
+        if day.weekday() in weekdays:
+            for time in times:
+                yield timezone.make_aware(datetime.combine(day, time))
+        day += timedelta(days=1)
+
+
+class PerformanceScheduleSerializer(tracing.Serializer):
+    """
+    A season of performances of one play in one hall: at each of `times`
+    on each of `weekdays` (0 is Monday) from `start_date` to `end_date`,
+    both included, in the current time zone, lasting `duration` (the
+    default duration of the play if not given). With `dry_run` nothing is
+    saved and the performances are only returned.
+    """
+
+    MAX_PERFORMANCES = 1000
+
+    play = serializers.PrimaryKeyRelatedField(queryset=Play.objects.all())
+    theatre_hall = serializers.PrimaryKeyRelatedField(
+        queryset=TheatreHall.objects.all()
+    )
+    weekdays = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6),
+        allow_empty=False,
+    )
+    times = serializers.ListField(
+        child=serializers.TimeField(), allow_empty=False
+    )
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    duration = serializers.DurationField(
+        required=False, validators=DURATION_VALIDATORS
+    )
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if attrs["end_date"] < attrs["start_date"]:
+            raise serializers.ValidationError(
+                {"end_date": "must not be before start_date"}
+            )
+        # Stop at one past the limit, however long the date range is
+        show_times = list(
+            islice(
+                recurrence(
+                    set(attrs["weekdays"]),
+                    attrs["times"],
+                    attrs["start_date"],
+                    attrs["end_date"],
+                ),
+                self.MAX_PERFORMANCES + 1,
+            )
+        )
+        if not show_times:
+            raise serializers.ValidationError(
+                "The rule matches no show times"
+            )
+        if len(show_times) > self.MAX_PERFORMANCES:
+            raise serializers.ValidationError(
+                f"The rule matches more than {self.MAX_PERFORMANCES} show "
+                f"times, schedule the season in parts"
+            )
+
+        performances = [
+            Performance(
+                play=attrs["play"],
+                theatre_hall=attrs["theatre_hall"],
+                show_time=show_time,
+                duration=attrs.get("duration"),
+            )
+            for show_time in show_times
+        ]
+        for performance in performances:
+            performance.set_end_time()
+        check_hall_free(attrs["theatre_hall"], performances)
+        attrs["performances"] = performances
+        return attrs
+
+    def create(self, validated_data):
+        performances = validated_data["performances"]
+        if validated_data["dry_run"]:
+            return performances
+        with hall_overlap_guard(performances):
+            # Check again, now that concurrent schedulers wait for us
+            check_hall_free(
+                validated_data["theatre_hall"], performances, lock=True
+            )
+            return Performance.objects.bulk_create(performances)
+
+
 class TicketReservationSerializer(TicketSerializer):
     performance = PerformanceListSerializer(many=False, read_only=False)
 
@@ -225,13 +538,97 @@ class ReservationDetailSerializer(ReservationSerializer):
         fields = ("id", "tickets", "created_at")
 
 
-class PlayImageSerializer(serializers.ModelSerializer):
+class PlayImageSerializer(tracing.ModelSerializer):
     class Meta:
         model = Play
         fields = ("id", "image")
 
 
-class ActorImageSerializer(serializers.ModelSerializer):
+class ActorImageSerializer(tracing.ModelSerializer):
     class Meta:
         model = Actor
         fields = ("id", "image")
+
+
+class ArchivedPerformanceSerializer(tracing.ModelSerializer):
+    class Meta:
+        model = ArchivedPerformance
+        fields = (
+            "id",
+            "show_time",
+            "play",
+            "play_title",
+            "theatre_hall",
+            "theatre_hall_name",
+            "theatre_hall_capacity",
+            "tickets_sold",
+            "archived_at",
+        )
+
+
+class ArchivedTicketSerializer(tracing.ModelSerializer):
+    play_title = serializers.CharField(
+        source="performance.play_title", read_only=True
+    )
+    show_time = serializers.DateTimeField(
+        source="performance.show_time", read_only=True
+    )
+
+    class Meta:
+        model = ArchivedTicket
+        fields = (
+            "id",
+            "row",
+            "seat",
+            "performance",
+            "play_title",
+            "show_time",
+            "reservation_id",
+            "reservation_created_at",
+        )
+
+
+class AnalyticsQuerySerializer(tracing.Serializer):
+    """
+    The performances shown from `date_from` to `date_to`, both included,
+    grouped by `group_by`; the sales velocity is the tickets sold per day
+    over the last `velocity_days`
+    """
+
+    group_by = serializers.ChoiceField(
+        choices=("play", "hall", "genre", "day"), default="play"
+    )
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    velocity_days = serializers.IntegerField(
+        min_value=1, max_value=365, default=7
+    )
+
+    def validate(self, attrs):
+        if (
+            attrs.get("date_from")
+            and attrs.get("date_to")
+            and attrs["date_to"] < attrs["date_from"]
+        ):
+            raise serializers.ValidationError(
+                {"date_to": "must not be before date_from"}
+            )
+        return attrs
+
+
+class AnalyticsRowSerializer(tracing.Serializer):
+    key = serializers.JSONField(help_text="Id of the group, or the day")
+    label = serializers.CharField()
+    performances = serializers.IntegerField()
+    capacity = serializers.IntegerField()
+    tickets_sold = serializers.IntegerField()
+    occupancy = serializers.FloatField(help_text="Tickets sold / capacity")
+    sales_velocity = serializers.FloatField(
+        help_text="Tickets sold per day over the last velocity_days"
+    )
+
+
+class AnalyticsSerializer(tracing.Serializer):
+    group_by = serializers.CharField()
+    generated_at = serializers.DateTimeField()
+    results = AnalyticsRowSerializer(many=True)
@@ -0,0 +1,18 @@
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+
+from theatre.models import Performance, Ticket
+
+
+@receiver(pre_save, sender=Performance)
+def fill_performance_end_time(sender, instance, raw, **kwargs):
+    """Performance.save sets the end time, but loaddata saves rows raw"""
+    if raw and instance.end_time is None:
+        instance.set_end_time()
+
+
+@receiver(pre_save, sender=Ticket)
+def fill_ticket_show_date(sender, instance, raw, **kwargs):
+    """Ticket.save copies the show date, but loaddata saves rows raw"""
+    if raw and instance.show_date is None:
+        instance.show_date = instance.performance.show_date
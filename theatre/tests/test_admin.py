@@ -0,0 +1,135 @@
+from datetime import datetime, timezone
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from theatre.admin import TicketInline
+from theatre.models import (
+    Performance,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+
+
+class AdminTests(TestCase):
+    def setUp(self) -> None:
+        self.admin = get_user_model().objects.create_superuser(
+            "admin@admin.com", "testpass"
+        )
+        self.client.force_login(self.admin)
+        self.play = Play.objects.create(title="Play", description="-")
+        self.hall = TheatreHall.objects.create(
+            name="Blue", rows=10, seats_in_row=10
+        )
+        self.performance = Performance.objects.create(
+            play=self.play,
+            theatre_hall=self.hall,
+            show_time=datetime(2024, 3, 10, 19, tzinfo=timezone.utc),
+        )
+        self.reservation = Reservation.objects.create(user=self.admin)
+
+    def book(self, count):
+        Ticket.objects.bulk_create(
+            Ticket(
+                performance=self.performance,
+                reservation=self.reservation,
+                row=number // 10 + 1,
+                seat=number % 10 + 1,
+            )
+            for number in range(Ticket.objects.count(), count)
+        )
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        return len(context)
+
+    def test_changelists_do_not_grow_with_rows(self):
+        urls = [
+            reverse(f"admin:theatre_{model}_changelist")
+            for model in ("ticket", "reservation", "performance")
+        ]
+        self.book(2)
+        self.client.get(urls[0])  # the admin theme caches its settings
+        few = [self.queries(url) for url in urls]
+
+        self.book(30)
+        Reservation.objects.create(user=self.admin)
+        Performance.objects.create(
+            play=self.play,
+            theatre_hall=self.hall,
+            show_time=datetime(2024, 3, 11, 19, tzinfo=timezone.utc),
+        )
+
+        self.assertEqual([self.queries(url) for url in urls], few)
+
+    def test_date_filters_are_indexed(self):
+        for model, column in (
+            (Reservation, "created_at"),
+            (Ticket, "show_date"),
+        ):
+            with connection.cursor() as cursor:
+                constraints = connection.introspection.get_constraints(
+                    cursor, model._meta.db_table
+                )
+            self.assertIn(
+                [column],
+                [
+                    constraint["columns"]
+                    for constraint in constraints.values()
+                    if constraint["index"]
+                ],
+            )
+
+    def test_inline_shows_one_page(self):
+        self.book(TicketInline.per_page + 5)
+        url = reverse(
+            "admin:theatre_performance_change", args=[self.performance.id]
+        )
+
+        first = self.client.get(url)
+        second = self.client.get(url, {"tickets-page": 2})
+
+        formset = first.context["inline_admin_formsets"][0].formset
+        self.assertEqual(formset.initial_form_count(), TicketInline.per_page)
+        self.assertContains(first, "?tickets-page=2")
+        formset = second.context["inline_admin_formsets"][0].formset
+        self.assertEqual(formset.initial_form_count(), 5)
+
+    def test_inline_saves_its_page(self):
+        self.book(TicketInline.per_page + 5)
+        url = reverse(
+            "admin:theatre_reservation_change", args=[self.reservation.id]
+        )
+        res = self.client.get(url, {"tickets-page": 2})
+        formset = res.context["inline_admin_formsets"][0].formset
+        data = {
+            "user": self.admin.id,
+            "tickets-TOTAL_FORMS": 5,
+            "tickets-INITIAL_FORMS": 5,
+        }
+        for index, form in enumerate(formset.initial_forms):
+            ticket = form.instance
+            data.update(
+                {
+                    f"tickets-{index}-id": ticket.id,
+                    f"tickets-{index}-reservation": self.reservation.id,
+                    f"tickets-{index}-performance": self.performance.id,
+                    f"tickets-{index}-row": ticket.row,
+                    f"tickets-{index}-seat": ticket.seat,
+                }
+            )
+        data["tickets-0-DELETE"] = "on"
+
+        res = self.client.post(f"{url}?tickets-page=2", data)
+
+        self.assertEqual(res.status_code, 302)
+        self.assertEqual(
+            Ticket.objects.count(), TicketInline.per_page + 4
+        )
@@ -0,0 +1,203 @@
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone as django_timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from theatre.analytics import cache_key
+from theatre.models import (
+    Genre,
+    Performance,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+
+
+ANALYTICS_URL = reverse("theatre:analytics-list")
+
+
+@override_settings(QUERY_BUDGET_MODE="raise", ANALYTICS_CACHE_SECONDS=60)
+class AnalyticsTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.admin = get_user_model().objects.create_superuser(
+            "admin@admin.com", "testpass"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        drama = Genre.objects.create(name="Drama")
+        comedy = Genre.objects.create(name="Comedy")
+        self.hamlet = Play.objects.create(title="Hamlet", description="-")
+        self.hamlet.genres.add(drama)
+        self.farce = Play.objects.create(title="Farce", description="-")
+        self.farce.genres.add(drama, comedy)
+        self.small = TheatreHall.objects.create(
+            name="Small", rows=2, seats_in_row=5
+        )
+        self.large = TheatreHall.objects.create(
+            name="Large", rows=10, seats_in_row=10
+        )
+        self.first = self.performance(self.hamlet, self.small, day=10)
+        self.second = self.performance(self.hamlet, self.large, day=11)
+        self.third = self.performance(self.farce, self.small, day=11, hour=14)
+        self.book(self.first, 5)
+        self.book(self.second, 20, days_ago=30)
+        self.book(self.third, 2)
+
+    def performance(self, play, hall, day, hour=19):
+        return Performance.objects.create(
+            play=play,
+            theatre_hall=hall,
+            show_time=datetime(2024, 3, day, hour, tzinfo=timezone.utc),
+        )
+
+    def book(self, performance, count, days_ago=0, start=0):
+        reservation = Reservation.objects.create(user=self.admin)
+        Reservation.objects.filter(pk=reservation.pk).update(
+            created_at=django_timezone.now() - timedelta(days=days_ago)
+        )
+        seats_in_row = performance.theatre_hall.seats_in_row
+        Ticket.objects.bulk_create(
+            Ticket(
+                performance=performance,
+                reservation=reservation,
+                row=number // seats_in_row + 1,
+                seat=number % seats_in_row + 1,
+            )
+            for number in range(start, start + count)
+        )
+
+    def get(self, **params):
+        res = self.client.get(ANALYTICS_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def rows(self, **params):
+        return {
+            row["label"]: (
+                row["performances"],
+                row["capacity"],
+                row["tickets_sold"],
+                row["occupancy"],
+                row["sales_velocity"],
+            )
+            for row in self.get(**params)["results"]
+        }
+
+    def test_group_by_play(self):
+        self.assertEqual(
+            self.rows(group_by="play"),
+            {
+                "Hamlet": (2, 110, 25, 0.2273, 0.71),
+                "Farce": (1, 10, 2, 0.2, 0.29),
+            },
+        )
+
+    def test_group_by_hall(self):
+        self.assertEqual(
+            self.rows(group_by="hall"),
+            {
+                "Small": (2, 20, 7, 0.35, 1.0),
+                "Large": (1, 100, 20, 0.2, 0.0),
+            },
+        )
+
+    def test_group_by_genre(self):
+        self.assertEqual(
+            self.rows(group_by="genre", velocity_days=1),
+            {
+                "Drama": (3, 120, 27, 0.225, 7.0),
+                "Comedy": (1, 10, 2, 0.2, 2.0),
+            },
+        )
+
+    def test_group_by_day_within_dates(self):
+        self.assertEqual(
+            self.rows(group_by="day", date_from="2024-03-11"),
+            {"2024-03-11": (2, 110, 22, 0.2, 0.29)},
+        )
+        self.assertEqual(
+            self.rows(
+                group_by="day", date_from="2024-03-10", date_to="2024-03-10"
+            ),
+            {"2024-03-10": (1, 10, 5, 0.5, 0.71)},
+        )
+
+    def test_report_is_cached_per_time_bucket(self):
+        with mock.patch("theatre.analytics.time") as clock:
+            clock.time.return_value = 6000
+            first = self.get(group_by="hall")
+            self.book(self.second, 10, start=20)
+
+            clock.time.return_value = 6059
+            with self.assertNumQueries(0):
+                self.assertEqual(self.get(group_by="hall"), first)
+
+            clock.time.return_value = 6060
+            fresh = self.get(group_by="hall")
+
+        self.assertEqual(first["generated_at"], "1970-01-01T01:40:00Z")
+        self.assertEqual(
+            [row["tickets_sold"] for row in fresh["results"]], [7, 30]
+        )
+
+    def test_previous_report_served_while_one_is_computed(self):
+        with mock.patch("theatre.analytics.time") as clock:
+            clock.time.return_value = 6000
+            first = self.get(group_by="hall")
+            self.book(self.second, 10, start=20)
+
+            clock.time.return_value = 6060
+            key = cache_key(101, "hall", None, None, 7)
+            cache.add(f"{key}:lock", True)
+            with self.assertNumQueries(0):
+                self.assertEqual(self.get(group_by="hall"), first)
+
+            cache.delete(f"{key}:lock")
+            fresh = self.get(group_by="hall")
+
+        self.assertEqual(
+            [row["tickets_sold"] for row in fresh["results"]], [7, 30]
+        )
+
+    @override_settings(ANALYTICS_CACHE_SECONDS=0)
+    def test_cache_can_be_turned_off(self):
+        first = self.get(group_by="hall")
+        self.book(self.second, 10, start=20)
+
+        fresh = self.get(group_by="hall")
+
+        self.assertEqual(
+            [row["tickets_sold"] for row in first["results"]], [7, 20]
+        )
+        self.assertEqual(
+            [row["tickets_sold"] for row in fresh["results"]], [7, 30]
+        )
+
+    def test_invalid_query(self):
+        for params in (
+            {"group_by": "actor"},
+            {"velocity_days": 0},
+            {"date_from": "2024-03-11", "date_to": "2024-03-10"},
+        ):
+            with self.subTest(params):
+                res = self.client.get(ANALYTICS_URL, params)
+                self.assertEqual(
+                    res.status_code, status.HTTP_400_BAD_REQUEST
+                )
+
+    def test_only_admins(self):
+        self.client.force_authenticate(
+            get_user_model().objects.create_user("user@user.com", "testpass")
+        )
+
+        res = self.client.get(ANALYTICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
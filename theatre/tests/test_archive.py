@@ -0,0 +1,272 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from theatre.archive import RestoreConflict, restore_batch
+from theatre.models import (
+    ArchivedPerformance,
+    ArchivedTicket,
+    Performance,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+
+
+ARCHIVED_PERFORMANCES_URL = reverse("theatre:archivedperformance-list")
+ARCHIVED_TICKETS_URL = reverse("theatre:archivedticket-list")
+
+
+def live_rows():
+    return {
+        "performances": list(Performance.objects.order_by("id").values()),
+        "reservations": list(Reservation.objects.order_by("id").values()),
+        "tickets": list(Ticket.objects.order_by("id").values()),
+    }
+
+
+class ArchiveFixtureMixin:
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            "user@user.com", "testpass"
+        )
+        self.other = get_user_model().objects.create_user(
+            "other@user.com", "testpass"
+        )
+        self.hall = TheatreHall.objects.create(
+            name="Blue", rows=5, seats_in_row=5
+        )
+        self.play = Play.objects.create(title="Forest Song", description="-")
+        now = timezone.now()
+        self.old = self.performance(now - timedelta(days=400))
+        self.older = self.performance(now - timedelta(days=500))
+        self.upcoming = self.performance(now + timedelta(days=5))
+
+        # One reservation only for the past, one also for the future
+        self.past_reservation = self.reserve(self.user, (self.old, 1))
+        self.mixed_reservation = self.reserve(
+            self.other, (self.older, 2), (self.upcoming, 3)
+        )
+
+    def performance(self, show_time):
+        return Performance.objects.create(
+            play=self.play, theatre_hall=self.hall, show_time=show_time
+        )
+
+    def reserve(self, user, *seats):
+        reservation = Reservation.objects.create(user=user)
+        for performance, seat in seats:
+            Ticket.objects.create(
+                performance=performance,
+                reservation=reservation,
+                row=1,
+                seat=seat,
+            )
+        return reservation
+
+    def archive(self, *args):
+        out = StringIO()
+        call_command("archive_performances", *args, stdout=out)
+        return out.getvalue()
+
+
+class ArchiveCommandTests(ArchiveFixtureMixin, TestCase):
+    def test_archive_moves_past_performances(self):
+        self.archive("--older-than-days", "365")
+
+        self.assertEqual(
+            list(Performance.objects.values_list("id", flat=True)),
+            [self.upcoming.id],
+        )
+        self.assertEqual(
+            set(ArchivedPerformance.objects.values_list("id", flat=True)),
+            {self.old.id, self.older.id},
+        )
+        archived = ArchivedPerformance.objects.get(id=self.old.id)
+        self.assertEqual(archived.play_title, "Forest Song")
+        self.assertEqual(archived.theatre_hall_name, "Blue")
+        self.assertEqual(archived.theatre_hall_capacity, 25)
+        self.assertEqual(archived.tickets_sold, 1)
+
+        ticket = ArchivedTicket.objects.get(performance=self.old.id)
+        self.assertEqual(ticket.user, self.user)
+        self.assertEqual(ticket.reservation_id, self.past_reservation.id)
+        self.assertEqual(
+            ticket.reservation_created_at, self.past_reservation.created_at
+        )
+
+    def test_reservations_with_upcoming_tickets_are_kept(self):
+        self.archive("--older-than-days", "365")
+
+        self.assertEqual(
+            list(Reservation.objects.values_list("id", flat=True)),
+            [self.mixed_reservation.id],
+        )
+        self.assertEqual(
+            [ticket.seat for ticket in self.mixed_reservation.tickets.all()],
+            [3],
+        )
+
+    def test_batches_are_bounded(self):
+        output = self.archive(
+            "--older-than-days", "365", "--batch-size", "1",
+            "--max-batches", "1",
+        )
+
+        self.assertIn("Archived 1 performances", output)
+        # Oldest first
+        self.assertEqual(
+            list(ArchivedPerformance.objects.values_list("id", flat=True)),
+            [self.older.id],
+        )
+
+    def test_dry_run(self):
+        output = self.archive("--older-than-days", "450", "--dry-run")
+
+        self.assertIn("1 performances", output)
+        self.assertEqual(ArchivedPerformance.objects.count(), 0)
+
+
+class RestoreCommandTests(ArchiveFixtureMixin, TestCase):
+    def restore(self, *args):
+        call_command(
+            "restore_performances", *args, stdout=StringIO(), stderr=StringIO()
+        )
+
+    def test_restore_round_trip(self):
+        before = live_rows()
+        self.archive("--older-than-days", "365")
+
+        self.restore("--until", timezone.localdate().isoformat())
+
+        self.assertEqual(live_rows(), before)
+        self.assertFalse(ArchivedPerformance.objects.exists())
+        self.assertFalse(ArchivedTicket.objects.exists())
+
+    def test_restore_by_id(self):
+        self.archive("--older-than-days", "365")
+
+        self.restore(str(self.old.id))
+
+        self.assertTrue(Performance.objects.filter(id=self.old.id).exists())
+        self.assertEqual(
+            list(ArchivedPerformance.objects.values_list("id", flat=True)),
+            [self.older.id],
+        )
+
+    def test_performance_of_deleted_play_stays_archived(self):
+        self.archive("--older-than-days", "365")
+        self.play.delete()
+
+        self.restore(str(self.old.id))
+
+        self.assertTrue(
+            ArchivedPerformance.objects.filter(id=self.old.id).exists()
+        )
+        self.assertFalse(Performance.objects.filter(id=self.old.id).exists())
+
+    def test_needs_a_selection(self):
+        with self.assertRaises(CommandError):
+            self.restore()
+
+    def test_conflict_with_a_rescheduled_hall(self):
+        self.archive("--older-than-days", "365")
+        Performance.objects.create(
+            play=self.play, theatre_hall=self.hall,
+            show_time=self.old.show_time + timedelta(minutes=30),
+        )
+
+        with self.assertRaisesMessage(CommandError, str(self.old.id)):
+            self.restore("--until", timezone.localdate().isoformat())
+
+        # Nothing is restored, not even the performance without a conflict
+        self.assertEqual(ArchivedPerformance.objects.count(), 2)
+        self.assertFalse(
+            Performance.objects.filter(
+                id__in=[self.old.id, self.older.id]
+            ).exists()
+        )
+
+    def test_restore_batch_checks_for_conflicts(self):
+        self.archive("--older-than-days", "365")
+        Performance.objects.create(
+            play=self.play, theatre_hall=self.hall,
+            show_time=self.old.show_time - timedelta(minutes=30),
+        )
+
+        with self.assertRaises(RestoreConflict) as conflict:
+            restore_batch([self.old.id, self.older.id])
+
+        self.assertEqual(conflict.exception.performance_ids, [self.old.id])
+        self.assertEqual(ArchivedPerformance.objects.count(), 2)
+
+
+class ArchiveApiTests(ArchiveFixtureMixin, TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.archive("--older-than-days", "365")
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        res = self.client.get(ARCHIVED_PERFORMANCES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_list_archived_performances(self):
+        other_play = Play.objects.create(title="Other", description="-")
+        ArchivedPerformance.objects.filter(id=self.old.id).update(
+            play=other_play
+        )
+        self.client.force_authenticate(self.user)
+
+        res = self.client.get(
+            ARCHIVED_PERFORMANCES_URL, {"play": str(other_play.id)}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [row["id"] for row in res.data["results"]], [self.old.id]
+        )
+
+    def test_archived_performances_are_read_only(self):
+        self.client.force_authenticate(
+            get_user_model().objects.create_superuser(
+                "admin@admin.com", "testpass"
+            )
+        )
+
+        res = self.client.delete(
+            reverse("theatre:archivedperformance-detail", args=[self.old.id])
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_users_see_their_own_tickets(self):
+        self.client.force_authenticate(self.user)
+
+        res = self.client.get(ARCHIVED_TICKETS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        (ticket,) = res.data["results"]
+        self.assertEqual(ticket["performance"], self.old.id)
+        self.assertEqual(ticket["play_title"], "Forest Song")
+        self.assertEqual(ticket["reservation_id"], self.past_reservation.id)
+
+    def test_admins_see_every_ticket(self):
+        self.client.force_authenticate(
+            get_user_model().objects.create_superuser(
+                "admin@admin.com", "testpass"
+            )
+        )
+
+        res = self.client.get(ARCHIVED_TICKETS_URL)
+
+        self.assertEqual(res.data["count"], 2)
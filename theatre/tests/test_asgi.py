@@ -0,0 +1,93 @@
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from theatre.models import Play
+from theatre.tests.test_tracing import TRACE_IN_MEMORY
+from theatre_service import tracing
+from theatre_service.db.instrumentation import SyncAndAsyncMiddleware
+from theatre_service.metrics import DB_QUERIES
+from theatre_service.profiling import (
+    DEFAULT_CONFIG,
+    HEADER,
+    config,
+    make_token,
+    profile_store,
+)
+
+
+INSTRUMENTATION = [
+    "theatre_service.tracing.TracingMiddleware",
+    "theatre_service.metrics.MetricsMiddleware",
+    "theatre_service.db.instrumentation.QueryBudgetMiddleware",
+    "theatre_service.db.slow_queries.SlowQueryMiddleware",
+    "theatre_service.db.routers.ReplicaRoutingMiddleware",
+    "theatre_service.profiling.ProfilingMiddleware",
+]
+
+
+class SyncAndAsyncMiddlewareTests(SimpleTestCase):
+    def test_passes_requests_on_by_default(self):
+        response = HttpResponse()
+
+        async def async_view(request):
+            return response
+
+        self.assertIs(
+            SyncAndAsyncMiddleware(lambda request: response)(None), response
+        )
+        middleware = SyncAndAsyncMiddleware(async_view)
+        self.assertTrue(middleware.async_mode)
+        self.assertIs(async_to_sync(middleware)(None), response)
+
+
+@override_settings(TRACING=TRACE_IN_MEMORY, METRICS_ENABLED=True)
+class AsgiInstrumentationTests(TestCase):
+    def setUp(self) -> None:
+        tracing.outbox.clear()
+        config.set(DEFAULT_CONFIG)
+        profile_store.clear()
+        self.user = get_user_model().objects.create_user(
+            "user@user.com", "testpass"
+        )
+        Play.objects.create(title="Play", description="-")
+
+    @override_settings(
+        DEBUG=True,
+        MIDDLEWARE=INSTRUMENTATION,
+        DATABASE_REPLICAS=["default"],
+    )
+    def test_middlewares_are_not_adapted(self):
+        with self.assertNoLogs("django.request", "DEBUG"):
+            handler = ASGIHandler()
+
+        self.assertTrue(handler._middleware_chain.async_mode)
+
+    async def test_async_view_queries_are_observed(self):
+        view = "theatre:play-list-async"
+        token = AccessToken.for_user(self.user)
+        before = dict(DB_QUERIES._values)
+
+        res = await self.async_client.get(
+            reverse("theatre:play-list-async"),
+            headers={
+                "Authorization": f"Bearer {token}",
+                HEADER: make_token(),
+            },
+        )
+
+        self.assertEqual(res.status_code, 200)
+        (trace,) = tracing.outbox
+        self.assertEqual(res["X-Trace-Id"], trace["trace_id"])
+        self.assertTrue(
+            any(span["name"] == "db" for span in trace["spans"])
+        )
+        self.assertGreater(
+            DB_QUERIES._values.get((view,), 0), before.get((view,), 0)
+        )
+        self.assertEqual(res["X-Profiled-View"], view)
+        self.assertEqual(profile_store.views(), [view])
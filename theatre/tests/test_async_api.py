@@ -0,0 +1,108 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from theatre.models import Play, Performance, Genre, Actor, TheatreHall
+
+
+def sample_play(**params):
+    defaults = {
+        "title": "Sample play",
+        "description": "Sample description",
+    }
+    defaults.update(params)
+
+    return Play.objects.create(**defaults)
+
+
+def sample_performance(play, **params):
+    theatre_hall = TheatreHall.objects.create(
+        name="Blue", rows=20, seats_in_row=20
+    )
+
+    defaults = {
+        "show_time": "2024-03-10T14:52:15Z",
+        "play": play,
+        "theatre_hall": theatre_hall,
+    }
+    defaults.update(params)
+
+    return Performance.objects.create(**defaults)
+
+
+class UnauthenticatedAsyncApiTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        res = self.client.get(reverse("theatre:play-list-async"))
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class AuthenticatedAsyncApiTests(TestCase):
+    """Test that async endpoints answer exactly like the sync ones"""
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+
+        genre = Genre.objects.create(name="Drama")
+        actor = Actor.objects.create(first_name="George", last_name="Clooney")
+        self.play = sample_play()
+        self.play.genres.add(genre)
+        self.play.actors.add(actor)
+        self.performance = sample_performance(self.play)
+        sample_performance(sample_play(title="Other"))
+
+    def assertSameResponse(self, sync_url, async_url):
+        sync_res = self.client.get(sync_url)
+        async_res = self.client.get(async_url)
+
+        # Pagination links point back at the endpoint that was called
+        async_content = async_res.content.replace(b"/async/", b"/")
+
+        self.assertEqual(async_res.status_code, sync_res.status_code)
+        self.assertEqual(
+            json.loads(async_content), json.loads(sync_res.content)
+        )
+
+    def test_list_plays(self):
+        self.assertSameResponse(
+            reverse("theatre:play-list") + "?genres=1",
+            reverse("theatre:play-list-async") + "?genres=1",
+        )
+
+    def test_retrieve_play(self):
+        self.assertSameResponse(
+            reverse("theatre:play-detail", args=[self.play.id]),
+            reverse("theatre:play-detail-async", args=[self.play.id]),
+        )
+
+    def test_list_performances_paginated(self):
+        self.assertSameResponse(
+            reverse("theatre:performance-list") + "?page_size=1&page=2",
+            reverse("theatre:performance-list-async") + "?page_size=1&page=2",
+        )
+
+    def test_retrieve_performance(self):
+        self.assertSameResponse(
+            reverse("theatre:performance-detail", args=[self.performance.id]),
+            reverse(
+                "theatre:performance-detail-async",
+                args=[self.performance.id],
+            ),
+        )
+
+    def test_retrieve_missing_performance(self):
+        res = self.client.get(
+            reverse("theatre:performance-detail-async", args=[0])
+        )
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,150 @@
+import json
+import os
+import tempfile
+from datetime import date
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from theatre.models import (
+    Actor,
+    Genre,
+    Performance,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+
+
+def catalog():
+    """Return the catalog as comparable values"""
+    return {
+        "genres": list(Genre.objects.order_by("id").values()),
+        "actors": list(Actor.objects.order_by("id").values()),
+        "halls": list(TheatreHall.objects.order_by("id").values()),
+        "plays": [
+            (
+                play.id,
+                play.title,
+                sorted(play.genres.values_list("id", flat=True)),
+                sorted(play.actors.values_list("id", flat=True)),
+            )
+            for play in Play.objects.order_by("id")
+        ],
+        "performances": list(Performance.objects.order_by("id").values()),
+    }
+
+
+class CatalogCommandTests(TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+        drama = Genre.objects.create(name="Drama")
+        comedy = Genre.objects.create(name="Comedy")
+        actor = Actor.objects.create(first_name="Olena", last_name="Lysenko")
+        hall = TheatreHall.objects.create(name="Blue", rows=5, seats_in_row=8)
+        self.play = Play.objects.create(title="Forest Song", description="-")
+        self.play.genres.set([drama, comedy])
+        self.play.actors.set([actor])
+        Play.objects.create(title="No links", description="-")
+        self.performance = Performance.objects.create(
+            play=self.play, theatre_hall=hall,
+            show_time="2024-03-10T19:00:00Z",
+        )
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def clear(self):
+        for model in (Performance, Play, Genre, Actor, TheatreHall):
+            model.objects.all().delete()
+
+    def round_trip(self, output, *options):
+        before = catalog()
+        call_command("export_catalog", output, *options, stdout=StringIO())
+        self.clear()
+
+        call_command("import_catalog", output, stdout=StringIO())
+
+        self.assertEqual(catalog(), before)
+
+    def test_ndjson_round_trip(self):
+        self.round_trip(self.path("catalog.ndjson"))
+
+    def test_gzip_round_trip(self):
+        self.round_trip(self.path("catalog.ndjson.gz"))
+
+    def test_csv_round_trip(self):
+        self.round_trip(self.path("catalog"), "--format", "csv")
+
+    def test_import_updates_rows_and_replaces_links(self):
+        output = self.path("catalog.ndjson")
+        call_command("export_catalog", output, stdout=StringIO())
+        before = catalog()
+        self.play.title = "Changed"
+        self.play.save()
+        self.play.genres.clear()
+        self.play.genres.add(Genre.objects.create(name="Opera"))
+
+        call_command("import_catalog", output, stdout=StringIO())
+
+        after = catalog()
+        self.assertEqual(after["plays"], before["plays"])
+        self.assertEqual(len(after["genres"]), 3)
+
+    def test_import_moves_tickets_to_the_new_show_date(self):
+        reservation = Reservation.objects.create(
+            user=get_user_model().objects.create_user(
+                "user@user.com", "testpass"
+            )
+        )
+        Ticket.objects.bulk_create(
+            Ticket(
+                performance=self.performance,
+                reservation=reservation,
+                row=1,
+                seat=seat,
+            )
+            for seat in (1, 2)
+        )
+        row = {
+            "id": self.performance.id,
+            "show_time": "2024-03-12T19:00:00+00:00",
+            "duration": "02:00:00",
+            "play_id": self.play.id,
+            "theatre_hall_id": self.performance.theatre_hall_id,
+        }
+        output = self.path("catalog.ndjson")
+        with open(output, "w") as file:
+            file.write(json.dumps({"table": "performances", "row": row}))
+
+        call_command("import_catalog", output, stdout=StringIO())
+
+        self.assertEqual(
+            set(Ticket.objects.values_list("show_date", flat=True)),
+            {date(2024, 3, 12)},
+        )
+
+    def test_sequences_follow_imported_ids(self):
+        output = self.path("catalog.ndjson")
+        call_command("export_catalog", output, stdout=StringIO())
+        self.clear()
+        call_command("import_catalog", output, stdout=StringIO())
+
+        genre = Genre.objects.create(name="Opera")
+
+        self.assertGreater(
+            genre.id, max(row["id"] for row in catalog()["genres"][:-1])
+        )
+
+    def test_unknown_table(self):
+        output = self.path("catalog.ndjson")
+        with open(output, "w") as file:
+            file.write(json.dumps({"table": "users", "row": {"id": 1}}))
+
+        with self.assertRaises(CommandError):
+            call_command("import_catalog", output, stdout=StringIO())
@@ -0,0 +1,80 @@
+import threading
+
+from django.test import SimpleTestCase
+
+from theatre_service.db.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def setUp(self) -> None:
+        self.pool = ConnectionPool(FakeConnection, max_size=2, timeout=0.01)
+
+    def test_reuses_returned_connection(self):
+        connection = self.pool.get()
+        self.pool.put(connection)
+
+        self.assertIs(self.pool.get(), connection)
+        self.assertEqual(self.pool.stats()["created"], 1)
+        self.assertEqual(self.pool.stats()["reused"], 1)
+
+    def test_times_out_when_exhausted(self):
+        self.pool.get()
+        self.pool.get()
+
+        with self.assertRaises(PoolTimeout):
+            self.pool.get()
+        self.assertEqual(self.pool.stats()["timeouts"], 1)
+
+    def test_waiter_gets_released_connection(self):
+        pool = ConnectionPool(FakeConnection, max_size=1, timeout=5)
+        connection = pool.get()
+        threading.Timer(0.05, pool.put, args=[connection]).start()
+
+        self.assertIs(pool.get(), connection)
+
+    def test_failed_check_discards_connection(self):
+        connection = self.pool.get()
+        self.pool.put(connection)
+
+        fresh = self.pool.get(check=lambda conn: False)
+
+        self.assertIsNot(fresh, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(self.pool.stats()["discarded"], 1)
+
+    def test_recently_used_connection_is_not_checked(self):
+        pool = ConnectionPool(FakeConnection, check_idle_after=60)
+        connection = pool.get()
+        pool.put(connection)
+        checked = []
+
+        reused = pool.get(check=lambda conn: checked.append(conn) or True)
+
+        self.assertIs(reused, connection)
+        self.assertEqual(checked, [])
+
+    def test_unusable_connection_frees_slot(self):
+        connection = self.pool.get()
+        self.pool.put(connection, reusable=False)
+
+        stats = self.pool.stats()
+        self.assertTrue(connection.closed)
+        self.assertEqual(stats["in_use"], 0)
+        self.assertEqual(stats["size"], 0)
+
+    def test_failed_connect_frees_slot(self):
+        def broken_connect():
+            raise ConnectionError
+
+        pool = ConnectionPool(broken_connect, max_size=1, timeout=0.01)
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                pool.get()
@@ -0,0 +1,164 @@
+import random
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from theatre.models import Play, Performance, TheatreHall
+from theatre_service.db import routers
+from user.models import User
+
+
+RESERVATION_URL = reverse("theatre:reservation-list")
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRouterTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.router = routers.ReplicaRouter()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "testpass"
+        )
+
+    def route(self, method, model=Play, user=None):
+        request = RequestFactory().generic(method, "/")
+        request.user = user or self.user
+        token = routers._current_request.set(request)
+        try:
+            return self.router.db_for_read(model)
+        finally:
+            routers._current_request.reset(token)
+
+    def test_safe_catalog_read_goes_to_replica(self):
+        self.assertEqual(self.route("GET"), "replica")
+
+    def test_unsafe_request_reads_primary(self):
+        self.assertIsNone(self.route("POST"))
+
+    def test_other_apps_read_primary(self):
+        self.assertIsNone(self.route("GET", model=User))
+
+    def test_outside_request_reads_primary(self):
+        self.assertIsNone(self.router.db_for_read(Play))
+
+    def test_user_pinned_after_write(self):
+        request = RequestFactory().post("/")
+        request.user = self.user
+        middleware = routers.ReplicaRoutingMiddleware(
+            lambda request: HttpResponseStub(201)
+        )
+
+        middleware(request)
+
+        self.assertIsNone(self.route("GET"))
+
+    def test_failed_write_does_not_pin(self):
+        request = RequestFactory().post("/")
+        request.user = self.user
+        middleware = routers.ReplicaRoutingMiddleware(
+            lambda request: HttpResponseStub(400)
+        )
+
+        middleware(request)
+
+        self.assertEqual(self.route("GET"), "replica")
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate("replica", "theatre"))
+        self.assertIsNone(self.router.allow_migrate("default", "theatre"))
+
+
+class HttpResponseStub:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+# "default" stands in for a replica, so the routing decisions show
+# without a second database
+@override_settings(DATABASE_REPLICAS=["default"])
+class ReplicaRoutingFlowTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user("test@test.com", "testpass")
+        )
+        theatre_hall = TheatreHall.objects.create(
+            name="Blue", rows=20, seats_in_row=20
+        )
+        play = Play.objects.create(title="Play", description="description")
+        self.performance = Performance.objects.create(
+            play=play, theatre_hall=theatre_hall,
+            show_time="2024-03-10T14:52:15Z"
+        )
+
+    def replica_reads(self):
+        with mock.patch.object(
+            routers.random, "choice", wraps=random.choice
+        ) as choice:
+            res = self.client.get(RESERVATION_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return choice.call_count
+
+    def test_reads_go_to_replica_until_write(self):
+        self.assertGreater(self.replica_reads(), 0)
+
+        payload = {"tickets": [
+            {"row": 1, "seat": 1, "performance": self.performance.id}
+        ]}
+        res = self.client.post(RESERVATION_URL, payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(self.replica_reads(), 0)
+
+
+@skipUnless(settings.DATABASE_REPLICAS, "no replica aliases configured")
+class ReplicaRoutingApiTests(TestCase):
+    """Run with e.g. DATABASE_REPLICA_HOSTS=localhost"""
+
+    databases = "__all__"
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+        theatre_hall = TheatreHall.objects.create(
+            name="Blue", rows=20, seats_in_row=20
+        )
+        play = Play.objects.create(title="Play", description="description")
+        self.performance = Performance.objects.create(
+            play=play, theatre_hall=theatre_hall,
+            show_time="2024-03-10T14:52:15Z"
+        )
+
+    def capture_list(self):
+        replica = settings.DATABASE_REPLICAS[0]
+        with CaptureQueriesContext(connections[replica]) as queries:
+            res = self.client.get(RESERVATION_URL)
+        return res, len(queries)
+
+    def test_reads_go_to_replica_until_write(self):
+        _, replica_queries = self.capture_list()
+        self.assertGreater(replica_queries, 0)
+
+        payload = {"tickets": [
+            {"row": 1, "seat": 1, "performance": self.performance.id}
+        ]}
+        res = self.client.post(RESERVATION_URL, payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        res, replica_queries = self.capture_list()
+        self.assertEqual(replica_queries, 0)
+        self.assertEqual(len(res.data), 1)
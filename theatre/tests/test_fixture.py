@@ -0,0 +1,20 @@
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+
+from theatre.models import Performance, Ticket
+
+
+class FixtureTests(TestCase):
+    def test_load_sample_data(self):
+        call_command("loaddata", "db_data.json", verbosity=0)
+
+        self.assertEqual(Performance.objects.count(), 25)
+        self.assertFalse(
+            Performance.objects.exclude(
+                end_time=F("show_time") + F("duration")
+            ).exists()
+        )
+        self.assertEqual(Ticket.objects.count(), 70)
+        for ticket in Ticket.objects.select_related("performance"):
+            self.assertEqual(ticket.show_date, ticket.performance.show_date)
@@ -0,0 +1,128 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.utils import OperationalError
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from theatre_service import health
+
+
+@override_settings(OPS_ALLOWED_NETWORKS=["127.0.0.0/8"])
+class HealthEndpointTests(TestCase):
+    def test_healthz_does_no_io(self):
+        with self.assertNumQueries(0), mock.patch.object(
+            health, "caches"
+        ) as caches:
+            res = self.client.get(reverse("healthz"))
+
+        caches.__getitem__.assert_not_called()
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {"status": "ok"})
+
+    def test_readyz_reports_checks(self):
+        res = self.client.get(reverse("readyz"))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {"status": "ok"})
+
+    def test_readyz_unavailable_when_database_fails(self):
+        with mock.patch.object(
+            health,
+            "check_database",
+            side_effect=OperationalError("connection refused"),
+        ), self.assertLogs("theatre_service.health", "WARNING") as logs:
+            res = self.client.get(reverse("readyz"))
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json(), {"status": "unavailable"})
+        self.assertIn("connection refused", logs.output[0])
+
+    def test_readyz_unavailable_when_pool_saturated(self):
+        stats = {
+            "name": "default", "in_use": 5, "idle": 0,
+            "max_size": 5, "timeouts": 3,
+        }
+        with mock.patch.object(
+            health, "pool_stats", return_value=[stats]
+        ), self.assertLogs("theatre_service.health", "WARNING") as logs:
+            res = self.client.get(reverse("readyz"))
+
+        self.assertEqual(res.status_code, 503)
+        self.assertIn("saturated pool(s): default", logs.output[0])
+
+
+@override_settings(OPS_TOKEN="secret", OPS_ALLOWED_NETWORKS=["10.0.0.0/8"])
+class InternalEndpointTests(TestCase):
+    urls = (reverse("readyz"), reverse("metrics"))
+
+    def assertStatus(self, status, **request):
+        for url in self.urls:
+            with self.subTest(url):
+                self.assertEqual(
+                    self.client.get(url, **request).status_code, status
+                )
+
+    def test_public_clients_are_refused(self):
+        self.assertStatus(403)
+        self.assertStatus(403, HTTP_AUTHORIZATION="Bearer wrong")
+
+    def test_token(self):
+        self.assertStatus(200, HTTP_AUTHORIZATION="Bearer secret")
+
+    def test_allowed_network(self):
+        self.assertStatus(200, REMOTE_ADDR="10.1.2.3")
+
+    def test_staff_user(self):
+        self.client.force_login(
+            get_user_model().objects.create_superuser("a@a.com", "testpass")
+        )
+
+        self.assertStatus(200)
+
+    def test_jwt_staff_user(self):
+        staff = get_user_model().objects.create_superuser(
+            "a@a.com", "testpass"
+        )
+        user = get_user_model().objects.create_user("u@u.com", "testpass")
+
+        self.assertStatus(
+            200, HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(staff)}"
+        )
+        self.assertStatus(
+            403, HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+        )
+
+
+@mock.patch("theatre.management.commands.wait_for_db.time.sleep")
+@mock.patch(
+    "django.db.backends.base.base.BaseDatabaseWrapper.ensure_connection"
+)
+class WaitForDbTests(SimpleTestCase):
+    def test_retries_with_bounded_backoff(self, ensure_connection, sleep):
+        ensure_connection.side_effect = [OperationalError] * 5 + [None]
+
+        call_command(
+            "wait_for_db", "--initial-delay=1", "--max-delay=3",
+            stdout=StringIO(),
+        )
+
+        self.assertEqual(ensure_connection.call_count, 6)
+        delays = [call.args[0] for call in sleep.call_args_list]
+        for attempt, delay in enumerate(delays):
+            self.assertLessEqual(delay, min(3, 2 ** attempt))
+
+    def test_gives_up_after_timeout(self, ensure_connection, sleep):
+        ensure_connection.side_effect = OperationalError("refused")
+
+        with mock.patch(
+            "theatre.management.commands.wait_for_db.time.monotonic",
+            side_effect=[0, 1, 2, 61],
+        ), self.assertRaises(CommandError):
+            call_command("wait_for_db", "--timeout=60", stdout=StringIO())
+
+        self.assertEqual(sleep.call_count, 2)
@@ -0,0 +1,152 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from theatre.models import Performance, Play, TheatreHall
+from theatre_service.metrics import (
+    REGISTRY,
+    Registry,
+    archive_process,
+    merge_snapshots,
+    render,
+)
+
+
+METRICS_URL = reverse("metrics")
+RESERVATION_URL = reverse("theatre:reservation-list")
+
+
+class RegistryTests(SimpleTestCase):
+    def setUp(self) -> None:
+        self.registry = Registry()
+        self.requests = self.registry.counter(
+            "requests_total", "Requests.", ("view",)
+        )
+        self.latency = self.registry.histogram(
+            "latency_seconds", "Latency.", buckets=(0.1, 1.0)
+        )
+
+    def test_render_text_format(self):
+        self.requests.inc(view='say "hi"')
+        self.requests.inc(2, view='say "hi"')
+        self.latency.observe(0.05)
+        self.latency.observe(0.5)
+        self.latency.observe(3)
+
+        text = render(merge_snapshots([self.registry.snapshot()]))
+
+        self.assertIn("# TYPE requests_total counter", text)
+        self.assertIn('requests_total{view="say \\"hi\\""} 3', text)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{le="1.0"} 2', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn("latency_seconds_sum 3.55", text)
+        self.assertIn("latency_seconds_count 3", text)
+
+    def test_snapshots_of_processes_are_summed(self):
+        self.requests.inc(view="a")
+        self.latency.observe(0.5)
+        first = json.loads(json.dumps(self.registry.snapshot()))
+        self.registry.reset()
+        self.requests.inc(4, view="a")
+        self.latency.observe(0.5)
+
+        merged = merge_snapshots([first, self.registry.snapshot()])
+
+        self.assertEqual(merged["requests_total"]["samples"][("a",)], 5)
+        self.assertEqual(
+            merged["latency_seconds"]["samples"][()], [0, 2, 0, 1.0, 2]
+        )
+
+    def test_exited_process_is_archived(self):
+        self.requests.inc(view="a")
+
+        with tempfile.TemporaryDirectory() as directory:
+            # The same process exits twice, e.g. a recycled worker pid
+            for _ in range(2):
+                self.registry.flush(directory)
+                archive_process(directory, os.getpid())
+
+            files = [path.name for path in Path(directory).iterdir()]
+            archive = json.loads(
+                Path(directory, "metrics-archive.json").read_text()
+            )
+
+        self.assertEqual(files, ["metrics-archive.json"])
+        self.assertEqual(archive["requests_total"]["samples"], [[["a"], 2]])
+
+
+@override_settings(OPS_ALLOWED_NETWORKS=["127.0.0.0/8"])
+class MetricsEndpointTests(TestCase):
+    def setUp(self) -> None:
+        REGISTRY.reset()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "user@user.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+        hall = TheatreHall.objects.create(name="Blue", rows=5, seats_in_row=5)
+        play = Play.objects.create(title="Play", description="description")
+        self.performance = Performance.objects.create(
+            play=play, theatre_hall=hall, show_time="2024-03-10T14:52:15Z"
+        )
+
+    def reserve(self, row, seat):
+        return self.client.post(
+            RESERVATION_URL,
+            {
+                "tickets": [
+                    {
+                        "row": row,
+                        "seat": seat,
+                        "performance": self.performance.id,
+                    }
+                ]
+            },
+            format="json",
+        )
+
+    def test_request_and_reservation_metrics(self):
+        self.client.get(reverse("theatre:play-list"))
+        self.reserve(1, 1)
+        self.reserve(1, 1)
+        self.reserve(10, 1)
+
+        res = self.client.get(METRICS_URL)
+        text = res.content.decode()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res["Content-Type"].startswith("text/plain"))
+        self.assertIn(
+            'http_request_duration_seconds_count{view="PlayViewSet.list",'
+            'method="GET",status="200"} 1',
+            text,
+        )
+        self.assertIn('db_queries_total{view="PlayViewSet.list"}', text)
+        self.assertIn('reservations_total{outcome="success"} 1', text)
+        self.assertIn('reservations_total{outcome="seat_conflict"} 1', text)
+        self.assertIn(
+            'reservations_total{outcome="validation_error"} 1', text
+        )
+
+    def test_workers_are_merged(self):
+        other = Registry()
+        other.counter(
+            "reservations_total", "Reservations.", ("outcome",)
+        ).inc(3, outcome="success")
+        self.reserve(1, 1)
+
+        with tempfile.TemporaryDirectory() as directory:
+            Path(directory, "metrics-1.json").write_text(
+                json.dumps(other.snapshot())
+            )
+            with override_settings(METRICS_DIR=directory):
+                text = self.client.get(METRICS_URL).content.decode()
+
+        self.assertIn('reservations_total{outcome="success"} 4', text)
@@ -0,0 +1,156 @@
+from datetime import date, datetime, timedelta, timezone
+from io import StringIO
+from unittest import skipIf, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+
+from theatre.management.commands.partition_tickets import add_months
+from theatre.models import Performance, Play, Reservation, TheatreHall, Ticket
+
+
+def show_time(day):
+    return datetime.combine(day, datetime.min.time(), timezone.utc) + (
+        timedelta(hours=19)
+    )
+
+
+class TicketsFixtureMixin:
+    def setUp(self) -> None:
+        self.hall = TheatreHall.objects.create(
+            name="Blue", rows=5, seats_in_row=5
+        )
+        self.play = Play.objects.create(title="Play", description="-")
+        self.reservation = Reservation.objects.create(
+            user=get_user_model().objects.create_user(
+                "user@user.com", "testpass"
+            )
+        )
+
+    def performance(self, day):
+        return Performance.objects.create(
+            play=self.play, theatre_hall=self.hall, show_time=show_time(day)
+        )
+
+    def ticket(self, performance, row=1, seat=1):
+        return Ticket.objects.create(
+            performance=performance,
+            reservation=self.reservation,
+            row=row,
+            seat=seat,
+        )
+
+
+class ShowDateTests(TicketsFixtureMixin, TestCase):
+    def test_save_sets_show_date(self):
+        ticket = self.ticket(self.performance(date(2024, 3, 10)))
+
+        self.assertEqual(ticket.show_date, date(2024, 3, 10))
+
+    def test_bulk_create_sets_show_date(self):
+        performance = self.performance(date(2024, 3, 10))
+
+        Ticket.objects.bulk_create(
+            Ticket(
+                performance=performance,
+                reservation=self.reservation,
+                row=1,
+                seat=seat,
+            )
+            for seat in (1, 2)
+        )
+
+        self.assertEqual(
+            set(Ticket.objects.values_list("show_date", flat=True)),
+            {date(2024, 3, 10)},
+        )
+
+    def test_moving_performance_moves_tickets(self):
+        performance = self.performance(date(2024, 3, 10))
+        ticket = self.ticket(performance)
+
+        performance.show_time = show_time(date(2024, 4, 2))
+        performance.save()
+
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.show_date, date(2024, 4, 2))
+
+    @skipIf(connection.vendor == "postgresql", "PostgreSQL is supported")
+    def test_command_needs_postgresql(self):
+        with self.assertRaises(CommandError):
+            call_command("partition_tickets", stdout=StringIO())
+
+
+@skipUnless(connection.vendor == "postgresql", "needs PostgreSQL")
+class PartitionTicketsTests(TicketsFixtureMixin, TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.this_month = date.today().replace(day=1)
+
+    def partition_of(self, ticket):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT tableoid::regclass::text FROM theatre_ticket "
+                "WHERE id = %s",
+                [ticket.id],
+            )
+            return cursor.fetchone()[0]
+
+    def partition(self, *args):
+        call_command("partition_tickets", *args, stdout=StringIO())
+
+    def test_convert_keeps_rows_and_constraints(self):
+        old = self.ticket(self.performance(add_months(self.this_month, -2)))
+
+        self.partition("--convert", "--months-ahead", "1")
+
+        self.assertEqual(
+            self.partition_of(old),
+            f"theatre_ticket_p{add_months(self.this_month, -2):%Y_%m}",
+        )
+        performance = self.performance(self.this_month)
+        new = self.ticket(performance)
+        self.assertGreater(new.id, old.id)
+        self.assertEqual(
+            self.partition_of(new), f"theatre_ticket_p{self.this_month:%Y_%m}"
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Ticket.objects.bulk_create(
+                [Ticket(
+                    performance=performance,
+                    reservation=self.reservation,
+                    row=1,
+                    seat=1,
+                )]
+            )
+
+    def test_requires_convert(self):
+        with self.assertRaises(CommandError):
+            self.partition()
+
+    def test_new_partition_takes_rows_from_default(self):
+        self.partition("--convert", "--months-ahead", "0")
+        ticket = self.ticket(
+            self.performance(add_months(self.this_month, 2))
+        )
+        self.assertEqual(self.partition_of(ticket), "theatre_ticket_default")
+
+        self.partition("--months-ahead", "2")
+
+        self.assertEqual(
+            self.partition_of(ticket),
+            f"theatre_ticket_p{add_months(self.this_month, 2):%Y_%m}",
+        )
+
+    def test_detach_old_partitions(self):
+        performance = self.performance(add_months(self.this_month, -3))
+        ticket = self.ticket(performance)
+        self.partition("--convert")
+
+        self.partition("--retain-months", "1")
+
+        self.assertFalse(Ticket.objects.filter(pk=ticket.pk).exists())
+        # The detached partition does not hold on to the performance
+        performance.delete()
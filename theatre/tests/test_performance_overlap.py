@@ -0,0 +1,248 @@
+from datetime import datetime, timedelta, timezone
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from theatre.models import Performance, Play, TheatreHall
+
+
+PERFORMANCE_URL = reverse("theatre:performance-list")
+SCHEDULE_URL = reverse("theatre:performance-schedule")
+
+
+def at(hour, minute=0):
+    return datetime(2024, 3, 10, hour, minute, tzinfo=timezone.utc)
+
+
+class OverlapFixtureMixin:
+    def setUp(self) -> None:
+        self.play = Play.objects.create(
+            title="Play", description="-", default_duration=timedelta(hours=2)
+        )
+        self.hall = TheatreHall.objects.create(
+            name="Blue", rows=5, seats_in_row=5
+        )
+        self.other_hall = TheatreHall.objects.create(
+            name="Red", rows=5, seats_in_row=5
+        )
+
+    def performance(self, show_time, hall=None, **fields):
+        return Performance.objects.create(
+            play=self.play,
+            theatre_hall=hall or self.hall,
+            show_time=show_time,
+            **fields,
+        )
+
+    def unsaved(self, show_time, **fields):
+        performance = Performance(
+            play=self.play, theatre_hall=self.hall, show_time=show_time,
+            **fields,
+        )
+        performance.set_end_time()
+        return performance
+
+
+class PerformanceDurationTests(OverlapFixtureMixin, TestCase):
+    def test_duration_defaults_to_the_play(self):
+        performance = self.performance(at(19))
+
+        self.assertEqual(performance.duration, timedelta(hours=2))
+        self.assertEqual(performance.end_time, at(21))
+
+    def test_bulk_create_sets_end_times(self):
+        Performance.objects.bulk_create(
+            [
+                Performance(
+                    play=self.play, theatre_hall=self.hall, show_time=at(12)
+                ),
+                Performance(
+                    play=self.play,
+                    theatre_hall=self.hall,
+                    show_time=at(15),
+                    duration=timedelta(minutes=90),
+                ),
+            ]
+        )
+
+        self.assertEqual(
+            list(
+                Performance.objects.order_by("show_time").values_list(
+                    "end_time", flat=True
+                )
+            ),
+            [at(14), at(16, 30)],
+        )
+
+    def test_moving_performance_moves_end_time(self):
+        performance = self.performance(at(19))
+
+        performance.show_time = at(20)
+        performance.save()
+
+        performance.refresh_from_db()
+        self.assertEqual(performance.end_time, at(22))
+
+
+class OverlappingTests(OverlapFixtureMixin, TestCase):
+    def overlapping(self, *performances):
+        return Performance.objects.overlapping(self.hall.id, performances)
+
+    def test_saved_performances(self):
+        self.performance(at(12))
+        self.performance(at(18), hall=self.other_hall)
+        candidates = [
+            self.unsaved(at(11)),
+            self.unsaved(at(14)),
+            self.unsaved(at(18)),
+        ]
+
+        with self.assertNumQueries(1):
+            overlapping = self.overlapping(*candidates)
+
+        self.assertEqual(overlapping, candidates[:1])
+
+    def test_long_performance_before(self):
+        self.performance(at(6), duration=timedelta(hours=10))
+
+        self.assertTrue(self.overlapping(self.unsaved(at(15))))
+        self.assertFalse(self.overlapping(self.unsaved(at(16))))
+
+    def test_performances_of_the_list(self):
+        first, second, third = (
+            self.unsaved(at(14)),
+            self.unsaved(at(15)),
+            self.unsaved(at(17)),
+        )
+
+        self.assertEqual(self.overlapping(third, second, first), [second])
+
+    def test_saved_performance_does_not_overlap_itself(self):
+        performance = self.performance(at(12))
+        performance.duration = timedelta(hours=3)
+        performance.set_end_time()
+
+        self.assertEqual(self.overlapping(performance), [])
+
+    def test_full_clean(self):
+        self.performance(at(12))
+
+        with self.assertRaises(ValidationError):
+            self.unsaved(at(13)).full_clean()
+        self.unsaved(at(14)).full_clean()
+
+    @skipUnless(
+        connection.vendor == "postgresql",
+        "needs the exclusion constraint of PostgreSQL",
+    )
+    def test_exclusion_constraint(self):
+        self.performance(at(12))
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Performance.objects.bulk_create([self.unsaved(at(13))])
+
+
+class PerformanceOverlapApiTests(OverlapFixtureMixin, TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_superuser(
+                "admin@admin.com", "testpass"
+            )
+        )
+        self.booked = self.performance(at(12))
+
+    def payload(self, show_time, **fields):
+        return {
+            "play": self.play.id,
+            "theatre_hall": self.hall.id,
+            "show_time": show_time.isoformat(),
+            **fields,
+        }
+
+    def test_create_overlapping(self):
+        res = self.client.post(PERFORMANCE_URL, self.payload(at(13)))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("theatre_hall", res.data)
+
+    def test_create_back_to_back(self):
+        res = self.client.post(
+            PERFORMANCE_URL, self.payload(at(14), duration="01:30:00")
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["end_time"], "2024-03-10T15:30:00Z")
+
+    def test_update_into_overlap(self):
+        later = self.performance(at(15))
+
+        res = self.client.patch(
+            reverse("theatre:performance-detail", args=[later.id]),
+            {"show_time": at(13).isoformat()},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        later.refresh_from_db()
+        self.assertEqual(later.show_time, at(15))
+
+    def test_update_own_duration(self):
+        res = self.client.patch(
+            reverse("theatre:performance-detail", args=[self.booked.id]),
+            {"duration": "03:00:00"},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["end_time"], "2024-03-10T15:00:00Z")
+
+    def test_schedule_overlapping_times(self):
+        res = self.client.post(
+            SCHEDULE_URL,
+            {
+                "play": self.play.id,
+                "theatre_hall": self.other_hall.id,
+                "weekdays": [6],
+                "times": ["14:00", "15:00"],
+                "start_date": "2024-03-10",
+                "end_date": "2024-03-10",
+            },
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            res.data["theatre_hall"],
+            ["The hall is taken at 2024-03-10T15:00:00+00:00"],
+        )
+
+    def test_schedule_with_duration(self):
+        res = self.client.post(
+            SCHEDULE_URL,
+            {
+                "play": self.play.id,
+                "theatre_hall": self.hall.id,
+                "weekdays": [6],
+                "times": ["10:00", "14:00", "15:00"],
+                "start_date": "2024-03-10",
+                "end_date": "2024-03-10",
+                "duration": "01:00:00",
+            },
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [row["end_time"] for row in res.data],
+            [
+                "2024-03-10T11:00:00Z",
+                "2024-03-10T15:00:00Z",
+                "2024-03-10T16:00:00Z",
+            ],
+        )
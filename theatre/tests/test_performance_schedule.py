@@ -0,0 +1,124 @@
+from datetime import date, datetime, timedelta, timezone
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from theatre.models import Performance, Play, TheatreHall
+
+
+SCHEDULE_URL = reverse("theatre:performance-schedule")
+
+
+@override_settings(QUERY_BUDGET_MODE="raise")
+class PerformanceScheduleTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_superuser(
+                "admin@admin.com", "testpass"
+            )
+        )
+        self.play = Play.objects.create(title="Play", description="-")
+        self.hall = TheatreHall.objects.create(
+            name="Blue", rows=5, seats_in_row=5
+        )
+
+    def rule(self, **params):
+        # Monday 4 to Sunday 17 March 2024: two Mondays and two Fridays
+        rule = {
+            "play": self.play.id,
+            "theatre_hall": self.hall.id,
+            "weekdays": [0, 4],
+            "times": ["14:00", "19:00"],
+            "start_date": "2024-03-04",
+            "end_date": "2024-03-17",
+        }
+        rule.update(params)
+        return rule
+
+    def test_schedule_creates_all_performances(self):
+        res = self.client.post(SCHEDULE_URL, self.rule(), format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        show_times = [
+            datetime(2024, 3, day, hour, tzinfo=timezone.utc)
+            for day in (4, 8, 11, 15)
+            for hour in (14, 19)
+        ]
+        self.assertEqual(
+            list(
+                Performance.objects.order_by("show_time").values_list(
+                    "show_time", flat=True
+                )
+            ),
+            show_times,
+        )
+        self.assertEqual(len(res.data), 8)
+        self.assertTrue(all(row["id"] for row in res.data))
+
+    def test_dry_run_saves_nothing(self):
+        res = self.client.post(
+            SCHEDULE_URL, self.rule(dry_run=True), format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 8)
+        self.assertIsNone(res.data[0]["id"])
+        self.assertEqual(res.data[0]["show_time"], "2024-03-04T14:00:00Z")
+        self.assertFalse(Performance.objects.exists())
+
+    def test_taken_hall_rejects_the_whole_rule(self):
+        Performance.objects.create(
+            play=self.play,
+            theatre_hall=self.hall,
+            show_time=datetime(2024, 3, 8, 19, tzinfo=timezone.utc),
+        )
+
+        res = self.client.post(SCHEDULE_URL, self.rule(), format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("theatre_hall", res.data)
+        self.assertEqual(Performance.objects.count(), 1)
+
+    def test_invalid_rules(self):
+        for rule in (
+            self.rule(end_date="2024-03-01"),
+            self.rule(weekdays=[7]),
+            self.rule(times=[]),
+            self.rule(weekdays=[2], end_date="2024-03-05"),
+            self.rule(weekdays=list(range(7)), end_date="2026-03-04"),
+        ):
+            with self.subTest(rule):
+                res = self.client.post(SCHEDULE_URL, rule, format="json")
+                self.assertEqual(
+                    res.status_code, status.HTTP_400_BAD_REQUEST
+                )
+        self.assertFalse(Performance.objects.exists())
+
+    def test_season_in_one_request(self):
+        start = date(2024, 9, 1)
+        res = self.client.post(
+            SCHEDULE_URL,
+            self.rule(
+                weekdays=list(range(7)),
+                times=["12:00", "19:00"],
+                start_date=start.isoformat(),
+                end_date=(start + timedelta(days=249)).isoformat(),
+            ),
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Performance.objects.count(), 500)
+
+    def test_only_admins_schedule(self):
+        self.client.force_authenticate(
+            get_user_model().objects.create_user("user@user.com", "testpass")
+        )
+
+        res = self.client.post(SCHEDULE_URL, self.rule(), format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
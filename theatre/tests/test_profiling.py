@@ -0,0 +1,215 @@
+import cProfile
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from theatre.models import Genre
+from theatre_service.profiling import (
+    DEFAULT_CONFIG,
+    StackSampler,
+    collapsed_stacks,
+    config,
+    profile_store,
+    trim_stats,
+)
+
+
+PROFILING_URL = reverse("profiling")
+TOKEN_URL = reverse("profiling-token")
+GENRES_URL = reverse("theatre:genre-list")
+
+
+def download_url(view):
+    return reverse("profiling-download", args=[view])
+
+
+def fibonacci(number):
+    return number if number < 2 else (
+        fibonacci(number - 1) + fibonacci(number - 2)
+    )
+
+
+def profile_fibonacci():
+    profiler = cProfile.Profile()
+    profiler.runcall(fibonacci, 15)
+    return pstats.Stats(profiler).stats
+
+
+class ProfileStatsTests(SimpleTestCase):
+    def test_trim_stats(self):
+        stats = trim_stats(profile_fibonacci(), 1)
+
+        self.assertEqual(len(stats), 1)
+        ((func, (cc, nc, tt, ct, callers)),) = stats.items()
+        self.assertEqual(func[2], "fibonacci")
+        self.assertEqual(set(callers), {func})
+
+    def test_stack_sampler(self):
+        sampler = StackSampler(
+            threading.get_ident(), sys._getframe(), interval=0.0005
+        )
+        deadline = time.monotonic() + 5
+        sampler.start()
+        try:
+            # Samples wait for the GIL, which a busy thread holds for up to
+            # the switch interval
+            while not sampler.stacks and time.monotonic() < deadline:
+                fibonacci(20)
+        finally:
+            sampler.stop()
+
+        lines = collapsed_stacks(sampler.stacks).splitlines()
+        self.assertTrue(
+            any(
+                line.startswith("fibonacci (test_profiling.py:")
+                for line in lines
+            )
+        )
+        for line in lines:
+            stack, count = line.rsplit(" ", 1)
+            self.assertGreater(int(count), 0)
+
+
+class ProfilingApiTests(TestCase):
+    def setUp(self) -> None:
+        config.set(DEFAULT_CONFIG)
+        profile_store.clear()
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(
+            "admin@admin.com", "testpass"
+        )
+        self.client.force_authenticate(self.admin)
+        Genre.objects.create(name="Drama")
+
+    def enable(self, sample_rate=1.0):
+        res = self.client.put(
+            PROFILING_URL,
+            {"enabled": True, "sample_rate": sample_rate},
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_not_sampled_by_default(self):
+        res = self.client.get(GENRES_URL)
+
+        self.assertNotIn("X-Profiled-View", res)
+        self.assertEqual(profile_store.views(), [])
+
+    def test_sampled_requests_are_merged_per_view(self):
+        self.enable()
+
+        for _ in range(2):
+            res = self.client.get(GENRES_URL)
+        self.assertEqual(res["X-Profiled-View"], "GenreViewSet.list")
+
+        res = self.client.get(PROFILING_URL)
+        (profile,) = [
+            view for view in res.data["views"]
+            if view["view"] == "GenreViewSet.list"
+        ]
+        self.assertEqual(profile["samples"], 2)
+        self.assertTrue(profile["top"])
+
+    def test_signed_header(self):
+        token = self.client.post(TOKEN_URL).data["token"]
+
+        res = self.client.get(GENRES_URL, HTTP_X_PROFILE=token + "x")
+        self.assertNotIn("X-Profiled-View", res)
+
+        res = self.client.get(GENRES_URL, HTTP_X_PROFILE=token)
+        self.assertEqual(res["X-Profiled-View"], "GenreViewSet.list")
+
+        # A token profiles a single request
+        res = self.client.get(GENRES_URL, HTTP_X_PROFILE=token)
+        self.assertNotIn("X-Profiled-View", res)
+
+    def test_concurrent_samples_are_all_merged(self):
+        profiler = cProfile.Profile()
+        profiler.runcall(fibonacci, 10)
+        barrier = threading.Barrier(8)
+        save = profile_store.save
+
+        def slow_save(*args):
+            # Widen the window between reading and writing the profile
+            time.sleep(0.01)
+            save(*args)
+
+        def add():
+            barrier.wait()
+            profile_store.add("GenreViewSet.list", profiler, Counter())
+
+        threads = [threading.Thread(target=add) for _ in range(8)]
+        with mock.patch.object(profile_store, "save", slow_save):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(
+            profile_store.get("GenreViewSet.list")["samples"], 8
+        )
+
+    def test_download(self):
+        self.enable()
+        self.client.get(GENRES_URL)
+
+        res = self.client.get(download_url("GenreViewSet.list"))
+        self.assertIn("attachment", res["Content-Disposition"])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "genres.pstats")
+            with open(path, "wb") as file:
+                file.write(res.content)
+            self.assertTrue(pstats.Stats(path).total_calls)
+
+        res = self.client.get(
+            download_url("GenreViewSet.list"), {"type": "collapsed"}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res["Content-Type"].startswith("text/plain"))
+
+    def test_download_unknown_view(self):
+        res = self.client.get(download_url("Nope.list"))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(PROFILING={**settings.PROFILING, "MAX_VIEWS": 1})
+    def test_store_is_bounded(self):
+        self.enable()
+
+        self.client.get(GENRES_URL)
+        self.client.get(reverse("theatre:genre-detail", args=[1]))
+
+        self.assertEqual(profile_store.views(), ["GenreViewSet.retrieve"])
+
+    def test_clear(self):
+        self.enable()
+        self.client.get(GENRES_URL)
+
+        res = self.client.delete(PROFILING_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(profile_store.views(), [])
+
+    def test_admin_required(self):
+        user = get_user_model().objects.create_user(
+            "user@user.com", "testpass"
+        )
+        self.client.force_authenticate(user)
+
+        for res in (
+            self.client.get(PROFILING_URL),
+            self.client.post(TOKEN_URL),
+        ):
+            self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,67 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from theatre.models import Genre
+from theatre.views import GenreViewSet
+from theatre_service.db.instrumentation import (
+    QueryBudgetExceeded,
+    track_queries,
+)
+
+
+GENRE_URL = reverse("theatre:genre-list")
+
+
+class QueryBudgetMiddlewareTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "user@user.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+        Genre.objects.create(name="Drama")
+
+    def test_track_queries(self):
+        with track_queries() as stats:
+            list(Genre.objects.all())
+            Genre.objects.count()
+
+        self.assertEqual(stats.count, 2)
+        self.assertGreater(stats.duration, 0)
+
+    @override_settings(QUERY_BUDGET_MODE="warn")
+    def test_server_timing_header(self):
+        with self.assertLogs("theatre_service.queries", "INFO") as logs:
+            res = self.client.get(GENRE_URL)
+
+        self.assertRegex(
+            res["Server-Timing"], r'^db;dur=[\d.]+;desc="1 queries", total'
+        )
+        self.assertIn('"view": "GenreViewSet.list"', logs.output[0])
+        self.assertIn('"budget": 2', logs.output[0])
+
+    @override_settings(QUERY_BUDGET_MODE="warn")
+    def test_over_budget_warns(self):
+        with mock.patch.object(
+            GenreViewSet, "query_budget", {"list": 0}
+        ), self.assertLogs("theatre_service.queries", "WARNING"):
+            res = self.client.get(GENRE_URL)
+
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(QUERY_BUDGET_MODE="raise")
+    def test_over_budget_raises(self):
+        with mock.patch.object(GenreViewSet, "query_budget", 0), (
+            self.assertRaisesMessage(QueryBudgetExceeded, "budget is 0")
+        ):
+            self.client.get(GENRE_URL)
+
+    @override_settings(QUERY_BUDGET_MODE="off")
+    def test_disabled(self):
+        res = self.client.get(GENRE_URL)
+
+        self.assertNotIn("Server-Timing", res)
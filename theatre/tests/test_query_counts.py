@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from theatre.models import (
+    Actor,
+    Genre,
+    Performance,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+
+
+# Every dataset adds `size` objects of each model, and each of them has
+# `size` related objects, so an N+1 query shows up as a growing count.
+SIZES = (1, 3, 6)
+SHOW_TIME = datetime(2024, 3, 10, 19, 0, tzinfo=timezone.utc)
+
+
+def add_dataset(size, user):
+    """Add a dataset of `size` and return one object of each model"""
+    tag = f"size{size}"
+    genres = Genre.objects.bulk_create(
+        Genre(name=f"{tag}-genre-{i}") for i in range(size)
+    )
+    actors = Actor.objects.bulk_create(
+        Actor(first_name=tag, last_name=f"actor-{i}") for i in range(size)
+    )
+    plays = Play.objects.bulk_create(
+        Play(title=f"{tag}-play-{i}", description="description")
+        for i in range(size)
+    )
+    for play in plays:
+        play.genres.set(genres)
+        play.actors.set(actors)
+
+    halls = TheatreHall.objects.bulk_create(
+        TheatreHall(name=f"{tag}-hall-{i}", rows=10, seats_in_row=10)
+        for i in range(size)
+    )
+    performances = Performance.objects.bulk_create(
+        Performance(
+            play=play,
+            theatre_hall=hall,
+            show_time=SHOW_TIME + timedelta(days=i),
+        )
+        for i, (hall, play) in enumerate(
+            (hall, play) for hall in halls for play in plays
+        )
+    )
+    reservations = Reservation.objects.bulk_create(
+        Reservation(user=user) for _ in range(size)
+    )
+    tickets = Ticket.objects.bulk_create(
+        Ticket(
+            reservation=reservation,
+            performance=performances[seat],
+            row=row + 1,
+            seat=seat + 1,
+        )
+        for row, reservation in enumerate(reservations)
+        for seat in range(size)
+    )
+    return {
+        "theatre_halls": halls[0],
+        "actors": actors[0],
+        "genres": genres[0],
+        "performances": performances[0],
+        "reservations": reservations[0],
+        "tickets": tickets[0],
+        "plays": plays[0],
+    }
+
+
+@override_settings(QUERY_BUDGET_MODE="raise")
+class QueryCountTests(TestCase):
+    """List and detail endpoints run a constant number of queries"""
+
+    endpoints = {
+        "theatre_halls": "theatrehall",
+        "actors": "actor",
+        "genres": "genre",
+        "performances": "performance",
+        "reservations": "reservation",
+        "tickets": "ticket",
+        "plays": "play",
+    }
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_superuser(
+            "admin@admin.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+
+    def assertConstantQueries(self, get_url):
+        """
+        Request `get_url(objects)` after adding each dataset and fail
+        with the SQL of the request if the query count changes
+        """
+        counts = []
+        for size in SIZES:
+            url = get_url(add_dataset(size, self.user))
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.get(url)
+            self.assertEqual(res.status_code, 200, url)
+            counts.append(len(queries))
+
+            if counts[-1] != counts[0]:
+                self.fail(
+                    f"GET {url} ran {counts[0]} queries with datasets of "
+                    f"size {SIZES[0]} and {counts[-1]} with size {size}:\n"
+                    + "\n".join(
+                        query["sql"] for query in queries.captured_queries
+                    )
+                )
+
+    def test_list_endpoints(self):
+        for name, basename in self.endpoints.items():
+            with self.subTest(name):
+                self.assertConstantQueries(
+                    lambda objects: reverse(f"theatre:{basename}-list")
+                )
+
+    def test_detail_endpoints(self):
+        for name, basename in self.endpoints.items():
+            with self.subTest(name):
+                self.assertConstantQueries(
+                    lambda objects: reverse(
+                        f"theatre:{basename}-detail",
+                        args=[objects[name].id],
+                    )
+                )
+
+    def test_performance_list_large_page(self):
+        self.assertConstantQueries(
+            lambda objects: reverse("theatre:performance-list")
+            + "?page_size=100"
+        )
+
+    def test_manage_user(self):
+        self.assertConstantQueries(lambda objects: reverse("user:manage"))
@@ -1,7 +1,9 @@
 import random
+from unittest import mock
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
 
 from rest_framework.test import APIClient
@@ -55,6 +57,15 @@ def sample_ticket(**params):
     return Ticket.objects.create(**defaults)
 
 
+def database_error(pgcode):
+    """An error of the database driver as Django re-raises it"""
+    cause = Exception()
+    cause.pgcode = pgcode
+    error = OperationalError()
+    error.__cause__ = cause
+    return error
+
+
 def detail_url(reservation_id):
     return reverse("theatre:reservation-detail", args=[reservation_id])
 
@@ -149,3 +160,83 @@ class AuthenticatedReservationApiTests(TestCase):
         res = self.client.delete(url)
 
         self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class ReservationFixtureMixin:
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "user@user.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+        self.performance = sample_ticket(row=1, seat=1).performance
+
+    def reserve(self, *seats):
+        return self.client.post(
+            RESERVATION_URL,
+            {"tickets": [
+                {"row": row, "seat": seat, "performance": self.performance.id}
+                for row, seat in seats
+            ]},
+            format="json",
+        )
+
+
+class ReservationLockingTests(ReservationFixtureMixin, TestCase):
+    def test_create_with_every_strategy(self):
+        for seat, locking in enumerate(
+            ("none", "ordered", "row", "advisory", "serializable"), start=2
+        ):
+            with self.subTest(locking), override_settings(
+                RESERVATION_LOCKING=locking
+            ):
+                res = self.reserve((seat, 2), (seat, 1))
+
+                self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_seat_taken_while_creating(self):
+        # Passes the per-ticket validation, fails on the second insert
+        res = self.reserve((5, 5), (5, 5))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["tickets"][0].code, "unique")
+        self.assertFalse(Reservation.objects.filter(user=self.user).exists())
+
+    @mock.patch(
+        "theatre.serializers.lock_for_reservation",
+        side_effect=database_error("40P01"),
+    )
+    def test_deadlock_is_a_conflict(self, lock):
+        # Inside the transaction of the test, it is not retried
+        res = self.reserve((6, 1))
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data["detail"].code, "deadlock")
+        self.assertEqual(lock.call_count, 1)
+        self.assertFalse(Reservation.objects.filter(user=self.user).exists())
+
+
+@override_settings(RESERVATION_RETRIES=1)
+class ReservationRetryTests(ReservationFixtureMixin, TransactionTestCase):
+    def test_serialization_failure_is_retried(self):
+        with mock.patch(
+            "theatre.serializers.lock_for_reservation",
+            side_effect=[database_error("40001"), None],
+        ):
+            res = self.reserve((6, 1))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            Reservation.objects.filter(user=self.user).count(), 1
+        )
+
+    def test_retries_are_bounded(self):
+        with mock.patch(
+            "theatre.serializers.lock_for_reservation",
+            side_effect=database_error("40001"),
+        ) as lock:
+            res = self.reserve((6, 1))
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data["detail"].code, "serialization_failure")
+        self.assertEqual(lock.call_count, 2)
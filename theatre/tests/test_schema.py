@@ -0,0 +1,96 @@
+import gzip
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from theatre_service import schema
+
+
+SCHEMA_URL = reverse("schema")
+
+
+class CachedSchemaTests(TestCase):
+    def setUp(self) -> None:
+        self.schema_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            OPENAPI_SCHEMA_DIR=self.schema_dir.name
+        )
+        self.settings_override.enable()
+        schema.clear_schema_cache()
+
+    def tearDown(self) -> None:
+        self.settings_override.disable()
+        self.schema_dir.cleanup()
+        schema.clear_schema_cache()
+
+    def test_build_schema_writes_versioned_files(self):
+        call_command("build_schema", stdout=StringIO())
+
+        path = Path(self.schema_dir.name) / "openapi-1.0.0.json"
+        content = json.loads(path.read_bytes())
+        self.assertIn("/api/theatre/plays/", content["paths"])
+
+    def test_jwt_security_scheme(self):
+        content = json.loads(schema.render_schema("json"))
+
+        self.assertIn("jwtAuth", content["components"]["securitySchemes"])
+        self.assertIn(
+            {"jwtAuth": []},
+            content["paths"]["/api/theatre/plays/"]["get"]["security"],
+        )
+
+    def test_served_from_prebuilt_file(self):
+        call_command("build_schema", stdout=StringIO())
+
+        with mock.patch.object(schema, "render_schema") as render:
+            res = self.client.get(SCHEMA_URL, {"format": "json"})
+            self.client.get(SCHEMA_URL, {"format": "json"})
+
+        render.assert_not_called()
+        self.assertEqual(res.status_code, 200)
+        self.assertIn("openapi", json.loads(res.content))
+
+    def test_rendered_once_without_file(self):
+        with mock.patch.object(
+            schema, "render_schema", return_value=b"openapi: 3.0.3\n"
+        ) as render:
+            self.client.get(SCHEMA_URL)
+            res = self.client.get(SCHEMA_URL)
+
+        render.assert_called_once_with("yaml")
+        self.assertEqual(res.content, b"openapi: 3.0.3\n")
+        self.assertEqual(res["Content-Type"], "application/vnd.oai.openapi")
+
+    def test_etag_not_modified(self):
+        etag = self.client.get(SCHEMA_URL)["ETag"]
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b"")
+
+    def test_gzip_variant(self):
+        plain = self.client.get(SCHEMA_URL)
+        res = self.client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(res.content), plain.content)
+        self.assertNotEqual(res["ETag"], plain["ETag"])
+
+    def test_new_version_is_rebuilt(self):
+        self.client.get(SCHEMA_URL)
+        spectacular = {"VERSION": "2.0.0"}
+
+        with self.settings(SPECTACULAR_SETTINGS=spectacular), (
+            mock.patch.object(schema, "render_schema", return_value=b"v2")
+        ) as render:
+            res = self.client.get(SCHEMA_URL)
+
+        render.assert_called_once()
+        self.assertEqual(res.content, b"v2")
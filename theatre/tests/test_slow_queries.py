@@ -0,0 +1,130 @@
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from theatre.models import Genre
+from theatre_service.db.slow_queries import SlowQueryLog, slow_query_log
+
+
+SLOW_QUERIES_URL = reverse("slow-queries")
+DOWNLOAD_URL = reverse("slow-queries-download")
+LOG_EVERY_QUERY = {**settings.SLOW_QUERY_LOG, "THRESHOLD_MS": 0}
+
+
+class SlowQueryLogTests(SimpleTestCase):
+    def test_ring_buffer_is_bounded(self):
+        log = SlowQueryLog(size=2)
+        for number in range(3):
+            log.record({"number": number})
+
+        self.assertEqual(
+            [entry["number"] for entry in log.entries()], [2, 1]
+        )
+
+    def test_dump(self):
+        log = SlowQueryLog()
+        log.record({"sql": "SELECT 1"})
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "slow.jsonl")
+            log.dump(path)
+            with open(path) as file:
+                lines = file.readlines()
+
+        self.assertEqual([json.loads(line) for line in lines], [
+            {"sql": "SELECT 1"}
+        ])
+
+
+@override_settings(SLOW_QUERY_LOG=LOG_EVERY_QUERY)
+class SlowQueryApiTests(TestCase):
+    def setUp(self) -> None:
+        slow_query_log.clear()
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(
+            "admin@admin.com", "testpass"
+        )
+        self.client.force_authenticate(self.admin)
+        Genre.objects.create(name="Drama")
+
+    def test_records_query_with_plan_and_view(self):
+        self.client.get(reverse("theatre:genre-list"), {"page": 1})
+
+        entry = next(
+            entry for entry in slow_query_log.entries()
+            if "theatre_genre" in entry["sql"]
+        )
+        self.assertEqual(entry["view"], "GenreViewSet.list")
+        self.assertEqual(entry["path"], "/api/theatre/genres/")
+        self.assertTrue(entry["plan"])
+        self.assertNotIn("EXPLAIN failed", entry["plan"][0])
+
+    def test_params_are_left_out(self):
+        self.client.get(reverse("theatre:play-list"), {"title": "Secret"})
+
+        entry = next(
+            entry for entry in slow_query_log.entries()
+            if "LIKE" in entry["sql"]
+        )
+        self.assertIsNone(entry["params"])
+        self.assertNotIn("Secret", json.dumps(entry))
+
+    @override_settings(SLOW_QUERY_LOG={**LOG_EVERY_QUERY, "PARAMS": True})
+    def test_params_opt_in(self):
+        self.client.get(reverse("theatre:play-list"), {"title": "Secret"})
+
+        self.assertTrue(
+            any(
+                "%Secret%" in (entry["params"] or [])
+                for entry in slow_query_log.entries()
+            )
+        )
+
+    @override_settings(QUERY_BUDGET_MODE="raise")
+    def test_plan_queries_are_not_counted(self):
+        res = self.client.get(reverse("theatre:genre-list"))
+
+        self.assertIn('desc="1 queries"', res["Server-Timing"])
+        self.assertFalse(
+            any(
+                entry["sql"].startswith("EXPLAIN")
+                for entry in slow_query_log.entries()
+            )
+        )
+
+    def test_list_and_clear(self):
+        self.client.get(reverse("theatre:genre-list"))
+
+        res = self.client.get(SLOW_QUERIES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.data["results"])
+
+        res = self.client.delete(SLOW_QUERIES_URL)
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(len(slow_query_log), 0)
+
+    def test_download(self):
+        self.client.get(reverse("theatre:genre-list"))
+
+        res = self.client.get(DOWNLOAD_URL)
+
+        self.assertIn("attachment", res["Content-Disposition"])
+        entries = [json.loads(line) for line in res.content.splitlines()]
+        self.assertTrue(any("theatre_genre" in e["sql"] for e in entries))
+
+    def test_admin_required(self):
+        user = get_user_model().objects.create_user(
+            "user@user.com", "testpass"
+        )
+        self.client.force_authenticate(user)
+
+        res = self.client.get(SLOW_QUERIES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,142 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from theatre.models import TheatreHall, Play, Performance
+from theatre.throttling import (
+    SlidingWindowRateThrottle,
+    SlidingWindowScopedRateThrottle,
+    SlidingWindowUserRateThrottle,
+)
+
+
+RESERVATION_URL = reverse("theatre:reservation-list")
+PLAY_URL = reverse("theatre:play-list")
+
+
+class FakeUser:
+    is_authenticated = True
+    pk = 1
+
+
+class FakeRequest:
+    user = FakeUser()
+    META = {"REMOTE_ADDR": "127.0.0.1"}
+
+
+class FakeView:
+    action = "list"
+    throttle_scopes = {}
+
+
+def make_throttle(rate, now):
+    throttle = SlidingWindowUserRateThrottle()
+    throttle.rate = rate
+    throttle.num_requests, throttle.duration = throttle.parse_rate(rate)
+    throttle.timer = lambda: now
+    return throttle
+
+
+class SlidingWindowThrottleTests(TestCase):
+    def setUp(self) -> None:
+        caches["throttle"].clear()
+
+    def allow(self, now, rate="2/m"):
+        throttle = make_throttle(rate, now)
+        return throttle.allow_request(FakeRequest(), FakeView())
+
+    def test_limits_requests_in_window(self):
+        self.assertTrue(self.allow(60))
+        self.assertTrue(self.allow(61))
+        self.assertFalse(self.allow(62))
+
+    def test_rejected_requests_do_not_count(self):
+        self.allow(60)
+        self.allow(61)
+        self.allow(62)
+        self.allow(63)
+
+        # Half of the previous window still overlaps: 2 * 0.5 + 1 <= 2
+        self.assertTrue(self.allow(150))
+
+    def test_previous_window_weight_decays(self):
+        self.allow(60)
+        self.allow(61)
+
+        # 2 * (1 - 0.25) + 1 > 2
+        self.assertFalse(self.allow(135))
+        self.assertTrue(self.allow(179))
+
+    def test_counters_use_constant_memory(self):
+        for now in range(60, 70):
+            self.allow(now, rate="100/m")
+
+        throttle = make_throttle("100/m", 70)
+        key = throttle.get_cache_key(FakeRequest(), FakeView())
+        self.assertEqual(caches["throttle"].get(f"{key}:1"), 10)
+
+    def test_wait_reports_remaining_time(self):
+        throttle = make_throttle("1/m", 90)
+        throttle.allow_request(FakeRequest(), FakeView())
+
+        self.assertFalse(throttle.allow_request(FakeRequest(), FakeView()))
+        self.assertEqual(throttle.wait(), 30)
+
+    def test_wait_until_previous_window_decays(self):
+        self.allow(60)
+        self.allow(61)
+        throttle = make_throttle("2/m", 135)
+
+        self.assertFalse(throttle.allow_request(FakeRequest(), FakeView()))
+        # 2 * (1 - 0.5) + 1 <= 2 from 150 on
+        self.assertEqual(throttle.wait(), 15)
+        self.assertFalse(self.allow(149))
+        self.assertTrue(self.allow(150))
+
+    def test_shared_cache_backend(self):
+        self.assertIs(SlidingWindowRateThrottle.cache, caches["throttle"])
+
+
+class ScopedThrottleApiTests(TestCase):
+    def setUp(self) -> None:
+        caches["throttle"].clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "user@user.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+
+    @mock.patch.object(
+        SlidingWindowScopedRateThrottle,
+        "THROTTLE_RATES",
+        {"reservations": "1/hour", "catalog": "100/hour"},
+    )
+    def test_reservation_create_has_own_limit(self):
+        theatre_hall = TheatreHall.objects.create(
+            name="Blue", rows=20, seats_in_row=20
+        )
+        play = Play.objects.create(title="Play", description="description")
+        performance = Performance.objects.create(
+            play=play, theatre_hall=theatre_hall,
+            show_time="2024-03-10T14:52:15Z"
+        )
+
+        def reserve(seat):
+            payload = {"tickets": [
+                {"row": 1, "seat": seat, "performance": performance.id}
+            ]}
+            return self.client.post(RESERVATION_URL, payload, format="json")
+
+        self.assertEqual(reserve(1).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            reserve(2).status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertEqual(
+            self.client.get(PLAY_URL).status_code, status.HTTP_200_OK
+        )
@@ -0,0 +1,170 @@
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from theatre.models import Performance, Play, TheatreHall
+from theatre_service import tracing
+
+
+TRACE_ID = "0af7651916cd43dd8448eb211c80319c"
+TRACE_IN_MEMORY = {
+    **settings.TRACING,
+    "ENABLED": True,
+    "EXPORTER": "theatre_service.tracing.InMemoryExporter",
+    "EXPORTER_OPTIONS": {},
+}
+
+
+def span_names(trace):
+    return [span["name"] for span in trace["spans"]]
+
+
+class SpanTests(SimpleTestCase):
+    def test_span_outside_a_trace(self):
+        with tracing.span("work") as span:
+            self.assertIsNone(span)
+
+    @override_settings(TRACING={**TRACE_IN_MEMORY, "MAX_SPANS": 2})
+    def test_spans_are_bounded(self):
+        with tracing.start_trace("root") as root:
+            for _ in range(3):
+                with tracing.span("work"):
+                    pass
+
+        trace = root.trace.as_dict()
+        self.assertEqual(span_names(trace), ["root", "work"])
+        self.assertEqual(trace["dropped_spans"], 2)
+
+    def test_error_is_recorded(self):
+        with self.assertRaises(ValueError):
+            with tracing.start_trace("root") as root:
+                with tracing.span("work"):
+                    raise ValueError
+
+        self.assertEqual(root.trace.spans[1].attributes["error"], "ValueError")
+
+    def test_json_file_exporter(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "traces.jsonl")
+            exporter = tracing.JsonFileExporter(path)
+            exporter.export({"trace_id": "1"})
+            exporter.export({"trace_id": "2"})
+            with open(path) as file:
+                lines = [json.loads(line) for line in file]
+
+        self.assertEqual([line["trace_id"] for line in lines], ["1", "2"])
+
+
+@override_settings(TRACING=TRACE_IN_MEMORY)
+class TracingMiddlewareTests(TestCase):
+    def setUp(self) -> None:
+        tracing.outbox.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "user@user.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+        hall = TheatreHall.objects.create(name="Blue", rows=5, seats_in_row=5)
+        self.play = Play.objects.create(title="Play", description="-")
+        self.performance = Performance.objects.create(
+            play=self.play, theatre_hall=hall,
+            show_time="2024-03-10T14:52:15Z",
+        )
+
+    def test_reservation_spans(self):
+        res = self.client.post(
+            reverse("theatre:reservation-list"),
+            {"tickets": [
+                {"row": 1, "seat": 1, "performance": self.performance.id},
+                {"row": 1, "seat": 2, "performance": self.performance.id},
+            ]},
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        (trace,) = tracing.outbox
+        self.assertEqual(res["X-Trace-Id"], trace["trace_id"])
+        names = span_names(trace)
+        self.assertEqual(names[0], "request")
+        for name in (
+            "view ReservationViewSet.create",
+            "validate ReservationSerializer",
+            "validate TicketSerializer",
+            "full_clean Ticket",
+            "to_representation ReservationSerializer",
+            "render JSONRenderer",
+        ):
+            self.assertIn(name, names)
+        self.assertEqual(names.count("full_clean Ticket"), 2)
+        self.assertTrue(
+            any(
+                span["name"] == "db"
+                and span["attributes"]["sql"].startswith("INSERT")
+                for span in trace["spans"]
+            )
+        )
+
+        root = trace["spans"][0]
+        self.assertEqual(
+            root["attributes"]["view"], "ReservationViewSet.create"
+        )
+        self.assertEqual(root["attributes"]["status"], 201)
+        span_ids = {span["span_id"] for span in trace["spans"]}
+        for span in trace["spans"][1:]:
+            self.assertIn(span["parent_id"], span_ids)
+        spans = {span["name"]: span for span in trace["spans"]}
+        view = spans["view ReservationViewSet.create"]
+        self.assertEqual(view["parent_id"], root["span_id"])
+        self.assertEqual(
+            spans["validate ReservationSerializer"]["parent_id"],
+            view["span_id"],
+        )
+        # The view span ends before the response is rendered
+        self.assertEqual(
+            spans["render JSONRenderer"]["parent_id"], root["span_id"]
+        )
+
+    def test_only_outermost_representation(self):
+        Play.objects.create(title="Other", description="-")
+
+        self.client.get(reverse("theatre:play-list"))
+
+        names = span_names(tracing.outbox[0])
+        self.assertEqual(
+            [name for name in names if name.startswith("to_representation")],
+            ["to_representation ListSerializer"],
+        )
+
+    @override_settings(TRACING={**TRACE_IN_MEMORY, "SAMPLE_RATE": 0})
+    def test_incoming_trace_id_is_propagated(self):
+        res = self.client.get(reverse("theatre:genre-list"))
+        self.assertNotIn("X-Trace-Id", res)
+
+        res = self.client.get(
+            reverse("theatre:genre-list"), HTTP_X_TRACE_ID=TRACE_ID
+        )
+        self.assertEqual(res["X-Trace-Id"], TRACE_ID)
+        self.assertEqual(tracing.outbox, [])
+
+    @override_settings(TRACING={**TRACE_IN_MEMORY, "SAMPLE_RATE": 0})
+    def test_internal_request_is_traced_on_demand(self):
+        self.user.is_staff = True
+        self.user.save()
+        token = AccessToken.for_user(self.user)
+
+        res = APIClient().get(
+            reverse("theatre:genre-list"),
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+            HTTP_X_TRACE_ID=TRACE_ID,
+        )
+
+        self.assertEqual(res["X-Trace-Id"], TRACE_ID)
+        self.assertEqual(tracing.outbox[0]["trace_id"], TRACE_ID)
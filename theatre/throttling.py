@@ -0,0 +1,152 @@
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+from theatre_service.metrics import THROTTLE_REJECTIONS
+
+
+def get_throttle_scope(view):
+    """Return the throttle scope declared for the current view action"""
+    scopes = getattr(view, "throttle_scopes", None) or {}
+    return scopes.get(getattr(view, "action", None))
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """
+    Approximate sliding-window throttle backed by atomic cache counters.
+
+    Every client keeps two integers per scope: the number of requests in
+    the current fixed window and in the previous one. The previous count
+    is weighted by how much of it still overlaps the sliding window, so
+    memory stays constant and each check is one `get_many`, one `add` and
+    one `incr` against the shared cache (plus a `decr` when rejected).
+    """
+
+    cache = caches["throttle"]
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        self.elapsed = (self.now % self.duration) / self.duration
+        self.current_key = f"{self.key}:{window}"
+        previous_key = f"{self.key}:{window - 1}"
+
+        counts = self.cache.get_many([self.current_key, previous_key])
+        self.previous = counts.get(previous_key, 0)
+        self.current = self._increment(self.current_key)
+
+        if self.previous * (1 - self.elapsed) + self.current > (
+            self.num_requests
+        ):
+            return self.throttle_failure()
+        return self.throttle_success()
+
+    def _increment(self, key):
+        self.cache.add(key, 0, timeout=self.duration * 2)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, 1, timeout=self.duration * 2)
+            return 1
+
+    def throttle_success(self):
+        return True
+
+    def throttle_failure(self):
+        """Give back the slot taken by the rejected request"""
+        THROTTLE_REJECTIONS.inc(scope=self.scope)
+        try:
+            self.current = self.cache.decr(self.current_key)
+        except ValueError:
+            self.current = 0
+        return False
+
+    def wait(self):
+        remaining = self.duration * (1 - self.elapsed)
+        if self.current >= self.num_requests or not self.previous:
+            return remaining
+
+        # The retried request itself takes one of the slots
+        fraction = 1 - (
+            self.num_requests - self.current - 1
+        ) / self.previous
+        return max(0.0, (fraction - self.elapsed) * self.duration)
+
+
+class SlidingWindowAnonRateThrottle(SlidingWindowRateThrottle):
+    """
+    Limits anonymous users by IP address.
+
+    Actions that declare their own throttle scope are skipped,
+    they are limited by `SlidingWindowScopedRateThrottle` instead.
+    """
+
+    scope = "anon"
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        if get_throttle_scope(view):
+            return None
+
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": self.get_ident(request),
+        }
+
+
+class SlidingWindowUserRateThrottle(SlidingWindowRateThrottle):
+    """
+    Limits authenticated users by id and anonymous users by IP address.
+
+    Actions that declare their own throttle scope are skipped,
+    they are limited by `SlidingWindowScopedRateThrottle` instead.
+    """
+
+    scope = "user"
+
+    def get_cache_key(self, request, view):
+        if get_throttle_scope(view):
+            return None
+
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+
+class SlidingWindowScopedRateThrottle(SlidingWindowRateThrottle):
+    """
+    Limits actions listed in the view's `throttle_scopes` mapping,
+    e.g. `throttle_scopes = {"create": "reservations"}`.
+    """
+
+    def __init__(self):
+        # The rate depends on the view action, so it is resolved
+        # in `allow_request` rather than here.
+        pass
+
+    def allow_request(self, request, view):
+        self.scope = get_throttle_scope(view)
+        if not self.scope:
+            return True
+
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+
+        return self.cache_format % {"scope": self.scope, "ident": ident}
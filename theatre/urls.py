@@ -1,5 +1,7 @@
+from django.urls import path
 from rest_framework import routers
 
+from theatre.async_views import AsyncReadOnlyView
 from theatre.views import (
     TheatreHallViewSet,
     ActorViewSet,
@@ -8,6 +10,9 @@ from theatre.views import (
     ReservationViewSet,
     TicketViewSet,
     PlayViewSet,
+    ArchivedPerformanceViewSet,
+    ArchivedTicketViewSet,
+    AnalyticsViewSet,
 )
 
 
@@ -19,7 +24,39 @@ router.register("performances", PerformanceViewSet)
 router.register("reservations", ReservationViewSet)
 router.register("tickets", TicketViewSet)
 router.register("plays", PlayViewSet)
+router.register("archive/performances", ArchivedPerformanceViewSet)
+router.register("archive/tickets", ArchivedTicketViewSet)
+router.register("analytics", AnalyticsViewSet, basename="analytics")
 
-urlpatterns = router.urls
+async_urlpatterns = [
+    path(
+        "async/performances/",
+        AsyncReadOnlyView.as_view(
+            viewset_class=PerformanceViewSet, action="list"
+        ),
+        name="performance-list-async",
+    ),
+    path(
+        "async/performances/<pk>/",
+        AsyncReadOnlyView.as_view(
+            viewset_class=PerformanceViewSet, action="retrieve"
+        ),
+        name="performance-detail-async",
+    ),
+    path(
+        "async/plays/",
+        AsyncReadOnlyView.as_view(viewset_class=PlayViewSet, action="list"),
+        name="play-list-async",
+    ),
+    path(
+        "async/plays/<pk>/",
+        AsyncReadOnlyView.as_view(
+            viewset_class=PlayViewSet, action="retrieve"
+        ),
+        name="play-detail-async",
+    ),
+]
+
+urlpatterns = router.urls + async_urlpatterns
 
 app_name = "theatre"
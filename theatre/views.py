@@ -1,14 +1,20 @@
-from django.db.models import F, Count
+from django.db import IntegrityError
+from django.db.models import F, Count, Prefetch
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import viewsets, status, mixins
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
+from theatre.analytics import cached_report
 from theatre.permissions import IsAdminOrIfAuthenticatedReadOnly
+from theatre_service.metrics import RESERVATIONS
 from theatre.models import (
+    ArchivedPerformance,
+    ArchivedTicket,
     TheatreHall,
     Actor,
     Genre,
@@ -34,8 +40,14 @@ from theatre.serializers import (
     ReservationDetailSerializer,
     PerformanceDetailSerializer,
     PerformanceListSerializer,
+    PerformanceScheduleSerializer,
     ActorImageSerializer,
     PlayImageSerializer,
+    ArchivedPerformanceSerializer,
+    ArchivedTicketSerializer,
+    AnalyticsQuerySerializer,
+    AnalyticsSerializer,
+    ReservationConflict,
 )
 
 
@@ -44,6 +56,18 @@ def params_to_ints(qs):
     return [int(str_id) for str_id in qs.split(",")]
 
 
+def has_error_code(codes, code):
+    """Search the nested output of `ValidationError.get_codes()`"""
+    if isinstance(codes, dict):
+        codes = codes.values()
+    elif not isinstance(codes, list):
+        return codes == code
+    return any(has_error_code(item, code) for item in codes)
+
+
+CATALOG_THROTTLE_SCOPES = {"list": "catalog", "retrieve": "catalog"}
+
+
 class OrderPagination(PageNumberPagination):
     page_size = 4
     page_size_query_param = "page_size"
@@ -54,6 +78,21 @@ class TheatreHallViewSet(viewsets.ModelViewSet):
     queryset = TheatreHall.objects.all()
     serializer_class = TheatreHallSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    query_budget = {"list": 2, "retrieve": 3}
+    throttle_scopes = CATALOG_THROTTLE_SCOPES
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+
+        if self.action == "retrieve":
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "performances",
+                    queryset=Performance.objects.select_related("play"),
+                )
+            )
+
+        return queryset
 
     def get_serializer_class(self):
         if self.action == "retrieve":
@@ -65,6 +104,8 @@ class ActorViewSet(viewsets.ModelViewSet):
     queryset = Actor.objects.all()
     serializer_class = ActorSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    query_budget = {"list": 2, "retrieve": 3}
+    throttle_scopes = CATALOG_THROTTLE_SCOPES
 
     def get_serializer_class(self):
         if self.action == "retrieve":
@@ -95,6 +136,8 @@ class GenreViewSet(viewsets.ModelViewSet):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    query_budget = {"list": 2, "retrieve": 3}
+    throttle_scopes = CATALOG_THROTTLE_SCOPES
 
     def get_serializer_class(self):
         if self.action == "retrieve":
@@ -107,6 +150,8 @@ class PerformanceViewSet(viewsets.ModelViewSet):
     serializer_class = PerformanceSerializer
     pagination_class = OrderPagination
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    query_budget = {"list": 4, "retrieve": 5, "schedule": 10}
+    throttle_scopes = CATALOG_THROTTLE_SCOPES
 
     def get_queryset(self):
         """Retrieve the performances with filters"""
@@ -125,8 +170,15 @@ class PerformanceViewSet(viewsets.ModelViewSet):
                         - Count("tickets")
                     )
                 )
+                # Meta.ordering is dropped from GROUP BY queries
+                .order_by("-show_time", "id")
             )
 
+        if self.action == "retrieve":
+            queryset = queryset.select_related(
+                "play", "theatre_hall"
+            ).prefetch_related("play__genres", "play__actors", "tickets")
+
         if play:
             play_id = params_to_ints(play)
             queryset = queryset.filter(play__id__in=play_id)
@@ -141,9 +193,35 @@ class PerformanceViewSet(viewsets.ModelViewSet):
             return PerformanceDetailSerializer
         if self.action == "list":
             return PerformanceListSerializer
+        if self.action == "schedule":
+            return PerformanceScheduleSerializer
 
         return PerformanceSerializer
 
+    @extend_schema(responses=PerformanceSerializer(many=True))
+    @action(
+        methods=["POST"],
+        detail=False,
+        permission_classes=[IsAdminUser],
+    )
+    def schedule(self, request):
+        """
+        Create the performances of a recurrence rule in one transaction,
+        or only list them with `dry_run`. One invalid show time rejects
+        the whole rule.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        performances = serializer.save()
+        return Response(
+            PerformanceSerializer(performances, many=True).data,
+            status=(
+                status.HTTP_200_OK
+                if serializer.validated_data["dry_run"]
+                else status.HTTP_201_CREATED
+            ),
+        )
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -179,11 +257,33 @@ class ReservationViewSet(
     )
     serializer_class = ReservationSerializer
     permission_classes = (IsAuthenticated,)
+    query_budget = {"list": 6, "retrieve": 6}
+    throttle_scopes = {"create": "reservations"}
 
     def get_queryset(self):
         """Retrieve the reservations with filters by user"""
         return self.queryset.filter(user=self.request.user)
 
+    def create(self, request, *args, **kwargs):
+        try:
+            response = super().create(request, *args, **kwargs)
+        except ValidationError as error:
+            RESERVATIONS.inc(
+                outcome="seat_conflict"
+                if has_error_code(error.get_codes(), "unique")
+                else "validation_error"
+            )
+            raise
+        except IntegrityError:
+            # Two requests raced for the same seat past validation
+            RESERVATIONS.inc(outcome="seat_conflict")
+            raise
+        except ReservationConflict:
+            RESERVATIONS.inc(outcome="concurrency_conflict")
+            raise
+        RESERVATIONS.inc(outcome="success")
+        return response
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
@@ -201,6 +301,7 @@ class TicketViewSet(
     queryset = Ticket.objects.prefetch_related("performance__play")
     serializer_class = TicketSerializer
     permission_classes = (IsAdminUser,)
+    query_budget = {"list": 4, "retrieve": 5}
 
     def get_serializer_class(self):
         if self.action == "retrieve":
@@ -212,6 +313,8 @@ class PlayViewSet(viewsets.ModelViewSet):
     queryset = Play.objects.prefetch_related("genres", "actors")
     serializer_class = PlaySerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    query_budget = {"list": 4, "retrieve": 4}
+    throttle_scopes = CATALOG_THROTTLE_SCOPES
 
     def get_queryset(self):
         """Retrieve the plays with filters"""
@@ -293,3 +396,87 @@ class PlayViewSet(viewsets.ModelViewSet):
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
+
+
+class ArchivedPerformanceViewSet(viewsets.ReadOnlyModelViewSet):
+    """Performances moved out of the live tables by archive_performances"""
+
+    queryset = ArchivedPerformance.objects.all()
+    serializer_class = ArchivedPerformanceSerializer
+    pagination_class = OrderPagination
+    permission_classes = (IsAuthenticated,)
+    query_budget = {"list": 2, "retrieve": 1}
+    throttle_scopes = CATALOG_THROTTLE_SCOPES
+
+    def get_queryset(self):
+        """Retrieve the archived performances with filters"""
+        queryset = self.queryset
+        play = self.request.query_params.get("play")
+        date = self.request.query_params.get("date")
+
+        if play:
+            queryset = queryset.filter(play__id__in=params_to_ints(play))
+
+        if date:
+            queryset = queryset.filter(show_time__date=date)
+
+        return queryset
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="play",
+                type={"type": "list", "items": {"type": "number"}},
+                description="filtering by play",
+            ),
+            OpenApiParameter(
+                name="date",
+                type={
+                    "type": "datetime.date", "items": {"type": "datetime.date"}
+                },
+                description="filtering by date",
+            ),
+        ]
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+class ArchivedTicketViewSet(viewsets.ReadOnlyModelViewSet):
+    """Archived tickets: every ticket for admins, their own for users"""
+
+    queryset = ArchivedTicket.objects.select_related("performance")
+    serializer_class = ArchivedTicketSerializer
+    pagination_class = OrderPagination
+    permission_classes = (IsAuthenticated,)
+    query_budget = {"list": 2, "retrieve": 1}
+
+    def get_queryset(self):
+        if self.request.user.is_staff:
+            return self.queryset
+        return self.queryset.filter(user=self.request.user)
+
+
+class AnalyticsViewSet(viewsets.ViewSet):
+    """Occupancy and sales of the performances, for admins"""
+
+    permission_classes = (IsAdminUser,)
+    query_budget = {"list": 2}
+
+    @extend_schema(
+        parameters=[AnalyticsQuerySerializer],
+        responses=AnalyticsSerializer,
+    )
+    def list(self, request, *args, **kwargs):
+        query = AnalyticsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        results, generated_at = cached_report(**query.validated_data)
+        return Response(
+            AnalyticsSerializer(
+                {
+                    "group_by": query.validated_data["group_by"],
+                    "generated_at": generated_at,
+                    "results": results,
+                }
+            ).data
+        )
@@ -0,0 +1,85 @@
+"""
+Helpers shared by the `bench_*` management commands.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import CommandError
+from django.db import connections
+
+
+def percentile(sorted_values, fraction):
+    """Return the value below which `fraction` of the samples fall"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed, errors=0):
+    """Build the result dict reported by every benchmark (times in ms)"""
+    latencies = sorted(latencies)
+    count = len(latencies)
+
+    return {
+        "requests": count,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / count * 1000, 2) if count else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p90_ms": round(percentile(latencies, 0.90) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def run_load(func, total, concurrency):
+    """
+    Call `func(index)` `total` times from `concurrency` threads.
+
+    `func` returns a truthy value on success. Each thread closes its
+    own database connections when it is done.
+    """
+
+    def worker(indexes):
+        latencies = []
+        errors = 0
+        try:
+            for index in indexes:
+                started = time.perf_counter()
+                ok = func(index)
+                latencies.append(time.perf_counter() - started)
+                if not ok:
+                    errors += 1
+        finally:
+            connections.close_all()
+        return latencies, errors
+
+    batches = [range(i, total, concurrency) for i in range(concurrency)]
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(worker, batches))
+
+    elapsed = time.perf_counter() - started
+    latencies = [value for batch, _ in results for value in batch]
+    errors = sum(batch_errors for _, batch_errors in results)
+    return summarize(latencies, elapsed, errors)
+
+
+def authenticated_session(base_url, email, password, pool_size):
+    """Return a requests session carrying a JWT for a running server"""
+    res = requests.post(
+        f"{base_url}/api/user/token/",
+        data={"email": email, "password": password},
+    )
+    if res.status_code != 200:
+        raise CommandError(f"Could not obtain a token: {res.text}")
+
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {res.json()['access']}"
+    session.mount(
+        base_url, requests.adapters.HTTPAdapter(pool_maxsize=pool_size)
+    )
+    return session
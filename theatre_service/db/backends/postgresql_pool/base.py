@@ -0,0 +1,81 @@
+"""
+PostgreSQL backend that checks connections out of a process-local pool.
+
+Configured through the "POOL" key of the database settings:
+    MAX_SIZE - connections per worker process
+    TIMEOUT  - seconds to wait for a free connection
+    CHECK    - run "SELECT 1" on idle connections before reuse
+    CHECK_IDLE_AFTER - only on connections idle for this many seconds;
+               a connection that fails anyway is discarded when returned
+
+Use it with CONN_MAX_AGE = 0: Django then "closes" the connection at the
+end of every request, which hands it back to the pool.
+"""
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from theatre_service.db.backends.postgresql_pool.creation import (
+    DatabaseCreation,
+)
+from theatre_service.db.pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def get_pool(self, conn_params):
+        options = self.settings_dict.get("POOL", {})
+        key = (self.alias, repr(sorted(conn_params.items())))
+
+        return get_pool(
+            key,
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params
+            ),
+            name=self.alias,
+            max_size=options.get("MAX_SIZE", 10),
+            timeout=options.get("TIMEOUT", 5.0),
+            check_idle_after=options.get("CHECK_IDLE_AFTER", 30.0),
+        )
+
+    def get_new_connection(self, conn_params):
+        self._pool = self.get_pool(conn_params)
+        self.isolation_level = IsolationLevel(
+            self.settings_dict["OPTIONS"].get(
+                "isolation_level", IsolationLevel.READ_COMMITTED
+            )
+        )
+        return self._pool.get(check=self._check_pooled_connection)
+
+    def _check_pooled_connection(self, connection):
+        if connection.closed:
+            return False
+        if not self.settings_dict.get("POOL", {}).get("CHECK", True):
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except self.Database.Error:
+            return False
+        return True
+
+    def _reset_connection(self, connection):
+        """Roll back leftovers so the next user gets a clean session"""
+        if connection.closed:
+            return False
+        try:
+            status = connection.get_transaction_status()
+            if status != TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except self.Database.Error:
+            return False
+        return True
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self._pool.put(
+                    self.connection,
+                    reusable=self._reset_connection(self.connection),
+                )
@@ -0,0 +1,10 @@
+from django.db.backends.postgresql import creation
+
+from theatre_service.db.pool import close_idle_connections
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Pooled connections would keep the test database in use
+        close_idle_connections(self.connection.alias)
+        super()._destroy_test_db(test_database_name, verbosity)
@@ -0,0 +1,204 @@
+"""
+Per-request SQL instrumentation.
+
+`observe_queries()` runs execute wrappers around the queries of the current
+context: one wrapper installed on every connection calls the observers
+kept in a ContextVar, which asgiref copies into `sync_to_async` threads,
+so the queries an async request runs on other threads are observed too.
+`track_queries()` counts the queries and the database time of the current
+context on every connection. `QueryBudgetMiddleware` uses it to add a
+`Server-Timing` header and a structured log line to each response and to
+check the budget a viewset declares:
+
+    class PlayViewSet(viewsets.ModelViewSet):
+        query_budget = {"list": 4, "retrieve": 3}   # or one int for all
+
+QUERY_BUDGET_MODE is "off" (the middleware unloads itself), "warn" (log
+requests over budget) or "raise" (raise `QueryBudgetExceeded`, which
+fails the test that made the request).
+"""
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+logger = logging.getLogger("theatre_service.queries")
+
+_query_observers = ContextVar("query_observers", default=())
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+            self.queries.append(sql)
+
+
+def _observe(execute, sql, params, many, context):
+    for observer in reversed(_query_observers.get()):
+        execute = partial(observer, execute)
+    return execute(sql, params, many, context)
+
+
+def install_observer(connection, **kwargs):
+    if _observe not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_observe)
+
+
+connection_created.connect(install_observer)
+
+
+@contextmanager
+def observe_queries(observer):
+    """
+    Wrap the queries of the current context with `observer`, an execute
+    wrapper; observers entered first wrap the ones entered later
+    """
+    for connection in connections.all(initialized_only=True):
+        install_observer(connection)
+    token = _query_observers.set(_query_observers.get() + (observer,))
+    try:
+        yield observer
+    finally:
+        _query_observers.reset(token)
+
+
+def track_queries():
+    """Count the queries of the current context on every database"""
+    return observe_queries(QueryStats())
+
+
+class SyncAndAsyncMiddleware:
+    """
+    Base of the middlewares that run in both modes: under ASGI with async
+    views downstream, `__call__` returns the `__acall__` coroutine, so
+    Django does not adapt the chain to sync. Both pass the request on
+    unless overridden, e.g. by a middleware that only has hooks.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.call(request)
+
+    def call(self, request):
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+
+def get_view_action(view_func, method):
+    """Return the viewset action a request method is routed to"""
+    actions = getattr(view_func, "actions", None) or {}
+    return actions.get(method.lower())
+
+
+def get_view_name(view_func, method):
+    """Name a DRF view as "ViewSet.action", None for other views"""
+    view_class = getattr(view_func, "cls", None)
+    if view_class is None:
+        return None
+    return ".".join(
+        filter(None, (view_class.__name__, get_view_action(view_func, method)))
+    )
+
+
+def get_query_budget(view_func, method):
+    """Return the budget the view declares for this request, or None"""
+    view_class = getattr(view_func, "cls", None)
+    budget = getattr(view_class, "query_budget", None)
+    if isinstance(budget, dict):
+        return budget.get(get_view_action(view_func, method))
+    return budget
+
+
+class QueryBudgetMiddleware(SyncAndAsyncMiddleware):
+    """Report the SQL cost of each request and enforce query budgets"""
+
+    def __init__(self, get_response):
+        self.mode = settings.QUERY_BUDGET_MODE
+        if self.mode == "off":
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def call(self, request):
+        started = time.perf_counter()
+        with track_queries() as stats:
+            response = self.get_response(request)
+        return self.report(request, response, stats, started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with track_queries() as stats:
+            response = await self.get_response(request)
+        return self.report(request, response, stats, started)
+
+    def report(self, request, response, stats, started):
+        total = time.perf_counter() - started
+        budget = getattr(request, "_query_budget", None)
+        view = getattr(request, "_query_budget_view", None)
+        db_ms = stats.duration * 1000
+        response["Server-Timing"] = (
+            f'db;dur={db_ms:.1f};desc="{stats.count} queries", '
+            f"total;dur={total * 1000:.1f}"
+        )
+
+        over_budget = budget is not None and stats.count > budget
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "view": view,
+            "status": response.status_code,
+            "queries": stats.count,
+            "db_ms": round(db_ms, 3),
+            "total_ms": round(total * 1000, 3),
+            "budget": budget,
+        }
+        if over_budget:
+            message = (
+                f"{request.method} {request.path} ({view}) made "
+                f"{stats.count} queries, budget is {budget}:\n"
+                + "\n".join(stats.queries)
+            )
+            if self.mode == "raise":
+                raise QueryBudgetExceeded(message)
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = get_query_budget(view_func, request.method)
+        request._query_budget_view = get_view_name(view_func, request.method)
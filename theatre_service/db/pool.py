@@ -0,0 +1,164 @@
+"""
+Process-local database connection pool.
+
+Connections are created lazily up to `max_size`; when all of them are in
+use, callers wait up to `timeout` seconds for one to be returned before
+`PoolTimeout` is raised. Pools are keyed by process id, so a pool
+inherited through `fork()` is never shared with the parent. Idle
+connections are only checked before reuse once they have been idle for
+`check_idle_after` seconds, so busy pools skip the round trip.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(
+        self, connect, max_size=10, timeout=5.0, name="", check_idle_after=0.0
+    ):
+        self.name = name
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_idle_after = check_idle_after
+        self._connect = connect
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._counters = {
+            "created": 0,
+            "reused": 0,
+            "discarded": 0,
+            "timeouts": 0,
+            "in_use": 0,
+            "wait_ms": 0.0,
+        }
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def get(self, check=None):
+        """
+        Check a connection out, reusing an idle one when possible.
+        `check(connection)` returns False for connections to discard; it
+        is skipped for connections idle less than `check_idle_after`.
+        """
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            self._count("timeouts")
+            raise PoolTimeout(
+                f"No connection available in pool {self.name!r} "
+                f"after {self.timeout}s ({self.max_size} in use)"
+            )
+        self._count("wait_ms", (time.monotonic() - started) * 1000)
+
+        try:
+            connection = self._get_idle(check)
+            if connection is None:
+                connection = self._connect()
+                self._count("created")
+        except BaseException:
+            self._slots.release()
+            raise
+
+        self._count("in_use")
+        return connection
+
+    def _get_idle(self, check):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                connection, returned_at = self._idle.pop()
+
+            idle = time.monotonic() - returned_at
+            if (
+                check is None
+                or idle < self.check_idle_after
+                or check(connection)
+            ):
+                self._count("reused")
+                return connection
+            self.discard(connection)
+
+    def put(self, connection, reusable=True):
+        """Return a checked-out connection to the pool"""
+        try:
+            if reusable:
+                with self._lock:
+                    self._idle.append((connection, time.monotonic()))
+            else:
+                self.discard(connection)
+        finally:
+            self._count("in_use", -1)
+            self._slots.release()
+
+    def discard(self, connection):
+        self._count("discarded")
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close_idle(self):
+        """Close every idle connection, e.g. before dropping the database"""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for connection, _ in idle:
+            self.discard(connection)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["idle"] = len(self._idle)
+        stats.update(
+            name=self.name,
+            pid=os.getpid(),
+            max_size=self.max_size,
+            size=stats["in_use"] + stats["idle"],
+            wait_ms=round(stats["wait_ms"], 3),
+        )
+        return stats
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, connect, **options):
+    """Return the pool for `key` in this process, creating it if needed"""
+    pid = os.getpid()
+
+    with _pools_lock:
+        pool = _pools.get((pid, key))
+        if pool is None:
+            pool = ConnectionPool(connect, **options)
+            _pools[(pid, key)] = pool
+    return pool
+
+
+def close_idle_connections(name):
+    """Close the idle connections of this process's pools named `name`"""
+    pid = os.getpid()
+    with _pools_lock:
+        pools = [
+            pool
+            for (owner, _), pool in _pools.items()
+            if owner == pid and pool.name == name
+        ]
+    for pool in pools:
+        pool.close_idle()
+
+
+def pool_stats():
+    """Return the stats of every pool created by this process"""
+    pid = os.getpid()
+    with _pools_lock:
+        pools = [pool for (owner, _), pool in _pools.items() if owner == pid]
+    return [pool.stats() for pool in pools]
@@ -0,0 +1,114 @@
+"""
+Read-replica routing with read-your-writes.
+
+Safe-method (GET/HEAD/OPTIONS) reads of the apps listed in
+REPLICA_ROUTED_APPS go to one of DATABASE_REPLICAS. After an
+authenticated user makes a successful write, the user is pinned to the
+primary for REPLICA_PIN_SECONDS, so replication lag never hides their
+own changes (e.g. a new reservation in the reservation list).
+
+The current request is published by `ReplicaRoutingMiddleware`; outside
+of a request (management commands, shell) everything uses the primary.
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.permissions import SAFE_METHODS
+
+from theatre_service.db.instrumentation import SyncAndAsyncMiddleware
+
+
+_current_request = ContextVar("db_routing_request", default=None)
+
+
+def pin_key(user_id):
+    return f"db-pin:{user_id}"
+
+
+def is_pinned(request):
+    """Return whether the request's user must read from the primary"""
+    if not hasattr(request, "_db_pinned"):
+        user = getattr(request, "user", None)
+        request._db_pinned = bool(
+            user
+            and user.is_authenticated
+            and cache.get(pin_key(user.pk))
+        )
+    return request._db_pinned
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        request = _current_request.get()
+
+        if (
+            request is None
+            or not settings.DATABASE_REPLICAS
+            or request.method not in SAFE_METHODS
+            or model._meta.app_label not in settings.REPLICA_ROUTED_APPS
+            or is_pinned(request)
+        ):
+            return None
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware(SyncAndAsyncMiddleware):
+    """Expose the request to the router and pin users after writes"""
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def call(self, request):
+        token = _current_request.set(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_request.reset(token)
+
+        if self.pins(request, response):
+            cache.set(
+                pin_key(request.user.pk), True, settings.REPLICA_PIN_SECONDS
+            )
+        return response
+
+    async def __acall__(self, request):
+        token = _current_request.set(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_request.reset(token)
+
+        # request.user may still have to be loaded from the session
+        if await sync_to_async(self.pins)(request, response):
+            await cache.aset(
+                pin_key(request.user.pk), True, settings.REPLICA_PIN_SECONDS
+            )
+        return response
+
+    def pins(self, request, response):
+        """A successful write by a user pins them to the primary"""
+        user = getattr(request, "user", None)
+        return bool(
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and user
+            and user.is_authenticated
+        )
@@ -0,0 +1,209 @@
+"""
+Slow query log.
+
+`SlowQueryMiddleware` times every query of a request. A query slower than
+SLOW_QUERY_LOG["THRESHOLD_MS"] is recorded with the view that ran it and
+its plan (`EXPLAIN` without ANALYZE, so the statement is not executed
+twice) into a ring buffer of the last SLOW_QUERY_LOG["SIZE"] entries.
+The parameters (password hashes, emails, tokens...) are left out, and
+the string literals of the plan masked, unless SLOW_QUERY_LOG["PARAMS"]
+is set. Every worker process keeps its own buffer; admins read, download
+or clear it through `/api/admin/slow-queries/`.
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from theatre_service.db.instrumentation import (
+    SyncAndAsyncMiddleware,
+    get_view_name,
+    observe_queries,
+)
+
+
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+MAX_SQL_LENGTH = 10000
+SAVEPOINT = "slow_query_explain"
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+
+class SlowQueryLog:
+    def __init__(self, size=100):
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def record(self, entry):
+        with self._lock:
+            self._entries.append(entry)
+
+    def entries(self):
+        """Return the entries, newest first"""
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def dump(self, path):
+        """Write the entries to `path` as JSON lines"""
+        with open(path, "w") as file:
+            for entry in self.entries():
+                file.write(json.dumps(entry) + "\n")
+
+
+slow_query_log = SlowQueryLog(settings.SLOW_QUERY_LOG["SIZE"])
+
+
+def explain(connection, sql, params):
+    """
+    Return the plan of a statement, as text lines. The backend cursor is
+    used directly, so neither the EXPLAIN nor its savepoint go through the
+    execute wrappers (and the query counts) of the request.
+    """
+    prefix = connection.ops.explain_query_prefix()
+    savepoint = connection.in_atomic_block
+    cursor = connection.create_cursor()
+    try:
+        with connection.wrap_database_errors:
+            if savepoint:
+                cursor.execute(connection.ops.savepoint_create_sql(SAVEPOINT))
+            try:
+                cursor.execute(f"{prefix} {sql}", params)
+                rows = cursor.fetchall()
+            except DatabaseError:
+                if savepoint:
+                    cursor.execute(
+                        connection.ops.savepoint_rollback_sql(SAVEPOINT)
+                    )
+                raise
+            if savepoint:
+                cursor.execute(connection.ops.savepoint_commit_sql(SAVEPOINT))
+    except DatabaseError as error:
+        return [f"EXPLAIN failed: {error}"]
+    finally:
+        cursor.close()
+    return [" ".join(str(column) for column in row) for row in rows]
+
+
+class SlowQueryRecorder:
+    def __init__(self, request, threshold_ms):
+        self.request = request
+        self.threshold = threshold_ms / 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - started
+
+        if duration >= self.threshold:
+            self.record(context["connection"], sql, params, many, duration)
+        return result
+
+    def record(self, connection, sql, params, many, duration):
+        plan = None
+        if (
+            settings.SLOW_QUERY_LOG["EXPLAIN"]
+            and not many
+            and sql.lstrip().upper().startswith(EXPLAINABLE)
+        ):
+            plan = explain(connection, sql, params)
+        if settings.SLOW_QUERY_LOG["PARAMS"]:
+            params = json.loads(json.dumps(params, default=str))
+        else:
+            params = None
+            if plan:
+                plan = [STRING_LITERAL.sub("'?'", line) for line in plan]
+
+        slow_query_log.record(
+            {
+                "time": datetime.now(timezone.utc).isoformat(),
+                "duration_ms": round(duration * 1000, 3),
+                "database": connection.alias,
+                "sql": sql[:MAX_SQL_LENGTH],
+                "params": params,
+                "many": many,
+                "method": self.request.method,
+                "path": self.request.path,
+                "view": getattr(self.request, "_slow_query_view", None),
+                "pid": os.getpid(),
+                "plan": plan,
+            }
+        )
+
+
+class SlowQueryMiddleware(SyncAndAsyncMiddleware):
+    """Record the queries of a request slower than the threshold"""
+
+    def __init__(self, get_response):
+        self.threshold_ms = settings.SLOW_QUERY_LOG["THRESHOLD_MS"]
+        if self.threshold_ms is None:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def call(self, request):
+        with observe_queries(SlowQueryRecorder(request, self.threshold_ms)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with observe_queries(SlowQueryRecorder(request, self.threshold_ms)):
+            return await self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._slow_query_view = get_view_name(
+            view_func, request.method
+        ) or request.resolver_match.view_name
+
+
+class SlowQueryListView(APIView):
+    """Slow queries recorded by the worker that serves the request"""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        return Response(
+            {
+                "pid": os.getpid(),
+                "threshold_ms": settings.SLOW_QUERY_LOG["THRESHOLD_MS"],
+                "results": slow_query_log.entries(),
+            }
+        )
+
+    def delete(self, request, *args, **kwargs):
+        slow_query_log.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class SlowQueryDownloadView(APIView):
+    """Download the slow queries as JSON lines"""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        response = HttpResponse(
+            "".join(
+                json.dumps(entry) + "\n"
+                for entry in slow_query_log.entries()
+            ),
+            content_type="application/x-ndjson",
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="slow-queries-{os.getpid()}.jsonl"'
+        )
+        return response
@@ -0,0 +1,182 @@
+"""
+Liveness and readiness probes.
+
+`/healthz` only proves the process answers requests and does no I/O, so
+a busy database never gets a healthy worker restarted. `/readyz` checks
+what a worker needs to serve traffic: every database answers, the
+connection pools are not saturated, there are no unapplied migrations
+and every cache round-trips a value. It answers 503 when a check fails
+and only logs which one, so the response says nothing about the
+infrastructure. `/readyz` and `/metrics` are `internal_only`.
+"""
+import hmac
+import ipaddress
+import logging
+import os
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.http import HttpResponseForbidden, JsonResponse
+from django.views.decorators.cache import never_cache
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from theatre_service.db.pool import pool_stats
+
+
+logger = logging.getLogger(__name__)
+
+_migrations_applied = False
+
+
+def api_user(request):
+    """
+    The user of the session, else the one the API's authenticators (JWT)
+    resolve: the middlewares only know the session
+    """
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return user
+    drf_request = Request(request)
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            result = authentication_class().authenticate(drf_request)
+        except APIException:
+            return None
+        if result is not None:
+            return result[0]
+    return None
+
+
+def is_internal(request):
+    """
+    Requests with "Authorization: Bearer <OPS_TOKEN>", clients in
+    OPS_ALLOWED_NETWORKS and staff users
+    """
+    token = settings.OPS_TOKEN
+    header = request.headers.get("Authorization", "")
+    if token and hmac.compare_digest(header, f"Bearer {token}"):
+        return True
+
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        address = None
+    if address is not None and any(
+        address in ipaddress.ip_network(network)
+        for network in settings.OPS_ALLOWED_NETWORKS
+    ):
+        return True
+
+    user = api_user(request)
+    return user is not None and user.is_staff
+
+
+def internal_only(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not is_internal(request):
+            return HttpResponseForbidden()
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def _timed(check):
+    started = time.monotonic()
+    try:
+        result = {"ok": True, **(check() or {})}
+    except Exception as error:
+        result = {"ok": False, "error": f"{type(error).__name__}: {error}"}
+    result["ms"] = round((time.monotonic() - started) * 1000, 3)
+    return result
+
+
+def check_database(alias):
+    with connections[alias].cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+
+
+def check_migrations():
+    """
+    Count unapplied migrations. Loading the migration graph is slow, so
+    once everything is applied the result is kept for the process.
+    """
+    global _migrations_applied
+    if _migrations_applied:
+        return {"pending": 0}
+
+    from django.db.migrations.executor import MigrationExecutor
+
+    executor = MigrationExecutor(connections["default"])
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    if plan:
+        raise RuntimeError(f"{len(plan)} unapplied migration(s)")
+    _migrations_applied = True
+    return {"pending": 0}
+
+
+def check_cache(alias):
+    cache = caches[alias]
+    key = f"readyz:{os.getpid()}"
+    token = uuid.uuid4().hex
+    cache.set(key, token, timeout=10)
+    if cache.get(key) != token:
+        raise RuntimeError("value written to the cache was not read back")
+
+
+def check_pools():
+    pools = pool_stats()
+    saturated = [
+        stats["name"] for stats in pools
+        if stats["in_use"] >= stats["max_size"]
+    ]
+    if saturated:
+        raise RuntimeError(f"saturated pool(s): {', '.join(saturated)}")
+    return {
+        "pools": [
+            {
+                key: stats[key]
+                for key in ("name", "in_use", "idle", "max_size", "timeouts")
+            }
+            for stats in pools
+        ]
+    }
+
+
+@never_cache
+def healthz(request):
+    return JsonResponse({"status": "ok"})
+
+
+@never_cache
+@internal_only
+def readyz(request):
+    # Pools first: the database checks below check a connection out
+    checks = {"pools": _timed(check_pools)}
+    checks.update(
+        (
+            f"database:{alias}",
+            _timed(lambda alias=alias: check_database(alias)),
+        )
+        for alias in settings.DATABASES
+    )
+    checks["migrations"] = _timed(check_migrations)
+    checks.update(
+        (f"cache:{alias}", _timed(lambda alias=alias: check_cache(alias)))
+        for alias in settings.CACHES
+    )
+
+    failed = {name: check for name, check in checks.items() if not check["ok"]}
+    if failed:
+        logger.warning("Not ready: %s", failed)
+    return JsonResponse(
+        {"status": "unavailable" if failed else "ok"},
+        status=503 if failed else 200,
+    )
@@ -0,0 +1,353 @@
+"""
+In-process metrics in the Prometheus text format.
+
+Counters and histograms live in memory, so updating one is a dict lookup
+under a lock. Under a pre-fork server each worker has its own registry;
+when METRICS_DIR is set, every worker flushes a snapshot to
+`<METRICS_DIR>/metrics-<pid>.json` at most every METRICS_FLUSH_INTERVAL
+seconds, and `/metrics` sums the snapshots of all workers. When a worker
+exits, gunicorn's master folds its snapshot into `metrics-archive.json`
+(see gunicorn.conf.py), so counters stay monotonic across restarts.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.views.decorators.cache import never_cache
+
+from theatre_service.db.instrumentation import (
+    SyncAndAsyncMiddleware,
+    get_view_name,
+    track_queries,
+)
+from theatre_service.health import internal_only
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+ARCHIVE_FILE = "metrics-archive.json"
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "type": self.type,
+                "help": self.documentation,
+                "labelnames": self.labelnames,
+                "samples": [
+                    [list(key), list(value) if self.type == "histogram"
+                     else value]
+                    for key, value in self._values.items()
+                ],
+            }
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=None):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets or DEFAULT_BUCKETS)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # Per-bucket (not cumulative) counts, then +Inf, sum and count
+            values = self._values.get(key)
+            if values is None:
+                values = self._values[key] = [0] * (len(self.buckets) + 3)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    values[index] += 1
+                    break
+            else:
+                values[-3] += 1
+            values[-2] += value
+            values[-1] += 1
+
+    def snapshot(self):
+        snapshot = super().snapshot()
+        snapshot["buckets"] = self.buckets
+        return snapshot
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._last_flush = 0.0
+        self._flush_lock = threading.Lock()
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=None):
+        return self.register(
+            Histogram(name, documentation, labelnames, buckets)
+        )
+
+    def reset(self):
+        """Forget every value, e.g. in a process forked from this one"""
+        for metric in self.metrics.values():
+            metric.reset()
+        self._last_flush = 0.0
+
+    def snapshot(self):
+        return {
+            name: metric.snapshot() for name, metric in self.metrics.items()
+        }
+
+    def flush(self, directory=None):
+        """Write this process's snapshot to the metrics directory"""
+        directory = directory or settings.METRICS_DIR
+        if not directory:
+            return
+        with self._flush_lock:
+            path = Path(directory) / f"metrics-{os.getpid()}.json"
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(self.snapshot()))
+            os.replace(tmp_path, path)
+            self._last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        if (
+            settings.METRICS_DIR
+            and time.monotonic() - self._last_flush
+            >= settings.METRICS_FLUSH_INTERVAL
+        ):
+            self.flush()
+
+    def collect(self):
+        """Return the snapshot of every process, merged"""
+        snapshots = [self.snapshot()]
+        if settings.METRICS_DIR:
+            own = f"metrics-{os.getpid()}.json"
+            snapshots += [
+                snapshot
+                for path, snapshot in read_snapshots(settings.METRICS_DIR)
+                if path.name != own
+            ]
+        return merge_snapshots(snapshots)
+
+
+def read_snapshots(directory):
+    for path in sorted(Path(directory).glob("metrics-*.json")):
+        try:
+            yield path, json.loads(path.read_text())
+        except (OSError, ValueError):
+            # The file of a worker that exited between glob and read
+            continue
+
+
+def merge_snapshots(snapshots):
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(
+                name, {**metric, "samples": {}}
+            )
+            for key, value in metric["samples"]:
+                key = tuple(key)
+                current = target["samples"].get(key)
+                if current is None:
+                    target["samples"][key] = value
+                elif isinstance(value, list):
+                    target["samples"][key] = [
+                        a + b for a, b in zip(current, value)
+                    ]
+                else:
+                    target["samples"][key] = current + value
+    return merged
+
+
+def archive_process(directory, pid):
+    """
+    Fold the snapshot of an exited process into the archive file.
+    Called by gunicorn's master only, so the archive has a single writer.
+    """
+    directory = Path(directory)
+    path = directory / f"metrics-{pid}.json"
+    archive = directory / ARCHIVE_FILE
+    try:
+        snapshot = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return
+
+    snapshots = [snapshot]
+    if archive.exists():
+        snapshots.append(json.loads(archive.read_text()))
+    merged = {
+        name: {
+            **metric,
+            "samples": [
+                [list(key), value] for key, value in metric["samples"].items()
+            ],
+        }
+        for name, metric in merge_snapshots(snapshots).items()
+    }
+    tmp_path = archive.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(merged))
+    os.replace(tmp_path, archive)
+    path.unlink()
+
+
+def _escape(value):
+    return (
+        str(value)
+        .replace("\\", r"\\")
+        .replace("\n", r"\n")
+        .replace('"', r"\"")
+    )
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(
+        f'{name}="{_escape(value)}"' for name, value in pairs
+    ) + "}"
+
+
+def render(metrics):
+    """Render merged snapshots in the Prometheus text format"""
+    lines = []
+    for name, metric in sorted(metrics.items()):
+        lines.append(f"# HELP {name} {_escape(metric['help'])}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        names = metric["labelnames"]
+        for key, value in sorted(metric["samples"].items()):
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_labels(names, key)} {value}")
+                continue
+
+            cumulative = 0
+            bounds = [*map(str, metric["buckets"]), "+Inf"]
+            for bound, count in zip(bounds, value[:-2]):
+                cumulative += count
+                labels = _labels(names, key, [("le", bound)])
+                lines.append(f"{name}_bucket{labels} {cumulative}")
+            labels = _labels(names, key)
+            lines.append(f"{name}_sum{labels} {value[-2]}")
+            lines.append(f"{name}_count{labels} {value[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Time spent serving a request, by view action.",
+    ("view", "method", "status"),
+)
+DB_QUERIES = REGISTRY.counter(
+    "db_queries_total",
+    "SQL queries executed while serving requests.",
+    ("view",),
+)
+DB_TIME = REGISTRY.counter(
+    "db_query_seconds_total",
+    "Time spent in SQL queries while serving requests.",
+    ("view",),
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "cache_requests_total",
+    "Cache lookups by cache and result (hit, miss or stale).",
+    ("cache", "result"),
+)
+THROTTLE_REJECTIONS = REGISTRY.counter(
+    "throttle_rejections_total",
+    "Requests rejected by a throttle, by scope.",
+    ("scope",),
+)
+RESERVATIONS = REGISTRY.counter(
+    "reservations_total",
+    "Reservation attempts by outcome "
+    "(success, seat_conflict, validation_error, concurrency_conflict).",
+    ("outcome",),
+)
+
+os.register_at_fork(after_in_child=REGISTRY.reset)
+
+
+class MetricsMiddleware(SyncAndAsyncMiddleware):
+    """Record the latency and the SQL cost of every request"""
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def call(self, request):
+        started = time.perf_counter()
+        with track_queries() as stats:
+            response = self.get_response(request)
+        return self.record(request, response, stats, started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with track_queries() as stats:
+            response = await self.get_response(request)
+        return self.record(request, response, stats, started)
+
+    def record(self, request, response, stats, started):
+        view = getattr(request, "_metrics_view", None)
+        if view is not None:
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - started,
+                view=view,
+                method=request.method,
+                status=response.status_code,
+            )
+            DB_QUERIES.inc(stats.count, view=view)
+            DB_TIME.inc(stats.duration, view=view)
+        REGISTRY.maybe_flush()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if view_func is not metrics_view:
+            request._metrics_view = get_view_name(
+                view_func, request.method
+            ) or request.resolver_match.view_name
+
+
+@never_cache
+@internal_only
+def metrics_view(request):
+    return HttpResponse(render(REGISTRY.collect()), content_type=CONTENT_TYPE)
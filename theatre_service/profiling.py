@@ -0,0 +1,468 @@
+"""
+Sampled request profiling.
+
+`ProfilingMiddleware` runs a request under cProfile when it is sampled:
+either at random, with the probability an admin sets through
+`/api/admin/profiling/` (off until then), or because it carries a signed
+`X-Profile` header minted by `/api/admin/profiling/token/`, which
+profiles a single request. The stats are merged per view and kept in the
+PROFILING["CACHE"] cache, so every worker adds to the same profiles (one
+at a time, under a lock taken with `cache.add`), trimmed to the
+PROFILING["TOP_N"] functions with the largest cumulative time, for at
+most PROFILING["MAX_VIEWS"] views. While cProfile runs, a thread samples
+the stack of the request every PROFILING["STACK_INTERVAL"] seconds (the
+TOP_N most frequent stacks are kept). A profile downloads as a pstats
+file (`python -m pstats`, snakeviz) or, with `?type=collapsed`, as the
+sampled stacks for flamegraph.pl / speedscope. The profiling endpoints
+are never profiled.
+
+Only the thread of the request is profiled. Under ASGI that is the
+thread asgiref dedicates to the request for its sync code (sync views,
+ORM calls), so the parts of an async view run on the event loop are left
+out rather than mixed with the other requests the loop serves.
+"""
+import cProfile
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import thread as executor_thread
+from datetime import datetime, timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse
+from rest_framework import serializers, status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from theatre_service.db.instrumentation import (
+    SyncAndAsyncMiddleware,
+    get_view_name,
+)
+
+
+CONFIG_KEY = "profiling:config"
+INDEX_KEY = "profiling:views"
+PROFILE_KEY = "profiling:view:{}"
+LOCK_KEY = "profiling:lock"
+# Seconds a worker waits for the lock, and after which a lock left by a
+# dead worker expires
+LOCK_WAIT = 2
+LOCK_TIMEOUT = 10
+TOKEN_KEY = "profiling:token:{}"
+TOKEN_SALT = "theatre_service.profiling"
+HEADER = "X-Profile"
+DEFAULT_CONFIG = {"enabled": False, "sample_rate": 0.0}
+
+
+def get_cache():
+    return caches[settings.PROFILING["CACHE"]]
+
+
+class ProfilingConfig:
+    """The admin settings, re-read from the cache every few seconds"""
+
+    def __init__(self):
+        self._value = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if time.monotonic() >= self._expires:
+                self._value = {
+                    **DEFAULT_CONFIG,
+                    **get_cache().get(CONFIG_KEY, {}),
+                }
+                self._expires = (
+                    time.monotonic() + settings.PROFILING["CONFIG_TTL"]
+                )
+            return self._value
+
+    def set(self, value):
+        get_cache().set(CONFIG_KEY, value, timeout=None)
+        with self._lock:
+            self._value = {**DEFAULT_CONFIG, **value}
+            self._expires = (
+                time.monotonic() + settings.PROFILING["CONFIG_TTL"]
+            )
+
+
+config = ProfilingConfig()
+
+
+class _RawStats:
+    """Let `pstats.Stats` load a stats dict"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def trim_stats(stats, top_n):
+    """Keep the `top_n` functions with the largest cumulative time"""
+    kept = set(
+        sorted(stats, key=lambda func: stats[func][3], reverse=True)[:top_n]
+    )
+    return {
+        func: (cc, nc, tt, ct, {
+            caller: edge
+            for caller, edge in callers.items()
+            if caller in kept
+        })
+        for func, (cc, nc, tt, ct, callers) in stats.items()
+        if func in kept
+    }
+
+
+@contextmanager
+def cache_lock(key):
+    """
+    Hold `key` in the profiling cache; yield False if another worker kept
+    it for LOCK_WAIT seconds
+    """
+    cache = get_cache()
+    deadline = time.monotonic() + LOCK_WAIT
+    while not cache.add(key, True, timeout=LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            yield False
+            return
+        time.sleep(0.01)
+    try:
+        yield True
+    finally:
+        cache.delete(key)
+
+
+class ProfileStore:
+    """Aggregated profiles per view, bounded in views and functions"""
+
+    def add(self, view, profiler, stacks):
+        """
+        Merge a profile into the one of the view and return whether it was
+        stored. The read-merge-write of the profile and of the index runs
+        under a lock, or concurrent workers would overwrite each other.
+        """
+        with cache_lock(LOCK_KEY) as locked:
+            if locked:
+                self.merge(view, profiler, stacks)
+            return locked
+
+    def merge(self, view, profiler, stacks):
+        merged = pstats.Stats(profiler)
+        profile = get_cache().get(PROFILE_KEY.format(view))
+        if profile:
+            merged.add(_RawStats(profile["stats"]))
+            stacks = stacks + Counter(profile["stacks"])
+        top_n = settings.PROFILING["TOP_N"]
+        self.save(
+            view,
+            {
+                "samples": (profile["samples"] if profile else 0) + 1,
+                "updated": datetime.now(timezone.utc).isoformat(),
+                "stats": trim_stats(merged.stats, top_n),
+                "stacks": dict(stacks.most_common(top_n)),
+            },
+        )
+
+    def save(self, view, profile):
+        cache = get_cache()
+        index = cache.get(INDEX_KEY, {})
+        index[view] = time.time()
+        evicted = sorted(index, key=index.get)[
+            :max(0, len(index) - settings.PROFILING["MAX_VIEWS"])
+        ]
+        for name in evicted:
+            del index[name]
+        cache.delete_many([PROFILE_KEY.format(name) for name in evicted])
+        cache.set(PROFILE_KEY.format(view), profile, timeout=None)
+        cache.set(INDEX_KEY, index, timeout=None)
+
+    def get(self, view):
+        return get_cache().get(PROFILE_KEY.format(view))
+
+    def views(self):
+        """Return the profiled views, most recently updated first"""
+        index = get_cache().get(INDEX_KEY, {})
+        return sorted(index, key=index.get, reverse=True)
+
+    def clear(self):
+        cache = get_cache()
+        cache.delete_many(
+            [PROFILE_KEY.format(view) for view in self.views()] + [INDEX_KEY]
+        )
+
+
+profile_store = ProfileStore()
+
+
+def top_functions(stats, limit=20):
+    return [
+        {
+            "function": pstats.func_std_string(func),
+            "calls": nc,
+            "tottime": round(tt, 6),
+            "cumtime": round(ct, 6),
+        }
+        for func, (cc, nc, tt, ct, callers) in sorted(
+            stats.items(), key=lambda item: item[1][3], reverse=True
+        )[:limit]
+    ]
+
+
+def frame_label(code):
+    label = (
+        f"{code.co_name} "
+        f"({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+    return label.replace(";", ",")
+
+
+class StackSampler(threading.Thread):
+    """
+    Count the stacks of another thread below `root_frame` every
+    `interval` seconds. cProfile only records caller -> callee pairs,
+    which cannot be put back together into the stacks a flamegraph needs
+    (Django re-enters the same middleware wrapper at every level).
+    """
+
+    def __init__(self, thread_id, root_frame, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.root_frame = root_frame
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame is not self.root_frame:
+                stack.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def collapsed_stacks(stacks):
+    """Format stack counts as "frame;frame;frame <samples>" lines"""
+    return "".join(
+        f"{stack} {count}\n" for stack, count in sorted(stacks.items())
+    )
+
+
+def make_token():
+    """A signed token that profiles one request within TOKEN_MAX_AGE"""
+    nonce = uuid.uuid4().hex
+    get_cache().set(
+        TOKEN_KEY.format(nonce),
+        True,
+        timeout=settings.PROFILING["TOKEN_MAX_AGE"],
+    )
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(nonce)
+
+
+def has_valid_token(request):
+    """Whether the request carries a token, which is then used up"""
+    token = request.headers.get(HEADER)
+    if not token:
+        return False
+    try:
+        nonce = signing.TimestampSigner(salt=TOKEN_SALT).unsign(
+            token, max_age=settings.PROFILING["TOKEN_MAX_AGE"]
+        )
+    except signing.BadSignature:
+        return False
+    # Only the first request deleting the key gets profiled
+    return bool(get_cache().delete(TOKEN_KEY.format(nonce)))
+
+
+def executor_root_frame():
+    """The frame of the executor loop running the current thread, if any"""
+    frame = sys._getframe()
+    while frame is not None:
+        if frame.f_code is executor_thread._worker.__code__:
+            return frame
+        frame = frame.f_back
+    return None
+
+
+class ProfilingMiddleware(SyncAndAsyncMiddleware):
+    """Profile sampled requests and merge the stats per view"""
+
+    def __init__(self, get_response):
+        if not settings.PROFILING["ENABLED"]:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def sampled(self, request):
+        if has_valid_token(request):
+            return True
+        current = config.get()
+        return current["enabled"] and random.random() < current["sample_rate"]
+
+    def start(self, root_frame):
+        """
+        Profile the current thread below `root_frame`; None when another
+        profiler (e.g. a debug toolbar panel) is running
+        """
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return None
+        sampler = StackSampler(
+            threading.get_ident(),
+            root_frame,
+            settings.PROFILING["STACK_INTERVAL"],
+        )
+        sampler.start()
+        return profiler, sampler
+
+    def stop(self, profiler, sampler):
+        profiler.disable()
+        sampler.stop()
+
+    def store(self, request, response, profiler, sampler):
+        view = getattr(request, "_profiling_view", None)
+        if view and getattr(request, "_profiling_allowed", True):
+            if profile_store.add(view, profiler, sampler.stacks):
+                response["X-Profiled-View"] = view
+        return response
+
+    def call(self, request):
+        if not self.sampled(request):
+            return self.get_response(request)
+
+        profiling = self.start(sys._getframe())
+        if profiling is None:
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.stop(*profiling)
+        return self.store(request, response, *profiling)
+
+    async def __acall__(self, request):
+        if not self.sampled(request):
+            return await self.get_response(request)
+
+        # Started and stopped on the thread of the request's sync code
+        profiling = await sync_to_async(
+            lambda: self.start(executor_root_frame())
+        )()
+        if profiling is None:
+            return await self.get_response(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(self.stop)(*profiling)
+        return await sync_to_async(self.store)(request, response, *profiling)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._profiling_allowed = getattr(
+            getattr(view_func, "cls", None), "profiled", True
+        )
+        request._profiling_view = get_view_name(
+            view_func, request.method
+        ) or request.resolver_match.view_name
+
+
+class ProfilingConfigSerializer(serializers.Serializer):
+    enabled = serializers.BooleanField()
+    sample_rate = serializers.FloatField(min_value=0, max_value=1)
+
+
+class ProfilingView(APIView):
+    """Sampling settings and a summary of the stored profiles"""
+
+    profiled = False
+    permission_classes = (IsAdminUser,)
+    serializer_class = ProfilingConfigSerializer
+
+    def get(self, request, *args, **kwargs):
+        views = []
+        for view in profile_store.views():
+            profile = profile_store.get(view)
+            if profile:
+                views.append(
+                    {
+                        "view": view,
+                        "samples": profile["samples"],
+                        "updated": profile["updated"],
+                        "top": top_functions(profile["stats"]),
+                    }
+                )
+        return Response({"config": config.get(), "views": views})
+
+    def put(self, request, *args, **kwargs):
+        serializer = ProfilingConfigSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        config.set(serializer.validated_data)
+        return Response(serializer.validated_data)
+
+    def delete(self, request, *args, **kwargs):
+        profile_store.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ProfilingTokenView(APIView):
+    """Mint a value for the header that profiles one request, once"""
+
+    profiled = False
+    permission_classes = (IsAdminUser,)
+
+    def post(self, request, *args, **kwargs):
+        return Response(
+            {
+                "header": HEADER,
+                "token": make_token(),
+                "max_age": settings.PROFILING["TOKEN_MAX_AGE"],
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class ProfileDownloadView(APIView):
+    """Download the profile of a view as pstats or collapsed stacks"""
+
+    profiled = False
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, view, *args, **kwargs):
+        profile = profile_store.get(view)
+        if not profile:
+            raise Http404
+
+        if request.query_params.get("type") == "collapsed":
+            response = HttpResponse(
+                collapsed_stacks(profile["stacks"]),
+                content_type="text/plain; charset=utf-8",
+            )
+            filename = f"{view}.collapsed"
+        else:
+            response = HttpResponse(
+                marshal.dumps(profile["stats"]),
+                content_type="application/octet-stream",
+            )
+            filename = f"{view}.pstats"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
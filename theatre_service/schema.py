@@ -0,0 +1,120 @@
+"""
+Prebuilt OpenAPI schema.
+
+`manage.py build_schema` renders the schema once at deploy time into
+OPENAPI_SCHEMA_DIR, one file per API version and format. The schema view
+serves those bytes from memory with an ETag and a precompressed gzip
+variant; a process only introspects the viewsets itself when the file
+for the current version is missing.
+"""
+import gzip
+import hashlib
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.views import View
+
+
+SCHEMA_FORMATS = {
+    "yaml": "application/vnd.oai.openapi",
+    "json": "application/vnd.oai.openapi+json",
+}
+
+
+class RenderedSchema:
+    def __init__(self, body):
+        self.body = body
+        self.gzip_body = gzip.compress(body, mtime=0)
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+
+
+_schemas = {}
+_schemas_lock = threading.Lock()
+
+
+def schema_version():
+    return settings.SPECTACULAR_SETTINGS["VERSION"]
+
+
+def schema_path(fmt):
+    return Path(settings.OPENAPI_SCHEMA_DIR) / (
+        f"openapi-{schema_version()}.{fmt}"
+    )
+
+
+def render_schema(fmt):
+    """Introspect the API and render the schema (slow)"""
+    from drf_spectacular.generators import SchemaGenerator
+    from drf_spectacular.renderers import (
+        OpenApiJsonRenderer,
+        OpenApiYamlRenderer,
+    )
+
+    renderer = OpenApiJsonRenderer() if fmt == "json" else (
+        OpenApiYamlRenderer()
+    )
+    schema = SchemaGenerator().get_schema(request=None, public=True)
+    return renderer.render(schema, renderer_context={})
+
+
+def build_schema_files():
+    """Render every format to disk and return the written paths"""
+    paths = []
+    for fmt in SCHEMA_FORMATS:
+        path = schema_path(fmt)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(render_schema(fmt))
+        paths.append(path)
+    return paths
+
+
+def get_schema(fmt):
+    """Return the schema for the current version, rendering it if needed"""
+    key = (schema_version(), fmt)
+
+    with _schemas_lock:
+        schema = _schemas.get(key)
+        if schema is None:
+            path = schema_path(fmt)
+            body = path.read_bytes() if path.exists() else render_schema(fmt)
+            schema = _schemas[key] = RenderedSchema(body)
+    return schema
+
+
+def clear_schema_cache():
+    with _schemas_lock:
+        _schemas.clear()
+
+
+class CachedSchemaView(View):
+    """Serve the prebuilt schema, YAML by default or ?format=json"""
+
+    def get(self, request, *args, **kwargs):
+        fmt = request.GET.get("format")
+        if fmt not in SCHEMA_FORMATS:
+            accept = request.headers.get("Accept", "")
+            fmt = "json" if "json" in accept else "yaml"
+
+        schema = get_schema(fmt)
+        use_gzip = "gzip" in request.headers.get("Accept-Encoding", "")
+        etag = f'"{schema.etag}-gzip"' if use_gzip else f'"{schema.etag}"'
+
+        if etag in request.headers.get("If-None-Match", ""):
+            response = HttpResponseNotModified()
+        elif use_gzip:
+            response = HttpResponse(
+                schema.gzip_body, content_type=SCHEMA_FORMATS[fmt]
+            )
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(
+                schema.body, content_type=SCHEMA_FORMATS[fmt]
+            )
+
+        response["ETag"] = etag
+        response["Cache-Control"] = "public, max-age=300"
+        patch_vary_headers(response, ("Accept", "Accept-Encoding"))
+        return response
@@ -10,8 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 import os
+import sys
 from datetime import timedelta
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -26,17 +28,32 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.environ.get("SECRET_KEY")
 
+# "development" or "production"
+DJANGO_ENV = os.environ.get("DJANGO_ENV", "development")
+
+PRODUCTION = DJANGO_ENV == "production"
+
+# API-only pods serve /api/ without the admin, API docs and debug apps
+API_ONLY = os.environ.get("DJANGO_API_ONLY", "0") == "1"
+
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get("DEBUG", "0" if PRODUCTION else "1") == "1"
+
+# Comma-separated host names, required in production
+ALLOWED_HOSTS = list(
+    filter(
+        None,
+        os.environ.get("ALLOWED_HOSTS", "" if PRODUCTION else "*").split(","),
+    )
+)
 
-ALLOWED_HOSTS = ["*"]
+if PRODUCTION and not ALLOWED_HOSTS:
+    raise ImproperlyConfigured("Set ALLOWED_HOSTS in production")
 
 
 # Application definition
 
 INSTALLED_APPS = [
-    "admin_interface",
-    "colorfield",
     "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
@@ -46,14 +63,38 @@ INSTALLED_APPS = [
     "rest_framework",
     "user",
     "theatre",
-    "debug_toolbar",
     "rest_framework.authtoken",
     "drf_spectacular",
 ]
 
+# The admin theme and the debug toolbar (which records every SQL query
+# with its stack trace) are development-only.
+if not PRODUCTION and not API_ONLY:
+    INSTALLED_APPS = (
+        ["admin_interface", "colorfield"]
+        + INSTALLED_APPS
+        + ["debug_toolbar"]
+    )
+
+if API_ONLY:
+    INSTALLED_APPS = [
+        app
+        for app in INSTALLED_APPS
+        if app not in (
+            "django.contrib.admin",
+            "django.contrib.messages",
+            "drf_spectacular",
+        )
+    ]
+
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
+    "theatre_service.tracing.TracingMiddleware",
+    "theatre_service.metrics.MetricsMiddleware",
+    "theatre_service.db.instrumentation.QueryBudgetMiddleware",
+    "theatre_service.db.slow_queries.SlowQueryMiddleware",
+    "theatre_service.db.routers.ReplicaRoutingMiddleware",
+    "theatre_service.profiling.ProfilingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -62,6 +103,16 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+if PRODUCTION:
+    # Serves the static files collected into the image (the admin's)
+    MIDDLEWARE.insert(1, "whitenoise.middleware.WhiteNoiseMiddleware")
+
+if "debug_toolbar" in INSTALLED_APPS:
+    MIDDLEWARE.insert(1, "debug_toolbar.middleware.DebugToolbarMiddleware")
+
+if API_ONLY:
+    MIDDLEWARE.remove("django.contrib.messages.middleware.MessageMiddleware")
+
 ROOT_URLCONF = "theatre_service.urls"
 
 TEMPLATES = [
@@ -87,15 +138,224 @@ WSGI_APPLICATION = "theatre_service.wsgi.application"
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
 
+# DB_POOL=1 checks connections out of a per-process pool and returns
+# them after each request. Without it, DB_CONN_MAX_AGE > 0 keeps one
+# persistent connection per worker thread instead.
+DB_POOL = os.environ.get("DB_POOL", "0") == "1"
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": (
+            "theatre_service.db.backends.postgresql_pool"
+            if DB_POOL
+            else "django.db.backends.postgresql"
+        ),
         "HOST": os.environ.get("POSTGRES_HOST"),
         "NAME": os.environ.get("POSTGRES_DB"),
         "USER": os.environ.get("POSTGRES_USER"),
         "PASSWORD": os.environ.get("POSTGRES_PASSWORD"),
         "PORT": os.environ.get("DB_PORT"),
+        "CONN_MAX_AGE": (
+            0 if DB_POOL else int(os.environ.get("DB_CONN_MAX_AGE", 0))
+        ),
+        "CONN_HEALTH_CHECKS": (
+            os.environ.get("DB_CONN_HEALTH_CHECKS", "1") == "1"
+        ),
+        "POOL": {
+            "MAX_SIZE": int(os.environ.get("DB_POOL_MAX_SIZE", 10)),
+            "TIMEOUT": float(os.environ.get("DB_POOL_TIMEOUT", 5.0)),
+            "CHECK": os.environ.get("DB_POOL_CHECK", "1") == "1",
+            "CHECK_IDLE_AFTER": float(
+                os.environ.get("DB_POOL_CHECK_IDLE_AFTER", 30)
+            ),
+        },
+    }
+}
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+# With REDIS_URL set, caches are shared by every worker process;
+# otherwise each process falls back to its own in-memory cache.
+REDIS_URL = os.environ.get("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        },
+        "throttle": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "throttle",
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+        "throttle": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "throttle",
+        },
+    }
+
+# Seconds a JWT-authenticated user is served from the cache
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get("AUTH_USER_CACHE_TIMEOUT", 60))
+
+# How concurrent reservations of the same seats are serialized:
+# "none", "ordered", "row", "advisory" or "serializable" (see
+# theatre.serializers.lock_for_reservation and `bench_reservations`).
+# Reservations rolled back by a deadlock or a serialization failure are
+# retried RESERVATION_RETRIES times, then answered with a 409.
+RESERVATION_LOCKING = os.environ.get("RESERVATION_LOCKING", "ordered")
+RESERVATION_RETRIES = int(os.environ.get("RESERVATION_RETRIES", 2))
+
+# Performances shown more than this many days ago are moved to the archive
+# tables by `archive_performances`
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", 365))
+
+# Seconds an analytics report is served from the cache before the next
+# request recomputes it (0 turns the cache off)
+ANALYTICS_CACHE_SECONDS = int(os.environ.get("ANALYTICS_CACHE_SECONDS", 60))
+
+# `manage.py test` is running
+TESTING = sys.argv[1:2] == ["test"]
+
+# Query budgets declared on the viewsets: "off", "warn" or "raise". Tests
+# raise, so a request over its budget fails the test that made it.
+QUERY_BUDGET_MODE = os.environ.get(
+    "QUERY_BUDGET_MODE",
+    "off" if PRODUCTION else "raise" if TESTING else "warn",
+)
+
+# Queries slower than THRESHOLD_MS are kept with their plan in a ring
+# buffer of SIZE entries per worker (SLOW_QUERY_MS="" disables the log).
+# Workers write their buffer to DUMP_DIR, if set, when they exit. PARAMS
+# also keeps the query parameters, which may hold personal data.
+SLOW_QUERY_MS = os.environ.get("SLOW_QUERY_MS", "200")
+
+SLOW_QUERY_LOG = {
+    "THRESHOLD_MS": float(SLOW_QUERY_MS) if SLOW_QUERY_MS else None,
+    "SIZE": int(os.environ.get("SLOW_QUERY_LOG_SIZE", 100)),
+    "EXPLAIN": os.environ.get("SLOW_QUERY_EXPLAIN", "1") == "1",
+    "DUMP_DIR": os.environ.get("SLOW_QUERY_DUMP_DIR"),
+    "PARAMS": os.environ.get("SLOW_QUERY_PARAMS", "0") == "1",
+}
+
+# Sampled cProfile profiles per view, see theatre_service.profiling. The
+# sample rate is set by admins at runtime; ENABLED only installs the hook,
+# off in production unless PROFILING_ENABLED=1.
+PROFILING = {
+    "ENABLED": os.environ.get(
+        "PROFILING_ENABLED", "0" if PRODUCTION else "1"
+    ) == "1",
+    "CACHE": "default",
+    "TOP_N": int(os.environ.get("PROFILING_TOP_N", 300)),
+    # Seconds between stack samples (the GIL switch interval is 0.005)
+    "STACK_INTERVAL": float(
+        os.environ.get("PROFILING_STACK_INTERVAL", 0.005)
+    ),
+    "MAX_VIEWS": int(os.environ.get("PROFILING_MAX_VIEWS", 50)),
+    "TOKEN_MAX_AGE": int(os.environ.get("PROFILING_TOKEN_MAX_AGE", 3600)),
+    "CONFIG_TTL": float(os.environ.get("PROFILING_CONFIG_TTL", 5)),
+}
+
+# Spans around the view, serializer, query and renderer layers of a
+# request, see theatre_service.tracing. Requests are traced with the
+# probability SAMPLE_RATE; a trace id in HEADER is reused, and forces a
+# trace for internal requests only.
+TRACING = {
+    "ENABLED": os.environ.get("TRACING_ENABLED", "0") == "1",
+    "SAMPLE_RATE": float(os.environ.get("TRACING_SAMPLE_RATE", 1)),
+    "HEADER": "X-Trace-Id",
+    "MAX_SPANS": int(os.environ.get("TRACING_MAX_SPANS", 1000)),
+    "EXPORTER": os.environ.get(
+        "TRACING_EXPORTER", "theatre_service.tracing.JsonFileExporter"
+    ),
+    "EXPORTER_OPTIONS": {
+        "path": os.environ.get("TRACING_FILE", BASE_DIR / "traces.jsonl"),
+    },
+}
+
+# Prometheus metrics on /metrics. Set METRICS_DIR to a directory shared by
+# the workers of a pre-fork server (emptied by gunicorn on start).
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+METRICS_DIR = os.environ.get("METRICS_DIR")
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", 1))
+
+# /readyz and /metrics answer staff users, requests sending
+# "Authorization: Bearer <OPS_TOKEN>" and clients in OPS_ALLOWED_NETWORKS
+# (comma-separated, e.g. 10.0.0.0/8); everyone else gets a 403
+OPS_TOKEN = os.environ.get("OPS_TOKEN")
+OPS_ALLOWED_NETWORKS = list(
+    filter(None, os.environ.get("OPS_ALLOWED_NETWORKS", "").split(","))
+)
+
+# Read replicas, e.g. DATABASE_REPLICA_HOSTS=replica-1,replica-2.
+# Replicas are mirrors of "default" in tests.
+DATABASE_REPLICAS = []
+
+for index, host in enumerate(
+    filter(None, os.environ.get("DATABASE_REPLICA_HOSTS", "").split(","))
+):
+    alias = f"replica_{index}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "TEST": {"MIRROR": "default"},
     }
+    DATABASE_REPLICAS.append(alias)
+
+# Users are pinned to the primary after a write through the cache, which
+# every worker must share (tests run in one process)
+if DATABASE_REPLICAS and not REDIS_URL and not TESTING:
+    raise ImproperlyConfigured("DATABASE_REPLICA_HOSTS needs REDIS_URL")
+
+DATABASE_ROUTERS = ["theatre_service.db.routers.ReplicaRouter"]
+
+# Apps whose safe-method reads may be served by a replica
+REPLICA_ROUTED_APPS = ["theatre"]
+
+# Seconds a user reads from the primary after a write
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", 10))
+
+# Password hashing
+# https://docs.djangoproject.com/en/5.0/topics/auth/passwords/
+
+# Stored hashes made by another hasher are upgraded to the first hasher
+# of the selected profile on the user's next successful login.
+PASSWORD_HASHER_PROFILES = {
+    "pbkdf2": [
+        "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+        "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+        "django.contrib.auth.hashers.Argon2PasswordHasher",
+        "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+        "django.contrib.auth.hashers.ScryptPasswordHasher",
+    ],
+    "scrypt": [
+        "django.contrib.auth.hashers.ScryptPasswordHasher",
+        "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+        "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+        "django.contrib.auth.hashers.Argon2PasswordHasher",
+        "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    ],
+}
+
+PASSWORD_HASHERS = PASSWORD_HASHER_PROFILES[
+    os.environ.get("PASSWORD_HASHER_PROFILE", "pbkdf2")
+]
+
+# At most WORKERS hashes run at once per worker process, QUEUE_SIZE more
+# wait up to QUEUE_TIMEOUT seconds and the rest are answered with a 503
+PASSWORD_HASHING = {
+    "WORKERS": int(os.environ.get("PASSWORD_HASHING_WORKERS", 2)),
+    "QUEUE_SIZE": int(os.environ.get("PASSWORD_HASHING_QUEUE_SIZE", 8)),
+    "QUEUE_TIMEOUT": float(
+        os.environ.get("PASSWORD_HASHING_QUEUE_TIMEOUT", 2.0)
+    ),
 }
 
 # Password validation
@@ -137,6 +397,21 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.0/howto/static-files/
 
 STATIC_URL = "static/"
+# Filled by `collectstatic` when the image is built
+STATIC_ROOT = BASE_DIR / "vol" / "web" / "static"
+
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": (
+            "whitenoise.storage.CompressedManifestStaticFilesStorage"
+            if PRODUCTION
+            else "django.contrib.staticfiles.storage.StaticFilesStorage"
+        ),
+    },
+}
 
 MEDIA_ROOT = "vol/web/media"
 MEDIA_URL = "media/"
@@ -155,12 +430,23 @@ INTERNAL_IPS = [
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "theatre.throttling.SlidingWindowAnonRateThrottle",
+        "theatre.throttling.SlidingWindowUserRateThrottle",
+        "theatre.throttling.SlidingWindowScopedRateThrottle",
     ],
-    "DEFAULT_THROTTLE_RATES": {"anon": "1000/day", "user": "1000/day"},
+    "DEFAULT_THROTTLE_RATES": {
+        "anon": "1000/day",
+        "user": "1000/day",
+        "catalog": "10000/day",
+        "reservations": "60/hour",
+    },
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "user.authentication.CachedJWTAuthentication",
+    ),
+    # DRF's renderers, in "render" spans when the request is traced
+    "DEFAULT_RENDERER_CLASSES": (
+        "theatre_service.tracing.JSONRenderer",
+        "theatre_service.tracing.BrowsableAPIRenderer",
     ),
 }
 
@@ -170,6 +456,9 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": False,
 }
 
+# Built by `manage.py build_schema`, one file per API version
+OPENAPI_SCHEMA_DIR = BASE_DIR / "vol" / "web" / "schema"
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Theatre service API",
     "DESCRIPTION": "reservation, tickets for theatre session",
@@ -0,0 +1,366 @@
+"""
+Request tracing.
+
+`TracingMiddleware` opens a root span for a sampled request and returns
+the trace id in the TRACING["HEADER"] header. A trace id a request sends
+in that header is reused, but it only forces a trace on an internal
+request (`health.is_internal`); others just get it back. The layers a
+request goes through each get a child span, without patching any class:
+
+    view               from `process_view` until the response is about
+                       to be rendered (authentication, throttling, handler)
+    validate           `TracedSerializerMixin.run_validation`, once per
+                       nested serializer (so TicketSerializer.validate
+                       shows)
+    full_clean         `TracedModelMixin.full_clean`
+    to_representation  `TracedSerializerMixin.to_representation`, the
+                       outermost call only
+    db                 every query of the request on every database
+    render             `TracedRendererMixin.render`
+
+The app's serializers subclass `Serializer` / `ModelSerializer` below and
+the API renders with `JSONRenderer` / `BrowsableAPIRenderer` below. The
+current span lives in a ContextVar, so outside a trace the mixins only do
+one lookup, and under ASGI the work an async request hands to
+`sync_to_async` threads (its ORM calls, sync views) joins its trace.
+A finished trace goes to the TRACING["EXPORTER"] class, built with
+TRACING["EXPORTER_OPTIONS"]: `JsonFileExporter` appends one JSON line per
+trace to a file, `InMemoryExporter` keeps them in `outbox` (for tests),
+and any class with an `export(trace)` method fits.
+"""
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.module_loading import import_string
+from rest_framework import renderers, serializers
+
+from theatre_service.db.instrumentation import (
+    SyncAndAsyncMiddleware,
+    get_view_name,
+    observe_queries,
+)
+from theatre_service.health import is_internal
+
+
+MAX_SQL_LENGTH = 2000
+TRACE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+_current_span = ContextVar("tracing_span", default=None)
+
+# Traces exported by `InMemoryExporter`, like django.core.mail.outbox
+outbox = []
+
+
+class Trace:
+    def __init__(self, trace_id, max_spans):
+        self.trace_id = trace_id
+        self.max_spans = max_spans
+        self.spans = []
+        self.dropped = 0
+
+    def as_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "spans": [span.as_dict() for span in self.spans],
+            "dropped_spans": self.dropped,
+        }
+
+
+class Span:
+    def __init__(self, trace, name, parent_id=None, attributes=None):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes or {}
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+        trace.spans.append(self)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._started
+
+    def as_dict(self):
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": (
+                None if self.duration is None
+                else round(self.duration * 1000, 3)
+            ),
+            "attributes": self.attributes,
+        }
+
+
+def current_span():
+    return _current_span.get()
+
+
+@contextmanager
+def _activate(span):
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as error:
+        span.attributes["error"] = type(error).__name__
+        raise
+    finally:
+        span.finish()
+        _current_span.reset(token)
+
+
+def _child(parent, name, attributes):
+    """A new child span of `parent`, None past TRACING["MAX_SPANS"]"""
+    trace = parent.trace
+    if len(trace.spans) >= trace.max_spans:
+        trace.dropped += 1
+        return None
+    return Span(trace, name, parent.span_id, attributes)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Open a child of the current span; a no-op outside a trace"""
+    parent = _current_span.get()
+    child = parent and _child(parent, name, attributes)
+    if child is None:
+        yield None
+        return
+    with _activate(child):
+        yield child
+
+
+@contextmanager
+def start_trace(name, trace_id=None, **attributes):
+    """Open the root span of a new trace"""
+    trace = Trace(
+        trace_id or uuid.uuid4().hex, settings.TRACING["MAX_SPANS"]
+    )
+    with _activate(Span(trace, name, attributes=attributes)) as root:
+        yield root
+
+
+class TracedSerializerMixin:
+    """
+    Validate in a `validate <Serializer>` span, once per nested serializer
+    (so TicketSerializer.validate shows), and represent in a
+    `to_representation <Serializer>` span, the outermost call only
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_serializer = super().many_init(*args, **kwargs)
+        if type(list_serializer) is serializers.ListSerializer:
+            list_serializer.__class__ = TracedListSerializer
+        return list_serializer
+
+    def run_validation(self, *args, **kwargs):
+        if _current_span.get() is None:
+            return super().run_validation(*args, **kwargs)
+        with span(f"validate {type(self).__name__}"):
+            return super().run_validation(*args, **kwargs)
+
+    def to_representation(self, *args, **kwargs):
+        return _outermost_representation(
+            self, super().to_representation, *args, **kwargs
+        )
+
+
+class TracedListSerializer(serializers.ListSerializer):
+    """The ListSerializer of `many=True` traced serializers"""
+
+    def to_representation(self, *args, **kwargs):
+        return _outermost_representation(
+            self, super().to_representation, *args, **kwargs
+        )
+
+
+def _outermost_representation(serializer, method, *args, **kwargs):
+    parent = _current_span.get()
+    if parent is None or parent.name.startswith("to_representation"):
+        return method(*args, **kwargs)
+    name = type(serializer).__name__.removeprefix("Traced")
+    with span(f"to_representation {name}"):
+        return method(*args, **kwargs)
+
+
+class Serializer(TracedSerializerMixin, serializers.Serializer):
+    pass
+
+
+class ModelSerializer(TracedSerializerMixin, serializers.ModelSerializer):
+    pass
+
+
+class TracedModelMixin:
+    """Run `full_clean` in a `full_clean <Model>` span"""
+
+    def full_clean(self, *args, **kwargs):
+        if _current_span.get() is None:
+            return super().full_clean(*args, **kwargs)
+        with span(f"full_clean {type(self).__name__}"):
+            return super().full_clean(*args, **kwargs)
+
+
+class TracedRendererMixin:
+    """Render in a `render <Renderer>` span that records the size"""
+
+    def render(self, *args, **kwargs):
+        if _current_span.get() is None:
+            return super().render(*args, **kwargs)
+        with span(f"render {type(self).__name__}") as current:
+            content = super().render(*args, **kwargs)
+            if current is not None:
+                current.attributes["bytes"] = len(content)
+            return content
+
+
+class JSONRenderer(TracedRendererMixin, renderers.JSONRenderer):
+    pass
+
+
+class BrowsableAPIRenderer(
+    TracedRendererMixin, renderers.BrowsableAPIRenderer
+):
+    pass
+
+
+def db_span(execute, sql, params, many, context):
+    with span(
+        "db",
+        sql=sql[:MAX_SQL_LENGTH],
+        database=context["connection"].alias,
+        many=many,
+    ):
+        return execute(sql, params, many, context)
+
+
+class InMemoryExporter:
+    def export(self, trace):
+        outbox.append(trace)
+
+
+class JsonFileExporter:
+    """Append every trace to `path` as one JSON line"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, trace):
+        line = json.dumps(trace, default=str) + "\n"
+        with self._lock, open(self.path, "a") as file:
+            file.write(line)
+
+
+class TracingMiddleware(SyncAndAsyncMiddleware):
+    """Trace sampled requests and propagate the trace id header"""
+
+    def __init__(self, get_response):
+        if not settings.TRACING["ENABLED"]:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.header = settings.TRACING["HEADER"]
+        self.exporter = import_string(settings.TRACING["EXPORTER"])(
+            **settings.TRACING["EXPORTER_OPTIONS"]
+        )
+
+    def incoming_trace_id(self, request):
+        trace_id = request.headers.get(self.header, "").lower()
+        return trace_id if TRACE_ID.match(trace_id) else ""
+
+    def sampled(self):
+        return random.random() < settings.TRACING["SAMPLE_RATE"]
+
+    @contextmanager
+    def trace(self, request, trace_id):
+        with start_trace(
+            "request",
+            trace_id or None,
+            method=request.method,
+            path=request.path,
+        ) as root, observe_queries(db_span):
+            yield root
+
+    def propagate(self, response, trace_id):
+        if trace_id:
+            response[self.header] = trace_id
+        return response
+
+    def call(self, request):
+        incoming = self.incoming_trace_id(request)
+        # An incoming trace id is only propagated, unless the request is
+        # internal: anyone else could have every request traced
+        traced = self.sampled() or (incoming and is_internal(request))
+        if not traced:
+            return self.propagate(self.get_response(request), incoming)
+
+        with self.trace(request, incoming) as root:
+            response = self.get_response(request)
+            self.finish_view_span(request)
+            root.attributes["status"] = response.status_code
+
+        self.exporter.export(root.trace.as_dict())
+        return self.propagate(response, root.trace.trace_id)
+
+    async def __acall__(self, request):
+        incoming = self.incoming_trace_id(request)
+        traced = self.sampled() or (
+            incoming and await sync_to_async(is_internal)(request)
+        )
+        if not traced:
+            return self.propagate(await self.get_response(request), incoming)
+
+        with self.trace(request, incoming) as root:
+            response = await self.get_response(request)
+            self.finish_view_span(request)
+            root.attributes["status"] = response.status_code
+
+        # Exporters may write files or call out, keep that off the loop
+        await sync_to_async(self.exporter.export, thread_sensitive=False)(
+            root.trace.as_dict()
+        )
+        return self.propagate(response, root.trace.trace_id)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Open the view span, which lasts until the response is rendered"""
+        root = _current_span.get()
+        if root is None:
+            return
+        view = get_view_name(
+            view_func, request.method
+        ) or request.resolver_match.view_name
+        root.attributes["view"] = view
+        view_span = _child(root, f"view {view}", {})
+        if view_span is not None:
+            request._trace_view_span = (view_span, root)
+            _current_span.set(view_span)
+
+    def process_exception(self, request, exception):
+        view_span = getattr(request, "_trace_view_span", None)
+        if view_span is not None:
+            view_span[0].attributes["error"] = type(exception).__name__
+        self.finish_view_span(request)
+
+    def process_template_response(self, request, response):
+        self.finish_view_span(request)
+        return response
+
+    def finish_view_span(self, request):
+        view_span = request.__dict__.pop("_trace_view_span", None)
+        if view_span is not None:
+            view_span[0].finish()
+            # Set, not reset: under ASGI the hooks run in other contexts
+            _current_span.set(view_span[1])
@@ -14,24 +14,102 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView,
-)
+from django.utils.module_loading import import_string
+
+from theatre_service import health
+
+
+def lazy_view(dotted_path, **initkwargs):
+    """Import a class-based view on its first request, not at startup"""
+    view = None
+
+    def wrapper(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(dotted_path).as_view(**initkwargs)
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
 
 urlpatterns = [
-    path("admin/", admin.site.urls),
-    path("__debug__/", include("debug_toolbar.urls")),
+    path("healthz", health.healthz, name="healthz"),
+    path("readyz", health.readyz, name="readyz"),
     path("api/user/", include("user.urls", namespace="user")),
     path("api/theatre/", include("theatre.urls", namespace="theatre")),
-    path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
-    path(
-        "api/doc/swagger/",
-        SpectacularSwaggerView.as_view(url_name="schema"),
-        name="swagger",
-    ),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+
+if settings.SLOW_QUERY_LOG["THRESHOLD_MS"] is not None:
+    from theatre_service.db.slow_queries import (
+        SlowQueryDownloadView,
+        SlowQueryListView,
+    )
+
+    urlpatterns += [
+        path(
+            "api/admin/slow-queries/",
+            SlowQueryListView.as_view(),
+            name="slow-queries",
+        ),
+        path(
+            "api/admin/slow-queries/download/",
+            SlowQueryDownloadView.as_view(),
+            name="slow-queries-download",
+        ),
+    ]
+
+if settings.PROFILING["ENABLED"]:
+    from theatre_service.profiling import (
+        ProfileDownloadView,
+        ProfilingTokenView,
+        ProfilingView,
+    )
+
+    urlpatterns += [
+        path(
+            "api/admin/profiling/", ProfilingView.as_view(), name="profiling"
+        ),
+        path(
+            "api/admin/profiling/token/",
+            ProfilingTokenView.as_view(),
+            name="profiling-token",
+        ),
+        path(
+            "api/admin/profiling/<str:view>/download/",
+            ProfileDownloadView.as_view(),
+            name="profiling-download",
+        ),
+    ]
+
+if settings.METRICS_ENABLED:
+    from theatre_service.metrics import metrics_view
+
+    urlpatterns.append(path("metrics", metrics_view, name="metrics"))
+
+if "django.contrib.admin" in settings.INSTALLED_APPS:
+    from django.contrib import admin
+
+    urlpatterns.append(path("admin/", admin.site.urls))
+
+if "drf_spectacular" in settings.INSTALLED_APPS:
+    urlpatterns += [
+        path(
+            "api/schema/",
+            lazy_view("theatre_service.schema.CachedSchemaView"),
+            name="schema",
+        ),
+        path(
+            "api/doc/swagger/",
+            lazy_view(
+                "drf_spectacular.views.SpectacularSwaggerView",
+                url_name="schema",
+            ),
+            name="swagger",
+        ),
+    ]
+
+if "debug_toolbar" in settings.INSTALLED_APPS:
+    urlpatterns.append(path("__debug__/", include("debug_toolbar.urls")))
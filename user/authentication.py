@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from theatre_service.metrics import CACHE_REQUESTS
+
+
+def user_version_key(user_id) -> str:
+    return f"auth:user-version:{user_id}"
+
+
+def user_cache_key(user_id) -> str:
+    """Build the cache key for a user from its id and current version"""
+    version = cache.get(user_version_key(user_id), 0)
+    return f"auth:user:{user_id}:{version}"
+
+
+def invalidate_cached_user(user_id) -> None:
+    """Bump the user version so every cached copy of the user is stale"""
+    key = user_version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that resolves the token user from the cache
+    instead of loading the row from the database on every request.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+
+        if user_id is None or api_settings.CHECK_REVOKE_TOKEN:
+            return super().get_user(validated_token)
+
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+
+        if user is None:
+            CACHE_REQUESTS.inc(cache="auth_user", result="miss")
+            user = super().get_user(validated_token)
+            cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        else:
+            CACHE_REQUESTS.inc(cache="auth_user", result="hit")
+
+        return user
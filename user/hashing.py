@@ -0,0 +1,70 @@
+import threading
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingPoolBusy(Exception):
+    """No hashing slot freed up within PASSWORD_HASHING["QUEUE_TIMEOUT"]"""
+
+
+class HashingUnavailable(APIException):
+    """HashingPoolBusy, as the API answers it"""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _("Too many sign-in requests, try again shortly.")
+    default_code = "hashing_pool_busy"
+
+
+_slots = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_slots():
+    """
+    Create the semaphores lazily from the settings: one admitting
+    WORKERS + QUEUE_SIZE callers, one letting WORKERS of them hash.
+    """
+    global _slots
+
+    with _pool_lock:
+        if _slots is None:
+            options = settings.PASSWORD_HASHING
+            _slots = (
+                threading.BoundedSemaphore(
+                    options["WORKERS"] + options["QUEUE_SIZE"]
+                ),
+                threading.BoundedSemaphore(options["WORKERS"]),
+            )
+    return _slots
+
+
+def reset_hashing_slots():
+    global _slots
+
+    with _pool_lock:
+        _slots = None
+
+
+def run_hashing(func, *args, **kwargs):
+    """
+    Run a password hashing function on the calling thread, at most
+    WORKERS at once per process.
+
+    At most WORKERS + QUEUE_SIZE calls are admitted at once; callers
+    that can't get a slot within QUEUE_TIMEOUT seconds are rejected
+    with HashingPoolBusy instead of piling up.
+    """
+    admitted, running = get_hashing_slots()
+
+    if not admitted.acquire(
+        timeout=settings.PASSWORD_HASHING["QUEUE_TIMEOUT"]
+    ):
+        raise HashingPoolBusy()
+    try:
+        with running:
+            return func(*args, **kwargs)
+    finally:
+        admitted.release()
@@ -0,0 +1,60 @@
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+from theatre_service.benchmark import run_load
+from user.views import TokenObtainPairView
+
+
+BENCH_EMAIL = "bench-login-{}@bench.local"
+BENCH_PASSWORD = "bench-password"
+
+
+class Command(BaseCommand):
+    """Measure token endpoint throughput under concurrent logins"""
+
+    help = (
+        "Log in concurrently against the token endpoint and report "
+        "throughput and latency percentiles as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=8)
+
+    def handle(self, *args, **options):
+        user_model = get_user_model()
+        password = make_password(BENCH_PASSWORD)
+        emails = [BENCH_EMAIL.format(i) for i in range(options["users"])]
+
+        user_model.objects.filter(email__in=emails).delete()
+        user_model.objects.bulk_create(
+            user_model(email=email, password=password) for email in emails
+        )
+        url = reverse("user:token_obtain_pair")
+
+        def login(index):
+            payload = {
+                "email": emails[index % len(emails)],
+                "password": BENCH_PASSWORD,
+            }
+            return Client().post(url, payload).status_code == 200
+
+        # Throttling would reject most of the run from a single address
+        try:
+            with mock.patch.object(
+                TokenObtainPairView, "throttle_classes", ()
+            ):
+                result = run_load(
+                    login, options["requests"], options["concurrency"]
+                )
+        finally:
+            user_model.objects.filter(email__in=emails).delete()
+
+        result["concurrency"] = options["concurrency"]
+        self.stdout.write(json.dumps(result, indent=2))
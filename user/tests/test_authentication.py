@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+ME_URL = reverse("user:manage")
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """Test resolving JWT users from the cache"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "testpass"
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+
+    def test_cached_user_skips_database(self):
+        """Test that the second request doesn't query the user table"""
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["email"], self.user.email)
+
+    def test_update_invalidates_cached_user(self):
+        """Test that updating the user through the API drops the cache"""
+        self.client.get(ME_URL)
+
+        self.client.patch(ME_URL, {"email": "new@test.com"})
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data["email"], "new@test.com")
+
+    def test_deactivated_user_rejected(self):
+        """Test that deactivating a cached user revokes access"""
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_staff_change_visible(self):
+        """Test that granting staff is seen on the next request"""
+        self.client.get(ME_URL)
+
+        self.user.is_staff = True
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertTrue(res.data["is_staff"])
@@ -0,0 +1,102 @@
+import threading
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from user import hashing
+
+
+CREATE_USER_URL = reverse("user:register")
+TOKEN_URL = reverse("user:token_obtain_pair")
+
+
+class PasswordHashingTests(TestCase):
+    """Test password hashing on the bounded worker pool"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def tearDown(self):
+        hashing.reset_hashing_slots()
+
+    def hold_slot(self):
+        """Start a hash that runs until the returned event is set"""
+        started, release = threading.Event(), threading.Event()
+
+        def slow_hash():
+            started.set()
+            release.wait(5)
+
+        thread = threading.Thread(
+            target=hashing.run_hashing, args=(slow_hash,)
+        )
+        thread.start()
+        started.wait(5)
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+        return release
+
+    @override_settings(
+        PASSWORD_HASHING={"WORKERS": 1, "QUEUE_SIZE": 1, "QUEUE_TIMEOUT": 5}
+    )
+    def test_queued_hash_waits_for_a_worker(self):
+        """Test that a hash over WORKERS waits for the running one"""
+        hashing.reset_hashing_slots()
+        release = self.hold_slot()
+        threading.Timer(0.2, release.set).start()
+
+        self.assertEqual(hashing.run_hashing(lambda: "hash"), "hash")
+        self.assertTrue(release.is_set())
+
+    def test_login_rehashes_to_preferred_hasher(self):
+        """Test that a login upgrades a hash made by an older hasher"""
+        user = get_user_model().objects.create_user("test@test.com")
+        user.password = make_password("testpass", hasher="pbkdf2_sha1")
+        user.save()
+
+        res = self.client.post(
+            TOKEN_URL, {"email": "test@test.com", "password": "testpass"}
+        )
+
+        user.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$"))
+        self.assertTrue(user.check_password("testpass"))
+
+    @override_settings(
+        PASSWORD_HASHING={"WORKERS": 1, "QUEUE_SIZE": 0, "QUEUE_TIMEOUT": 0}
+    )
+    def test_busy_pool_rejects_registration(self):
+        """Test that a saturated pool answers 503 instead of queueing"""
+        hashing.reset_hashing_slots()
+        self.hold_slot()
+        payload = {"email": "test@test.com", "password": "testpass"}
+
+        res = self.client.post(CREATE_USER_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(
+            get_user_model().objects.filter(email=payload["email"]).exists()
+        )
+
+    @override_settings(
+        PASSWORD_HASHING={"WORKERS": 1, "QUEUE_SIZE": 0, "QUEUE_TIMEOUT": 0}
+    )
+    def test_busy_pool_rejects_login(self):
+        """Test that the model raises a plain error the API answers 503"""
+        get_user_model().objects.create_user("test@test.com", "testpass")
+        hashing.reset_hashing_slots()
+        self.hold_slot()
+
+        with self.assertRaises(hashing.HashingPoolBusy):
+            get_user_model()().set_password("testpass")
+        res = self.client.post(
+            TOKEN_URL, {"email": "test@test.com", "password": "testpass"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res.data["detail"].code, "hashing_pool_busy")
@@ -1,18 +1,33 @@
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt import views as jwt_views
 
+from user.authentication import CachedJWTAuthentication
+from user.hashing import HashingPoolBusy, HashingUnavailable
 from user.serializers import UserSerializer
 
 
-class CreateUserView(generics.CreateAPIView):
+class HashingLimitMixin:
+    """Answer 503 when the password hashing pool turns a request away"""
+
+    def handle_exception(self, exc):
+        if isinstance(exc, HashingPoolBusy):
+            exc = HashingUnavailable()
+        return super().handle_exception(exc)
+
+
+class CreateUserView(HashingLimitMixin, generics.CreateAPIView):
     serializer_class = UserSerializer
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(HashingLimitMixin, generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_object(self):
         return self.request.user
+
+
+class TokenObtainPairView(HashingLimitMixin, jwt_views.TokenObtainPairView):
+    pass